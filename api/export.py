@@ -0,0 +1,195 @@
+"""
+Streaming NDJSON export of JSONL logs.
+
+/export hands filtered slices of runs.jsonl / benchmark_results.jsonl to
+other tools without ever holding the file in memory:
+
+  * the file is read in EXPORT_READ_BYTES blocks on a worker thread, so the
+    event loop never blocks on disk or json.loads();
+  * matching records are projected down to the requested fields and batched
+    into ~EXPORT_FLUSH_BYTES chunks;
+  * the next block is only read once the previous chunk has been handed to
+    the server.  Uvicorn's send() waits while the socket buffer is full, so a
+    slow client slows the reader down instead of growing a queue.
+
+Memory per export is one read block, one output chunk and at most one
+partial line — independent of file size.  The export stops at the size the
+file had when it started, so a log that is being appended to still yields a
+consistent snapshot.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+
+from api.responses import dumps
+from api.runindex import OK_FALSE, OK_TRUE, record_fields
+
+EXPORT_READ_BYTES = 256 * 1024
+EXPORT_FLUSH_BYTES = 64 * 1024
+EXPORT_MAX_LINE_BYTES = 16 * 1024 * 1024  # longer lines are skipped, not buffered
+
+
+class ExportError(ValueError):
+    pass
+
+
+def parse_fields(spec: str | None) -> list[tuple[str, ...]] | None:
+    """"run_id,validation.passed" → [("run_id",), ("validation", "passed")]."""
+    if not spec:
+        return None
+    fields = [tuple(part.strip().split(".")) for part in spec.split(",") if part.strip()]
+    if any("" in path for path in fields):
+        raise ExportError(f"Bad field list: {spec!r}")
+    return fields or None
+
+
+def parse_where(clauses: list[str]) -> list[tuple[tuple[str, ...], object]]:
+    """["prompt_id=math_simple", "validation.passed=false"] → [(path, value), ...].
+
+    The right-hand side is read as JSON when it parses (false, 42, null) and
+    as a plain string otherwise.
+    """
+    out = []
+    for clause in clauses:
+        path, sep, raw = clause.partition("=")
+        if not sep or not path.strip():
+            raise ExportError(f"Bad filter {clause!r}; expected field=value")
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        out.append((tuple(path.strip().split(".")), value))
+    return out
+
+
+_MISSING = object()
+_STOP = object()
+
+
+def _lookup(entry, path: tuple[str, ...]):
+    for key in path:
+        if not isinstance(entry, dict):
+            return _MISSING
+        # old runs.jsonl rows carry keys with a trailing space ("model_name ")
+        entry = entry.get(key, entry.get(key + " ", _MISSING))
+        if entry is _MISSING:
+            return _MISSING
+    return entry
+
+
+def project(entry: dict, fields: list[tuple[str, ...]] | None) -> dict:
+    """Keep only *fields*, preserving nesting; missing fields are left out."""
+    if fields is None:
+        return entry
+    out: dict = {}
+    for path in fields:
+        value = _lookup(entry, path)
+        if value is _MISSING:
+            continue
+        node = out
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return out
+
+
+@dataclass
+class ExportFilter:
+    model_name: str | None = None
+    # Field to read the model from when a record has no model_name.
+    # record_fields() reads model_name only (as log_processor does), but
+    # benchmark rows name their model in agent_name.
+    model_fallback: str | None = None
+    ok: bool | None = None
+    since_ms: int | None = None
+    until_ms: int | None = None
+    where: list[tuple[tuple[str, ...], object]] = field(default_factory=list)
+
+    def matches(self, entry: dict, ts: int, model: str, ok: int) -> bool:
+        if "model_name" not in entry and isinstance(entry.get(self.model_fallback), str):
+            model = entry[self.model_fallback]
+        if self.model_name is not None and model != self.model_name:
+            return False
+        if self.ok is not None and ok != (OK_TRUE if self.ok else OK_FALSE):
+            return False
+        if self.since_ms is not None and (ts < 0 or ts < self.since_ms):
+            return False
+        if self.until_ms is not None and (ts < 0 or ts > self.until_ms):
+            return False
+        return all(_lookup(entry, path) == value for path, value in self.where)
+
+
+class ExportScan:
+    """
+    Pull-based reader: each next_chunk() call returns the next batch of
+    NDJSON bytes, or None at the end.  Blocking — call it from a thread.
+    """
+
+    def __init__(self, path: str, flt: ExportFilter, fields, start: int = 0):
+        self.filter = flt
+        self.fields = fields
+        self.matched = 0
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._end = os.fstat(self._file.fileno()).st_size
+        self._carry = b""
+        self._skipping = False  # inside an over-long line
+        self._ts_max = -1
+        self._done = False
+
+    def close(self) -> None:
+        self._file.close()
+
+    def next_chunk(self) -> bytes | None:
+        out: list[bytes] = []
+        size = 0
+        while not self._done and size < EXPORT_FLUSH_BYTES:
+            remaining = self._end - self._file.tell()
+            block = self._file.read(min(EXPORT_READ_BYTES, remaining)) if remaining > 0 else b""
+            if not block:
+                self._done = True  # a trailing line without "\n" is still being written
+                break
+
+            lines = (self._carry + block).split(b"\n")
+            self._carry = lines.pop()
+            if self._skipping and lines:
+                lines.pop(0)
+                self._skipping = False
+            if len(self._carry) > EXPORT_MAX_LINE_BYTES:
+                self._carry = b""
+                self._skipping = True
+
+            for line in lines:
+                record = self._match(line)
+                if record is None:
+                    continue
+                if record is _STOP:
+                    self._done = True
+                    break
+                out.append(record)
+                size += len(record)
+
+        return b"".join(out) if out else None
+
+    def _match(self, line: bytes):
+        if not line.strip():
+            return None
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(entry, dict):
+            return None
+
+        ts, model, ok = record_fields(entry)
+        self._ts_max = max(self._ts_max, ts)
+        # Same ordering assumption as /api/runs: past `until` nothing else matches.
+        if self.filter.until_ms is not None and self._ts_max > self.filter.until_ms:
+            return _STOP
+        if not self.filter.matches(entry, ts, model, ok):
+            return None
+
+        self.matched += 1
+        return dumps(project(entry, self.fields)) + b"\n"
+
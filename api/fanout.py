@@ -0,0 +1,132 @@
+"""
+Streaming fan-out of one prompt to several agents.
+
+run.py sends a prompt to every agent with asyncio.gather(), so nothing is
+printed until the slowest agent answers.  fan_out() runs each agent as its
+own task and yields events as they happen instead:
+
+    {"type": "start",  "run_id": ..., "agents": [...]}
+    {"type": "token",  "agent": ..., "text": ...}          (streaming agents)
+    {"type": "result", "agent": ..., "response": ..., "validation": ...}
+    {"type": "done",   "fan_out_latency_sec": ...}
+
+so a fast agent's validated result goes out while the others are still
+running.  Agents are called through BaseAgent.astream(): the Gemini and
+OpenRouter agents use their SDKs' async clients and yield tokens, the rest
+run call() in a worker thread.
+
+Once every agent has finished, the runs are appended to data/runs.jsonl with
+the same fields run.py writes.  If the client goes away first, the pending
+agent calls are cancelled and nothing is logged.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from logger import run_logger
+from validators.base import contextValidation
+from validators.basic_validators import (
+    EmptyOutputValidator,
+    LongOutputValidator,
+    RefusalValidator,
+    RepetitionValidator,
+    ShortOutputValidator,
+)
+from validators.runner import RunAllTests
+
+# Same checks run.py applies
+VALIDATORS = [
+    EmptyOutputValidator(), ShortOutputValidator(), LongOutputValidator(),
+    RefusalValidator(), RepetitionValidator(),
+]
+
+EVENT_QUEUE_SIZE = 256  # token events buffered before agents wait on the client
+
+
+async def _run_agent(key: str, name: str, bot, prompt: str, timeout: float,
+                     stream_tokens: bool, events: asyncio.Queue) -> None:
+    start = time.perf_counter()
+    parts: list[str] = []
+    try:
+        async with asyncio.timeout(timeout):
+            async for text in bot.astream(prompt):
+                parts.append(text)
+                if stream_tokens and bot.supports_streaming:
+                    await events.put({"type": "token", "agent_key": key, "agent": name, "text": text})
+        result = "".join(parts)
+    except Exception as exc:  # reported in error_meta, like run.py's return_exceptions=True
+        result = exc
+
+    try:
+        response_text = bot.errorLogs.set_from_result(result)
+        error_meta = bot.errorLogs.get_meta()
+        validation = RunAllTests.run_validators(
+            contextValidation(prompt, response_text, name), VALIDATORS,
+        )
+        latency_metrics = bot.monitor.get_latency_metrics()
+    except Exception as exc:  # fan_out() waits for one result per agent, so still send one
+        response_text = f"ERROR: {exc}"
+        error_meta = {"ok": False, "error_type": type(exc).__name__, "error_message": str(exc)}
+        validation = {"passed": False, "results": []}
+        latency_metrics = None
+
+    await events.put({
+        "type": "result",
+        "agent_key": key,
+        "agent": name,
+        "response": response_text,
+        "error_meta": error_meta,
+        "validation": validation,
+        "latency_sec": time.perf_counter() - start,
+        "agent_latency_metrics": latency_metrics,
+    })
+
+
+async def fan_out(prompt: str, agents: dict, timeout: float,
+                  stream_tokens: bool = True) -> AsyncIterator[dict]:
+    """
+    Yield events for *prompt* sent to *agents* ({key: (name, bot)}).
+
+    Results arrive in completion order.  The bounded event queue means a
+    slow client eventually makes streaming agents wait rather than piling
+    tokens up in memory.
+    """
+    time_stamp = datetime.now(timezone.utc).isoformat()
+    run_id = f"{time_stamp}-{prompt}"
+    events: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+
+    yield {"type": "start", "run_id": run_id, "agents": [name for name, _ in agents.values()]}
+
+    fan_out_start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_run_agent(key, name, bot, prompt, timeout, stream_tokens, events))
+        for key, (name, bot) in agents.items()
+    ]
+    results = []
+    try:
+        while len(results) < len(tasks):
+            event = await events.get()
+            if event["type"] == "result":
+                results.append(event)
+            yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    fan_elapsed_time = time.perf_counter() - fan_out_start
+
+    def log_all():
+        for r in results:
+            run_logger.log_run(
+                prompt, r["response"], r["agent"],
+                fan_elapsed_time, time_stamp, r["agent_latency_metrics"],
+                validation=r["validation"],
+                agent_latency_last_sec=r["latency_sec"],
+                error_meta=r["error_meta"],
+                run_id=run_id,
+            )
+
+    await asyncio.to_thread(log_all)
+    yield {"type": "done", "run_id": run_id, "fan_out_latency_sec": fan_elapsed_time}
@@ -0,0 +1,97 @@
+"""
+Cheap file fingerprints for cache keys.
+
+Hashing the whole log on every request means a cache *hit* on a 2 GB
+runs.jsonl still reads 2 GB.  Instead we look at the file metadata first
+(a single stat() call) and only touch the content when that metadata moves.
+
+Two modes:
+
+    content      SHA-256 of the full file.  Exact, but O(file) whenever the
+                 file changes.  Memoized, so unchanged files cost one stat().
+    fingerprint  SHA-256 of (device, inode, size, mtime_ns) plus the tail of
+                 the file and a few evenly spaced sample blocks.  O(1) reads
+                 regardless of file size.
+
+The memo lives in this module, so it is per uvicorn worker.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+SAMPLE_BLOCK_SIZE = 64 * 1024  # bytes read per sampled block / tail
+SAMPLE_BLOCKS = 4              # evenly spaced blocks in addition to the tail
+MEMO_MAX_ENTRIES = 256         # distinct files remembered per worker
+
+_HASH_CHUNK = 1024 * 1024
+
+# path -> (stat signature, digest)
+_memo: "OrderedDict[str, tuple[tuple, str]]" = OrderedDict()
+
+
+def _stat_signature(st: os.stat_result) -> tuple:
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _content_digest(path: str) -> str:
+    """Full SHA-256, streamed in 1 MB chunks so we never hold the file in RAM."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_HASH_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _sampled_digest(path: str, signature: tuple) -> str:
+    """
+    Hash the stat signature, the tail and SAMPLE_BLOCKS sampled blocks.
+
+    Why the tail?
+    ─────────────
+    runs.jsonl is append-only, so new data always lands at the end.  Hashing
+    the tail catches appends even on filesystems with coarse mtime.
+    """
+    size = signature[2]
+    h = hashlib.sha256(repr(signature).encode())
+
+    offsets = []
+    if size > SAMPLE_BLOCK_SIZE:
+        stride = size // (SAMPLE_BLOCKS + 1)
+        offsets = [stride * i for i in range(SAMPLE_BLOCKS)]
+    offsets.append(max(0, size - SAMPLE_BLOCK_SIZE))  # tail
+
+    with open(path, "rb") as f:
+        for off in offsets:
+            f.seek(off)
+            h.update(f.read(SAMPLE_BLOCK_SIZE))
+    return h.hexdigest()
+
+
+def file_digest(path: str, mode: str = "fingerprint") -> str:
+    """
+    Return a digest for *path*, re-reading content only if its stat changed.
+
+    Raises ValueError for an unknown *mode*.
+    """
+    if mode not in ("content", "fingerprint"):
+        raise ValueError(f"Unknown cache key mode: {mode!r}")
+
+    memo_key = f"{mode}:{os.path.abspath(path)}"
+    signature = _stat_signature(os.stat(path))
+
+    cached = _memo.get(memo_key)
+    if cached and cached[0] == signature:
+        _memo.move_to_end(memo_key)
+        return cached[1]
+
+    if mode == "content":
+        digest = _content_digest(path)
+    else:
+        digest = _sampled_digest(path, signature)
+
+    _memo[memo_key] = (signature, digest)
+    _memo.move_to_end(memo_key)
+    while len(_memo) > MEMO_MAX_ENTRIES:
+        _memo.popitem(last=False)
+    return digest
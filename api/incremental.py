@@ -0,0 +1,199 @@
+"""
+Append-aware incremental aggregation for JSONL logs.
+
+logger/run_logger.log_run only ever appends, so once a file has been scanned
+up to byte N there is no reason to read bytes 0..N again.  We keep a
+checkpoint per file:
+
+    {
+      "dev": ..., "ino": ...,        # which physical file we scanned
+      "offset": N,                   # first byte not yet aggregated
+      "head": sha256(first 4 KB),    # detects in-place rewrites
+      "state": {...},                # mergeable partial aggregate
+      "computed_at": 1760000000.0    # wall clock of the scan (for SWR ages)
+    }
+
+On the next cache miss the binary runs with --partial --offset N and its
+output is merged into "state".  Rotation (new inode), truncation (size < N)
+or a rewritten head all fall back to a full rescan from byte 0.
+
+Checkpoints go to Redis so every worker shares them; if Redis is down they
+live in a per-worker LRU (LOCAL_CHECKPOINTS_MAX entries) instead.  A
+filtered aggregate (see /process-logs filters) is a different state over the
+same bytes, so it gets its own checkpoint, keyed by *variant*; callers give
+those a ttl, since every distinct filter set would otherwise leave a key
+behind for good.
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+from redis.exceptions import RedisError
+
+from api.sketch import LatencySketch
+
+HEAD_BYTES = 4096
+CHECKPOINT_PREFIX = "logproc:ckpt:"
+LOCAL_CHECKPOINTS_MAX = 256  # checkpoints kept per worker when Redis is down
+
+_local_checkpoints: "OrderedDict[str, dict]" = OrderedDict()
+
+
+# ---------------------------------------------------------------------------
+# Aggregate state
+# ---------------------------------------------------------------------------
+
+
+def empty_state() -> dict:
+    return {"total_lines": 0, "agents": {}}
+
+
+def merge_partial(state: dict, partial: dict) -> dict:
+    """Fold one `log_processor --partial` output into *state* (in place)."""
+    state["total_lines"] += partial.get("total_lines", 0)
+
+    for model, p in partial.get("agents", {}).items():
+        agent = state["agents"].setdefault(model, {
+            "total": 0, "errors": 0, "val_failed": 0, "null_responses": 0,
+            "latency": LatencySketch().to_dict(),
+        })
+        for field in ("total", "errors", "val_failed", "null_responses"):
+            agent[field] += p.get(field, 0)
+
+        sketch = LatencySketch.from_dict(agent["latency"])
+        sketch.merge(LatencySketch.from_dict(p.get("latency", {})))
+        agent["latency"] = sketch.to_dict()
+
+    return state
+
+
+def render(state: dict) -> dict:
+    """Turn merged state into the same shape log_processor's emit_json() prints."""
+    agents = {}
+    total_errors = 0
+    total_val_fail = 0
+
+    for model, a in sorted(state["agents"].items()):
+        total_errors += a["errors"]
+        total_val_fail += a["val_failed"]
+        sketch = LatencySketch.from_dict(a["latency"])
+
+        agents[model] = {
+            "total": a["total"],
+            "errors": a["errors"],
+            "error_rate_pct": 100.0 * a["errors"] / a["total"] if a["total"] else 0.0,
+            "val_failed": a["val_failed"],
+            "null_responses": a["null_responses"],
+            "avg_latency_ms": sketch.mean(),
+            "p50_latency_ms": sketch.quantile(0.50),
+            "p95_latency_ms": sketch.quantile(0.95),
+            "p99_latency_ms": sketch.quantile(0.99),
+        }
+
+    return {
+        "total_lines": state["total_lines"],
+        "total_errors": total_errors,
+        "total_validation_fails": total_val_fail,
+        "errors_by_agent": agents,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Checkpoints
+# ---------------------------------------------------------------------------
+
+
+def head_digest(path: str, length: int) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(min(HEAD_BYTES, length))).hexdigest()
+
+
+def file_identity(path: str) -> dict:
+    """
+    Which file *path* is right now — take it before a scan.  If the log is
+    rotated mid-scan, a checkpoint built from a stat() afterwards would pair
+    the new file with the old file's offset and state.
+    """
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        return {"dev": st.st_dev, "ino": st.st_ino, "head": f.read(HEAD_BYTES)}
+
+
+def make_checkpoint(identity: dict, state: dict, offset: int) -> dict:
+    return {
+        "dev": identity["dev"],
+        "ino": identity["ino"],
+        "offset": offset,
+        # same bytes head_digest(path, offset) hashes; a head that was still
+        # shorter than that when identity was taken just forces a rescan
+        "head": hashlib.sha256(identity["head"][:min(HEAD_BYTES, offset)]).hexdigest(),
+        "state": state,
+        "computed_at": time.time(),
+    }
+
+
+def resume_point(path: str, checkpoint: dict | None) -> tuple[int, dict]:
+    """
+    Return (offset, state) to continue from.
+
+    (0, empty_state()) means "full rescan" — no checkpoint, or the file was
+    rotated, truncated or rewritten since the checkpoint was taken.
+    """
+    if not checkpoint:
+        return 0, empty_state()
+
+    st = os.stat(path)
+    offset = checkpoint["offset"]
+
+    if (st.st_dev, st.st_ino) != (checkpoint["dev"], checkpoint["ino"]):
+        return 0, empty_state()  # rotated: same path, different file
+    if st.st_size < offset:
+        return 0, empty_state()  # truncated
+    if head_digest(path, offset) != checkpoint["head"]:
+        return 0, empty_state()  # rewritten in place
+
+    if offset > 0:
+        with open(path, "rb") as f:
+            f.seek(offset - 1)
+            if f.read(1) != b"\n":
+                return 0, empty_state()  # offset no longer on a line boundary
+
+    return offset, checkpoint["state"]
+
+
+def _checkpoint_key(path: str, variant: str) -> str:
+    key = CHECKPOINT_PREFIX + os.path.abspath(path)
+    return f"{key}#{variant}" if variant else key
+
+
+async def load_checkpoint(client, path: str, variant: str = "") -> dict | None:
+    key = _checkpoint_key(path, variant)
+    if client:
+        try:
+            raw = await client.get(key)
+            return json.loads(raw) if raw else None
+        except RedisError:
+            pass
+    checkpoint = _local_checkpoints.get(key)
+    if checkpoint is not None:
+        _local_checkpoints.move_to_end(key)
+    return checkpoint
+
+
+async def save_checkpoint(
+    client, path: str, checkpoint: dict, variant: str = "", ttl: int | None = None,
+) -> None:
+    """Store *checkpoint*; with *ttl* (seconds) the Redis copy expires."""
+    key = _checkpoint_key(path, variant)
+    _local_checkpoints[key] = checkpoint
+    _local_checkpoints.move_to_end(key)
+    while len(_local_checkpoints) > LOCAL_CHECKPOINTS_MAX:
+        _local_checkpoints.popitem(last=False)
+    if client:
+        try:
+            await client.set(key, json.dumps(checkpoint), ex=ttl)
+        except RedisError:
+            pass
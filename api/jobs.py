@@ -0,0 +1,420 @@
+"""
+Asynchronous benchmark jobs.
+
+`python -m benchmarks.runner` blocks a terminal until every prompt has been
+answered.  POST /api/benchmark instead queues a BenchmarkJob and returns its
+id straight away; a small pool of worker tasks runs the queued jobs:
+
+  * at most BENCHMARK_WORKERS jobs run at once per API worker and up to
+    BENCHMARK_QUEUE_LIMIT more wait — beyond that submit() refuses (503);
+  * every agent call of every job goes through one AgentLimiter, so an agent
+    never has more than BENCHMARK_AGENT_CONCURRENCY calls in flight however
+    many jobs are running.  Free slots are handed out round-robin between
+    the jobs waiting for that agent, so a 200-prompt job cannot starve a
+    5-prompt one that was queued after it;
+  * each finished prompt appends its records to the job (readable while it
+    runs), to data/benchmark_results.jsonl (same rows as the CLI) and to the
+    job's event list, which /api/benchmark/{id}/events replays and follows.
+
+Agents are called through BaseAgent.astream() as in api/fanout.py.  For
+agents with an async SDK client (Gemini, OpenRouter) a timeout or a cancelled
+job stops the SDK request itself.  The others run call() in a worker thread,
+which can't be interrupted: the job moves on and frees the agent slot, but
+the thread finishes its request in the background.
+
+Jobs live in the worker that accepted them.  After every prompt the job is
+mirrored to Redis so that any worker can answer status / result / event
+requests: the small status part is rewritten, while results and events are
+lists that only get the new entries appended.  Cancellation is a Redis flag
+the owning worker checks.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from redis.exceptions import RedisError
+
+from benchmarks.runner import build_record, save_results
+
+JOB_PREFIX = "bench:job:"
+JOB_TTL = 86_400          # seconds a finished job's snapshot stays in Redis
+JOBS_KEPT = 50            # finished jobs remembered in memory per worker
+FINISHED = ("completed", "failed", "cancelled")
+
+
+class JobQueueFullError(Exception):
+    """Too many benchmark jobs are already waiting for a worker."""
+
+
+class AgentLimiter:
+    """
+    Per-agent concurrency slots shared by every job.
+
+    Up to *limit* calls per agent run at once.  Waiters are queued per job
+    and a released slot goes to the next job in rotation, not to whichever
+    job queued the most calls.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._active: dict[str, int] = {}
+        self._waiting: dict[str, OrderedDict[str, deque]] = {}
+
+    def stats(self) -> dict:
+        return {
+            agent: {
+                "active": self._active.get(agent, 0),
+                "waiting": sum(len(q) for q in self._waiting.get(agent, {}).values()),
+            }
+            for agent in self._active.keys() | self._waiting.keys()
+        }
+
+    @asynccontextmanager
+    async def slot(self, agent: str, job_id: str):
+        jobs = self._waiting.setdefault(agent, OrderedDict())
+        if self._active.get(agent, 0) < self.limit and not jobs:
+            self._active[agent] = self._active.get(agent, 0) + 1
+        else:
+            granted = asyncio.get_running_loop().create_future()
+            jobs.setdefault(job_id, deque()).append(granted)
+            try:
+                await granted  # _release() hands its slot straight to us
+            except asyncio.CancelledError:
+                if granted.done() and not granted.cancelled():
+                    self._release(agent)  # granted just as we were cancelled
+                else:
+                    self._forget(agent, job_id, granted)
+                raise
+        try:
+            yield
+        finally:
+            self._release(agent)
+
+    def _release(self, agent: str) -> None:
+        jobs = self._waiting.get(agent)
+        while jobs:
+            job_id, waiters = next(iter(jobs.items()))
+            granted = waiters.popleft()
+            if waiters:
+                jobs.move_to_end(job_id)  # this job goes to the back of the line
+            else:
+                del jobs[job_id]
+            if not granted.done():
+                granted.set_result(None)
+                return
+        self._active[agent] -= 1
+
+    def _forget(self, agent: str, job_id: str, granted: asyncio.Future) -> None:
+        waiters = self._waiting.get(agent, {}).get(job_id)
+        if waiters and granted in waiters:
+            waiters.remove(granted)
+            if not waiters:
+                del self._waiting[agent][job_id]
+
+
+class BenchmarkJob:
+    def __init__(self, agent_keys: list[str], prompts: list[dict], timeout: float):
+        self.id = uuid.uuid4().hex
+        self.agent_keys = agent_keys
+        self.prompts = prompts
+        self.timeout = timeout
+        self.status = "queued"
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.completed = 0
+        self.results: list[dict] = []
+        self.events: list[dict] = []
+        self._changed = asyncio.Event()
+        # results / events already pushed to Redis (see JobService._mirror)
+        self.mirrored = (0, 0)
+        self.mirror_lock = asyncio.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def publish(self, event: dict) -> None:
+        self.events.append(event)
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, seen: int, timeout: float) -> None:
+        """Return once there are more than *seen* events, the job ends or *timeout* passes."""
+        if len(self.events) > seen or self.finished:
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def snapshot(self, results_from: int | None = 0, events_from: int | None = 0) -> dict:
+        """Status plus results / events from the given index (None = leave them out)."""
+        snapshot = self.status_snapshot()
+        if results_from is not None:
+            snapshot["results"] = self.results[results_from:]
+        if events_from is not None:
+            snapshot["events"] = self.events[events_from:]
+        return snapshot
+
+    def status_snapshot(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "agents": self.agent_keys,
+            "timeout": self.timeout,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {"completed": self.completed, "total": len(self.prompts)},
+        }
+
+
+def _summarise(record: dict) -> dict:
+    """The part of a result row a progress event carries."""
+    return {
+        "agent_key": record["agent_key"],
+        "ok": record["error_meta"].get("ok", True),
+        "passed": record["validation"]["passed"],
+        "latency_sec": record["latency_sec"],
+    }
+
+
+class JobService:
+    def __init__(self, workers: int, max_queue: int, agent_concurrency: int, results_path: str):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.results_path = Path(results_path)
+        self.limiter = AgentLimiter(agent_concurrency)
+        self.registry: dict = {}
+        self.redis = None
+        self._jobs: OrderedDict[str, BenchmarkJob] = OrderedDict()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        self._running: dict[str, asyncio.Task] = {}
+        self._save_lock = asyncio.Lock()  # one appender to the results file at a time
+
+    def start(self, registry: dict, redis_client) -> None:
+        self.registry = registry
+        self.redis = redis_client
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self) -> None:
+        for task in [*self._tasks, *self._running.values()]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "queued": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "agents": self.limiter.stats(),
+        }
+
+    # -- submission / lookup -------------------------------------------------
+
+    async def submit(self, agent_keys: list[str], prompts: list[dict], timeout: float) -> BenchmarkJob:
+        if self._queue.qsize() >= self.max_queue:
+            raise JobQueueFullError(f"{self._queue.qsize()} benchmark jobs already queued")
+        job = BenchmarkJob(agent_keys, prompts, timeout)
+        self._jobs[job.id] = job
+        self._forget_old_jobs()
+        job.publish({"type": "queued", "job_id": job.id, "position": self._queue.qsize() + 1,
+                     "total": len(prompts)})
+        await self._mirror(job)
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> BenchmarkJob | None:
+        return self._jobs.get(job_id)
+
+    async def load_snapshot(self, job_id: str, results_from: int | None = 0,
+                            events_from: int | None = 0) -> dict | None:
+        """
+        A job's snapshot (see BenchmarkJob.snapshot): from memory if this
+        worker owns it, else from Redis.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot(results_from, events_from)
+        if not self.redis:
+            return None
+        key = JOB_PREFIX + job_id
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.get(key)
+            if results_from is not None:
+                pipe.lrange(key + ":results", results_from, -1)
+            if events_from is not None:
+                pipe.lrange(key + ":events", events_from, -1)
+            raw, *lists = await pipe.execute()
+        except RedisError:
+            return None
+        if not raw:
+            return None
+        snapshot = json.loads(raw)
+        for name, start in (("results", results_from), ("events", events_from)):
+            if start is not None:
+                snapshot[name] = [json.loads(item) for item in lists.pop(0)]
+        return snapshot
+
+    async def cancel(self, job_id: str) -> bool:
+        """Ask the job to stop; False if no worker knows it."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+                await self._mirror(job)
+            elif job.id in self._running:
+                self._running[job.id].cancel()
+            return True
+        if self.redis:
+            try:
+                if await self.redis.exists(JOB_PREFIX + job_id):
+                    await self.redis.set(JOB_PREFIX + job_id + ":cancel", 1, ex=JOB_TTL)
+                    return True
+            except RedisError:
+                pass
+        return False
+
+    def _forget_old_jobs(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - JOBS_KEPT)]:
+            del self._jobs[job_id]
+
+    async def _mirror(self, job: BenchmarkJob) -> None:
+        """Rewrite the status and append only the results / events Redis hasn't got."""
+        if not self.redis:
+            return
+        key = JOB_PREFIX + job.id
+        async with job.mirror_lock:  # two prompts finishing together must not push the same rows
+            results_done, events_done = job.mirrored
+            results, events = job.results[results_done:], job.events[events_done:]
+            try:
+                pipe = self.redis.pipeline(transaction=True)
+                pipe.set(key, json.dumps(job.status_snapshot()), ex=JOB_TTL)
+                for suffix, items in ((":results", results), (":events", events)):
+                    if items:
+                        pipe.rpush(key + suffix, *(json.dumps(item) for item in items))
+                    pipe.expire(key + suffix, JOB_TTL)
+                await pipe.execute()
+            except RedisError:
+                return  # retried from the same place next time
+            job.mirrored = (results_done + len(results), events_done + len(events))
+
+    async def _cancel_requested(self, job: BenchmarkJob) -> bool:
+        if not self.redis:
+            return False
+        try:
+            return bool(await self.redis.exists(JOB_PREFIX + job.id + ":cancel"))
+        except RedisError:
+            return False
+
+    # -- execution -------------------------------------------------------------
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if job.finished:
+                continue  # cancelled while queued
+            task = asyncio.create_task(self._run(job))
+            self._running[job.id] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise  # the worker itself is shutting down
+                self._finish(job, "cancelled")
+                await self._mirror(job)
+            finally:
+                self._running.pop(job.id, None)
+
+    def _finish(self, job: BenchmarkJob, status: str, error: str | None = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        job.publish({"type": "done", "job_id": job.id, "status": status, "error": error,
+                     "completed": job.completed, "total": len(job.prompts)})
+
+    async def _run(self, job: BenchmarkJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        job.publish({"type": "started", "job_id": job.id, "total": len(job.prompts)})
+        await self._mirror(job)
+
+        # A job keeps at most one prompt per agent slot in flight, which is
+        # all the limiter would let through anyway.
+        window = asyncio.Semaphore(self.limiter.limit)
+
+        async def one(item: dict) -> None:
+            async with window:
+                if await self._cancel_requested(job):
+                    raise asyncio.CancelledError
+                records = await self._run_prompt(job, item)
+            job.results.extend(records)
+            job.completed += 1
+            completed = job.completed  # other prompts may finish while we write
+            async with self._save_lock:
+                await asyncio.to_thread(save_results, records, self.results_path)
+            job.publish({
+                "type": "progress", "job_id": job.id, "prompt_id": item["id"],
+                "completed": completed, "total": len(job.prompts),
+                "results": [_summarise(r) for r in records],
+            })
+            await self._mirror(job)
+
+        tasks = [asyncio.create_task(one(item)) for item in job.prompts]
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._finish(job, "cancelled")
+            await self._mirror(job)
+            return
+        except Exception as exc:
+            for task in tasks:
+                task.cancel()
+            self._finish(job, "failed", f"{type(exc).__name__}: {exc}")
+            await self._mirror(job)
+            return
+        self._finish(job, "completed")
+        await self._mirror(job)
+
+    async def _run_prompt(self, job: BenchmarkJob, item: dict) -> list[dict]:
+        fan_start = time.perf_counter()
+        answers = await asyncio.gather(*(self._call(job, key, item["prompt"]) for key in job.agent_keys))
+        fan_elapsed = time.perf_counter() - fan_start
+        ts = datetime.now(timezone.utc).isoformat()
+
+        records = []
+        for key, (result, latency) in zip(job.agent_keys, answers):
+            name, bot = self.registry[key]
+            response_text = bot.errorLogs.set_from_result(result)
+            error_meta = bot.errorLogs.get_meta()
+            records.append(build_record(item, key, name, response_text, error_meta, latency, fan_elapsed, ts))
+        return records
+
+    async def _call(self, job: BenchmarkJob, key: str, prompt: str) -> tuple[object, float | None]:
+        """(answer or exception, latency) for one agent; the timeout excludes slot waiting."""
+        _, bot = self.registry[key]
+        async with self.limiter.slot(key, job.id):
+            start = time.perf_counter()
+            try:
+                async with asyncio.timeout(job.timeout):
+                    parts = [text async for text in bot.astream(prompt)]
+            except Exception as exc:  # recorded in error_meta, like the CLI's return_exceptions=True
+                return exc, None
+            return "".join(parts), time.perf_counter() - start
@@ -0,0 +1,68 @@
+"""
+Per-worker in-memory LRU that sits in front of Redis.
+
+Dashboards hammer the same file, and every Redis hit still costs a network
+round-trip plus json.loads().  The L1 keeps the last L1_CACHE_SIZE parsed
+results for up to L1_CACHE_TTL seconds, so a hot key is a dict lookup.
+
+Entries remember which file they belong to.  When any worker recomputes a
+key it publishes an invalidation over Redis pub/sub (see api/main.py); the
+other workers drop that key and any older entries for the same file.
+"""
+
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (expires_at, path, value)
+        self._data: "OrderedDict[str, tuple[float, str, dict]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> dict | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: str, path: str, value: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, path, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str, path: str | None = None) -> int:
+        """Drop *key*, plus every entry for *path* (stale versions of that file)."""
+        stale = [k for k, (_, p, _) in self._data.items() if k == key or (path and p == path)]
+        for k in stale:
+            del self._data[k]
+        return len(stale)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -5,15 +5,47 @@ Wraps the C++ log_processor binary behind a REST API and adds Redis caching
 so repeated queries against the same log file don't re-run the binary.
 """
 
+import asyncio
+import base64
 import hashlib
 import json
 import os
-import subprocess
+import time
+import uuid
+from datetime import datetime, timezone
 from pathlib import Path
 
-import redis
-from fastapi import FastAPI, HTTPException, Query
+import redis.asyncio as aioredis
+from redis.exceptions import LockError, RedisError
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+
+from api.export import ExportError, ExportFilter, ExportScan, parse_fields, parse_where
+from api.fanout import fan_out
+from api.fingerprint import file_digest
+from api.jobs import FINISHED, JobQueueFullError, JobService
+from api.incremental import (
+    empty_state,
+    file_identity,
+    load_checkpoint,
+    make_checkpoint,
+    merge_partial,
+    render,
+    resume_point,
+    save_checkpoint,
+)
+from api.l1cache import LRUCache
+from api.metrics import REGISTRY, Exporter, MetricsMiddleware, default_dir, detach_request, phase, record_phase
+from api.native import NativeProcessor
+from api.responses import dumps, etag_matches, json_response, make_etag, not_modified
+from api.rollups import BUCKETS, RollupStore
+from api.runindex import OK_FALSE, OK_TRUE, RunIndex, parse_time_ms
+from api.singleflight import SingleFlight
+from api.tail import LogTailer, Subscriber
+from api.watch import FileWatcher
+from api.workers import ProcessorError, ProcessorGate, ProcessorPool, QueueFullError
 
 load_dotenv()
 
@@ -27,6 +59,14 @@ app = FastAPI(
     description="REST API for log processing, vector search, and LLM analysis",
 )
 
+# Server-Timing: every response says where its time went (cache_key, redis_get,
+# processor, ...).  Requests slower than SLOW_REQUEST_MS are also printed with
+# that breakdown (0 = off).
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") not in ("0", "false", "no")
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING, slow_request_ms=SLOW_REQUEST_MS)
+
 # ---------------------------------------------------------------------------
 # Redis connection
 # ---------------------------------------------------------------------------
@@ -36,7 +76,15 @@ app = FastAPI(
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # seconds, default 1 hour
 
-redis_client: redis.Redis | None = None
+# Pool sizing and timeouts.  Every uvicorn worker gets its own pool, so the
+# total number of Redis connections is REDIS_MAX_CONNECTIONS × workers.
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "20"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "2"))        # wait for a free connection
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))    # per command
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "1"))  # TCP connect
+
+redis_pool: aioredis.BlockingConnectionPool | None = None
+redis_client: aioredis.Redis | None = None
 
 
 @app.on_event("startup")
@@ -47,13 +95,287 @@ async def _connect_redis():
     If Redis is down at import time, a module-level connection would crash the
     entire process.  By deferring to startup we can let the app boot and
     gracefully degrade (cache misses still work, they just hit the binary).
+
+    Why the asyncio client?
+    ───────────────────────
+    The endpoints are ``async def``, so a blocking ``redis.Redis`` call stalls
+    the whole event loop of the worker while it waits on the network.  The
+    asyncio client yields during the round-trip, letting other requests run.
+    A *blocking* pool caps connections per worker: when all are busy, callers
+    wait up to REDIS_POOL_TIMEOUT instead of opening unbounded new sockets.
     """
-    global redis_client
+    global redis_pool, redis_client
+    redis_pool = aioredis.BlockingConnectionPool.from_url(
+        REDIS_URL,
+        decode_responses=True,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    )
+    redis_client = aioredis.Redis(connection_pool=redis_pool)
     try:
-        redis_client = redis.from_url(REDIS_URL, decode_responses=True)
-        redis_client.ping()
-    except redis.ConnectionError:
+        await redis_client.ping()
+    except RedisError:
+        await redis_client.aclose()
+        await redis_pool.disconnect()
         redis_client = None
+        redis_pool = None
+
+
+@app.on_event("shutdown")
+async def _disconnect_redis():
+    """Return pooled sockets to Redis cleanly when the worker exits."""
+    global redis_pool, redis_client
+    if redis_client:
+        await redis_client.aclose()
+    if redis_pool:
+        await redis_pool.disconnect()
+    redis_client = None
+    redis_pool = None
+
+
+@app.on_event("startup")
+async def _start_processor_pool():
+    """
+    Spin up the log_processor workers.  If the binary is missing we leave the
+    pool disabled — /health reports it and misses fall back to one-shot runs.
+    """
+    global processor_pool
+    if PROCESSOR_POOL_SIZE <= 0:
+        return
+    pool = ProcessorPool(CPP_BINARY, PROCESSOR_POOL_SIZE, PROCESSOR_TIMEOUT)
+    try:
+        await pool.start()
+    except OSError:
+        await pool.close()
+        return
+    processor_pool = pool
+
+
+@app.on_event("startup")
+async def _load_native_processor():
+    """Load liblog_processor if configured; a bad path just leaves it off."""
+    global native_processor
+    if not PROCESSOR_LIB_PATH:
+        return
+    try:
+        native_processor = NativeProcessor(PROCESSOR_LIB_PATH)
+    except OSError:
+        native_processor = None
+
+
+@app.on_event("shutdown")
+async def _stop_processor_pool():
+    global processor_pool
+    if processor_pool:
+        await processor_pool.close()
+    processor_pool = None
+
+
+async def _listen_for_invalidations():
+    """
+    Evict L1 entries that another worker has just recomputed.
+
+    Why get_message() with a timeout instead of listen()?
+    ─────────────────────────────────────────────────────
+    listen() blocks on the socket and trips REDIS_SOCKET_TIMEOUT whenever
+    the channel is quiet.  Polling with a timeout just returns None instead.
+    """
+    while redis_client is not None:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                data = json.loads(message["data"])
+                if data.get("origin") != WORKER_ID:
+                    l1_cache.invalidate(data["key"], data.get("path"))
+        except (RedisError, ValueError, KeyError):
+            await asyncio.sleep(1)  # Redis blipped or a bad message — resubscribe
+        finally:
+            await pubsub.aclose()
+
+
+@app.on_event("startup")
+async def _start_invalidation_listener():
+    global _invalidation_task
+    if redis_client is not None and L1_CACHE_SIZE > 0:
+        _invalidation_task = asyncio.create_task(_listen_for_invalidations())
+
+
+@app.on_event("shutdown")
+async def _stop_invalidation_listener():
+    global _invalidation_task
+    if _invalidation_task:
+        _invalidation_task.cancel()
+        try:
+            await _invalidation_task
+        except asyncio.CancelledError:
+            pass
+    _invalidation_task = None
+
+
+# ---------------------------------------------------------------------------
+# LLM agents (POST /api/run)
+# ---------------------------------------------------------------------------
+# key -> (display name, agent), from llm.client.build_registry().  Agents
+# whose API key is missing are skipped there; if the LLM SDKs aren't
+# installed at all the registry stays empty and /api/run answers 503.
+
+agent_registry: dict = {}
+
+
+@app.on_event("startup")
+async def _load_agents():
+    global agent_registry
+    try:
+        from llm.client import build_registry
+    except ImportError as exc:
+        print(f"[warn] LLM agents unavailable: {exc}")
+        return
+    agent_registry = await asyncio.to_thread(build_registry)
+
+
+# ---------------------------------------------------------------------------
+# Benchmark jobs (POST /api/benchmark)
+# ---------------------------------------------------------------------------
+# A few jobs run at once per worker, the rest queue; every job's agent calls
+# share one per-agent concurrency limit (see api/jobs.py).
+
+BENCHMARK_WORKERS = int(os.getenv("BENCHMARK_WORKERS", "2"))
+BENCHMARK_QUEUE_LIMIT = int(os.getenv("BENCHMARK_QUEUE_LIMIT", "16"))
+BENCHMARK_AGENT_CONCURRENCY = int(os.getenv("BENCHMARK_AGENT_CONCURRENCY", "2"))
+BENCHMARK_POLL = 1.0  # seconds between snapshot polls when another worker owns the job
+
+benchmark_jobs: JobService | None = None
+
+
+@app.on_event("startup")
+async def _start_benchmark_jobs():
+    global benchmark_jobs
+    benchmark_jobs = JobService(
+        BENCHMARK_WORKERS, BENCHMARK_QUEUE_LIMIT, BENCHMARK_AGENT_CONCURRENCY, BENCHMARK_FILE,
+    )
+    benchmark_jobs.start(agent_registry, redis_client)
+
+
+@app.on_event("shutdown")
+async def _stop_benchmark_jobs():
+    global benchmark_jobs
+    if benchmark_jobs:
+        await benchmark_jobs.close()
+    benchmark_jobs = None
+
+
+# ---------------------------------------------------------------------------
+# Prewarming and background recompute
+# ---------------------------------------------------------------------------
+# LOG_FILE_PATH, the files in WATCH_FILES and every file /process-logs has
+# been asked about are watched; when one settles after a change, its
+# aggregate is recomputed (and its /api/runs index and /stats rollups refreshed)
+# before anybody asks.  On startup the same warm-up runs once for the
+# configured files.  See api/watch.py for the debounce rules.
+
+PREWARM = os.getenv("PREWARM", "1") not in ("0", "false", "no")
+WATCH_FILES = [p.strip() for p in os.getenv("WATCH_FILES", "").split(",") if p.strip()]
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "1"))     # seconds between polls, 0 = don't watch
+WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", "2"))     # quiet time before a recompute
+WATCH_MAX_DELAY = float(os.getenv("WATCH_MAX_DELAY", "30"))  # recompute at least this often while busy
+WATCH_MAX_FILES = int(os.getenv("WATCH_MAX_FILES", "32"))  # request-registered files; configured ones don't count
+
+warm_metrics = {"computed": 0, "from_l2": 0}
+
+
+async def _warm(path: str) -> None:
+    """Put a fresh aggregate for *path* into L1 and Redis, and refresh its sidecars."""
+    if not Path(path).is_file():
+        return
+    key = _cache_key(path)
+    scope = _scope(path, None)
+
+    cached = None
+    if redis_client:
+        try:
+            cached = await redis_client.get(key)
+        except RedisError:
+            pass
+    if cached:
+        l1_cache.set(key, scope, json.loads(cached))  # another worker already did it
+        warm_metrics["from_l2"] += 1
+    else:
+        (result, scan, _), _ = await _inflight.do(key, lambda: _compute_and_store(key, path))
+        l1_cache.set(key, scope, {**result, "scan": scan})
+        warm_metrics["computed"] += 1
+
+    # Only sidecars someone already uses (plus the main log's) — don't litter
+    # arbitrary directories with .idx / .rollups files.
+    main_log = os.path.abspath(path) == os.path.abspath(LOG_FILE)
+    if main_log or os.path.exists(path + ".rollups"):
+        await _rollup_store(path)
+    if main_log or os.path.exists(path + ".idx"):
+        await _run_index(path)
+
+
+file_watcher = FileWatcher(_warm, WATCH_INTERVAL, WATCH_DEBOUNCE, WATCH_MAX_DELAY, WATCH_MAX_FILES)
+_prewarm_task: asyncio.Task | None = None
+
+
+@app.on_event("startup")
+async def _start_file_watcher():
+    """Runs after Redis and the processor backends are up (hooks run in order)."""
+    global _prewarm_task
+    for path in [LOG_FILE, *WATCH_FILES]:
+        file_watcher.add(path, pinned=True)
+    file_watcher.start()
+
+    if PREWARM:
+        async def prewarm():
+            for path in file_watcher.paths():
+                try:
+                    await _warm(path)
+                except Exception as exc:
+                    print(f"[warn] prewarming {path} failed: {exc!r}")
+
+        # In the background: the server takes requests right away, and any
+        # that arrive for a file being warmed join that computation.
+        _prewarm_task = asyncio.create_task(prewarm())
+
+
+@app.on_event("shutdown")
+async def _stop_file_watcher():
+    if _prewarm_task is not None:
+        _prewarm_task.cancel()
+    await file_watcher.close()
+
+
+@app.on_event("shutdown")
+async def _stop_tailers():
+    for tailer in _tailers.values():
+        await tailer.close()
+    _tailers.clear()
+
+
+def _redis_pool_stats() -> dict:
+    """Snapshot of the connection pool for /health (this worker only)."""
+    if redis_pool is None:
+        return {"max_connections": REDIS_MAX_CONNECTIONS, "in_use": 0, "idle": 0}
+    return {
+        "max_connections": redis_pool.max_connections,
+        "in_use": _pool_count(redis_pool, "_in_use_connections"),
+        "idle": _pool_count(redis_pool, "_available_connections"),
+    }
+
+
+def _pool_count(pool, attr: str) -> int | None:
+    # redis-py has no public accessor for these; report null rather than fail
+    # /health if a release renames or reshapes them.
+    try:
+        return len(getattr(pool, attr))
+    except (AttributeError, TypeError):
+        return None
 
 
 # ---------------------------------------------------------------------------
@@ -62,51 +384,600 @@ async def _connect_redis():
 
 CPP_BINARY = os.getenv("CPP_BINARY_PATH", "cpp/log_processor")
 LOG_FILE = os.getenv("LOG_FILE_PATH", "data/runs.jsonl")
+BENCHMARK_FILE = os.getenv("BENCHMARK_FILE_PATH", "data/benchmark_results.jsonl")
+EXPORT_SOURCES = {"runs": LOG_FILE, "benchmarks": BENCHMARK_FILE}
+EXPORT_MODEL_FALLBACK = {"benchmarks": "agent_name"}  # see ExportFilter.model_fallback
+
+# Endpoints that read a client-chosen ?file= (and may write an index next to
+# it) only accept the configured logs and *.jsonl files under LOG_DATA_DIR.
+LOG_DATA_DIR = os.getenv("LOG_DATA_DIR", "data")
+
 
+def resolve_log_file(file: str | None, default: str) -> str:
+    """
+    Check a ?file= parameter against the allowlist; 403 if it isn't on it,
+    404 if it doesn't exist.  Symlinks and `..` are resolved before checking.
+    """
+    target = file or default
+    real = os.path.realpath(target)
+    allowed = {os.path.realpath(p) for p in (LOG_FILE, BENCHMARK_FILE, *WATCH_FILES)}
+    data_dir = os.path.realpath(LOG_DATA_DIR) if LOG_DATA_DIR else None
+    in_data_dir = (
+        data_dir is not None
+        and real.endswith(".jsonl")
+        and os.path.commonpath([real, data_dir]) == data_dir
+    )
+    if real not in allowed and not in_data_dir:
+        raise HTTPException(status_code=403, detail=f"File not allowed: {target}")
+    if not Path(real).is_file():
+        raise HTTPException(status_code=404, detail=f"File not found: {target}")
+    return target
+
+# Long-lived `log_processor --serve` workers per uvicorn worker.
+# 0 disables the pool and spawns the binary once per cache miss.
+PROCESSOR_POOL_SIZE = int(os.getenv("PROCESSOR_POOL_SIZE", "2"))
+PROCESSOR_TIMEOUT = float(os.getenv("PROCESSOR_TIMEOUT", "30"))  # per-request deadline, seconds
+
+# In-process shared-library build of the processor (see api/native.py).
+# When set and loadable it takes precedence over the worker pool.
+PROCESSOR_LIB_PATH = os.getenv("PROCESSOR_LIB_PATH", "")
+
+# Bounded concurrency for scans, whatever the backend.  Requests beyond
+# PROCESSOR_CONCURRENCY wait in a queue of at most PROCESSOR_QUEUE_LIMIT;
+# past that they get a 503 instead of stacking up behind a slow scan.
+PROCESSOR_CONCURRENCY = int(os.getenv("PROCESSOR_CONCURRENCY", "4"))
+PROCESSOR_QUEUE_LIMIT = int(os.getenv("PROCESSOR_QUEUE_LIMIT", "32"))
+DISCONNECT_POLL = 0.5  # seconds between client-disconnect checks
+
+processor_pool: ProcessorPool | None = None
+native_processor: NativeProcessor | None = None
+processor_gate = ProcessorGate(PROCESSOR_CONCURRENCY, PROCESSOR_QUEUE_LIMIT)
+
+# "fingerprint" (stat + sampled blocks, O(1) reads) or "content" (full SHA-256).
+CACHE_KEY_MODE = os.getenv("CACHE_KEY_MODE", "fingerprint")
+
+# Cross-worker single-flight.  The lock must outlive the 30 s binary timeout,
+# otherwise a slow run would let a second worker start the same computation.
+CACHE_LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", "35"))   # seconds
+CACHE_LOCK_POLL = float(os.getenv("CACHE_LOCK_POLL", "0.05"))       # seconds
+
+# In-process L1 in front of Redis (L2).  0 entries disables it.
+L1_CACHE_SIZE = int(os.getenv("L1_CACHE_SIZE", "128"))
+L1_CACHE_TTL = float(os.getenv("L1_CACHE_TTL", "60"))  # seconds
+INVALIDATION_CHANNEL = "logproc:invalidate"
+WORKER_ID = uuid.uuid4().hex  # lets a worker ignore its own invalidations
+
+# Stale-while-revalidate, per endpoint.  After the log changes, the previous
+# aggregate is served immediately (and refreshed in the background) as long as
+#   * the file changed at most `window` seconds ago, and
+#   * the aggregate itself is at most `max_staleness` seconds old.
+# Outside those bounds the request waits for a fresh result.  window=0 disables.
+SWR_POLICIES = {
+    "/process-logs": {
+        "window": float(os.getenv("PROCESS_LOGS_SWR_WINDOW", "30")),
+        "max_staleness": float(os.getenv("PROCESS_LOGS_MAX_STALENESS", "300")),
+    },
+}
+
+# /process-logs since/until are widened to whole FILTER_TIME_BUCKET_SEC steps
+# (since down, until up) before they key a cache entry and a checkpoint, so
+# a rolling "last N hours" query shares both for a bucket instead of paying
+# for a full scan on every request.  0 = exact bounds.
+FILTER_TIME_BUCKET_SEC = int(os.getenv("FILTER_TIME_BUCKET_SEC", "60"))
+
+# /api/runs pagination.  A page examines at most RUNS_SCAN_CAP index records, so a
+# very selective filter returns a short page (with a cursor) rather than a slow one.
+RUNS_PAGE_MAX = 500
+RUNS_SCAN_CAP = int(os.getenv("RUNS_SCAN_CAP", "200000"))
+
+_run_indexes: dict[str, RunIndex] = {}
+_run_index_locks: dict[str, asyncio.Lock] = {}
+
+# Live tail.  One shared reader per file per worker; each subscriber buffers
+# at most TAIL_BUFFER_BATCHES polls' worth of records before the oldest drop.
+TAIL_POLL_INTERVAL = float(os.getenv("TAIL_POLL_INTERVAL", "0.5"))  # seconds
+TAIL_BUFFER_BATCHES = int(os.getenv("TAIL_BUFFER_BATCHES", "64"))
+TAIL_HEARTBEAT = 15.0  # seconds between keepalives on an idle stream
+
+_tailers: dict[str, LogTailer] = {}
+
+# /stats rollups.  Default window when `from` is omitted, per bucket size.
+STATS_DEFAULT_SPAN = {"minute": 3_600_000, "hour": 86_400_000, "day": 30 * 86_400_000}
+STATS_MAX_BUCKETS = int(os.getenv("STATS_MAX_BUCKETS", "10000"))
+
+_rollups: dict[str, RollupStore] = {}
+
+_inflight = SingleFlight()
+_background: set[asyncio.Task] = set()  # strong refs so refreshes aren't GC'd
+l1_cache = LRUCache(L1_CACHE_SIZE, L1_CACHE_TTL)
+_invalidation_task: asyncio.Task | None = None
+
+# Per-worker counters.  Plain ints are safe here: everything touching them
+# runs on the event loop thread.  L1 keeps its own counters (LRUCache.stats).
+cache_metrics = {
+    "l2_hits": 0,
+    "l2_misses": 0,
+    "misses": 0,            # computed here
+    "stale": 0,             # served a previous aggregate while refreshing
+    "not_modified": 0,      # answered 304 to If-None-Match
+    "coalesced_local": 0,   # waited on a computation in this worker
+    "coalesced_remote": 0,  # waited on another worker / node via Redis lock
+}
+
+
+# ---------------------------------------------------------------------------
+# Metrics (/metrics)
+# ---------------------------------------------------------------------------
+# Request and phase histograms are recorded inline (see api/metrics.py); the
+# values below are copied from the stats we already keep when /metrics is
+# scraped, so the hot paths don't pay for them twice.
+
+METRICS_DIR = os.getenv("METRICS_DIR") or default_dir()
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # seconds
+
+CACHE_EVENTS = REGISTRY.counter(
+    "logproc_cache_events_total", "L1/L2 lookups and how misses were resolved", ("event",),
+)
+SUBPROCESSES_INFLIGHT = REGISTRY.gauge(
+    "logproc_subprocesses_inflight", "One-shot log_processor children currently running",
+)
+PROCESSOR_SLOTS = REGISTRY.gauge(
+    "logproc_processor_scans", "Scans holding or waiting for a processor slot", ("state",),
+)
+PROCESSOR_REJECTED = REGISTRY.counter(
+    "logproc_processor_rejected_total", "Scans refused because the processor queue was full",
+)
+POOL_WORKERS = REGISTRY.gauge(
+    "logproc_pool_workers", "Persistent log_processor --serve workers", ("state",),
+)
+POOL_RESTARTS = REGISTRY.counter(
+    "logproc_pool_restarts_total", "Persistent workers replaced after dying or misbehaving",
+)
+TAIL_SUBSCRIBERS = REGISTRY.gauge("logproc_tail_subscribers", "Clients attached to a live tail")
+BENCHMARK_JOBS = REGISTRY.gauge("benchmark_jobs", "Benchmark jobs in this state", ("state",))
+AGENT_LATENCY = REGISTRY.summary(
+    "llm_agent_latency_seconds",
+    "Agent call latency; quantiles over each agent's last AgentLatencyAnalysis window",
+    ("agent",),
+)
+
+metrics_exporter = Exporter(REGISTRY, METRICS_DIR, METRICS_FLUSH_INTERVAL)
+
+
+@REGISTRY.collector
+def _collect_metrics():
+    for event, count in cache_metrics.items():
+        CACHE_EVENTS.set(count, event)
+    CACHE_EVENTS.set(l1_cache.hits, "l1_hits")
+    CACHE_EVENTS.set(l1_cache.misses, "l1_misses")
+    CACHE_EVENTS.set(l1_cache.evictions, "l1_evictions")
+    CACHE_EVENTS.set(warm_metrics["computed"], "warm_computed")
+    CACHE_EVENTS.set(warm_metrics["from_l2"], "warm_from_l2")
+
+    PROCESSOR_SLOTS.set(processor_gate.running, "running")
+    PROCESSOR_SLOTS.set(processor_gate.waiting, "waiting")
+    PROCESSOR_REJECTED.set(processor_gate.rejected)
+    if processor_pool is not None:
+        pool = processor_pool.stats()
+        POOL_WORKERS.set(pool["idle"], "idle")
+        POOL_WORKERS.set(pool["size"] - pool["idle"], "busy")
+        POOL_RESTARTS.set(pool["restarts"])
+
+    TAIL_SUBSCRIBERS.set(sum(len(t) for t in _tailers.values()))
+    if benchmark_jobs is not None:
+        jobs = benchmark_jobs.stats()
+        BENCHMARK_JOBS.set(jobs["running"], "running")
+        BENCHMARK_JOBS.set(jobs["queued"], "queued")
+
+    # Agents run in-process only in this worker's registry; their latency
+    # windows are written from worker threads, so read them here, not inline.
+    for name, bot in agent_registry.values():
+        monitor = bot.monitor
+        latencies = monitor.get_latency_metrics()
+        if latencies:
+            AGENT_LATENCY.set(
+                (latencies["p50"], latencies["p95"], latencies["p99"]),
+                monitor.count, monitor.total, name,
+            )
+
+
+@app.on_event("startup")
+async def _start_metrics_exporter():
+    metrics_exporter.start()
+
+
+@app.on_event("shutdown")
+async def _stop_metrics_exporter():
+    await metrics_exporter.close()
 
-def _cache_key(file_path: str) -> str:
+
+def _cache_key(file_path: str, filters: dict | None = None) -> str:
     """
-    Build a cache key from the file content hash.
+    Build a cache key from the file's fingerprint.
 
-    Why hash the *content* instead of the file path?
-    ─────────────────────────────────────────────────
+    Why not just the file path?
+    ───────────────────────────
     If the user appends new log lines, the path stays the same but the data
-    changes.  Hashing the content means we automatically bust the cache when
-    the file is modified — no manual invalidation needed.
+    changes.  Keying on the file's identity + content means we automatically
+    bust the cache when the file is modified — no manual invalidation needed.
+
+    The digest is memoized per worker against (inode, size, mtime_ns), so a
+    cache hit on an unchanged file costs one stat() rather than a full read.
+    See api/fingerprint.py for the two CACHE_KEY_MODE options.
+
+    Filtered requests append a digest of the filter set, so each filter
+    combination is cached (and invalidated) on its own.
     """
-    content = Path(file_path).read_bytes()
-    digest = hashlib.sha256(content).hexdigest()
-    return f"logproc:{digest}"
+    digest = file_digest(file_path, CACHE_KEY_MODE)
+    key = f"logproc:{digest}" if CACHE_KEY_MODE == "content" else f"logproc:fp:{digest}"
+    variant = _filter_key(filters)
+    return f"{key}:f:{variant}" if variant else key
+
+
+def _filter_key(filters: dict | None) -> str:
+    """Stable id for a filter set ("" = unfiltered); keys caches and checkpoints."""
+    if not filters:
+        return ""
+    return hashlib.sha256(json.dumps(filters, sort_keys=True).encode()).hexdigest()[:16]
+
 
+def _scope(file_path: str, filters: dict | None) -> str:
+    """What L1 entries / invalidations are grouped by: the file plus its filter set."""
+    path = os.path.abspath(file_path)
+    variant = _filter_key(filters)
+    return f"{path}#{variant}" if variant else path
 
-def _run_cpp_processor(file_path: str) -> dict:
+
+async def _run_cpp_processor(file_path: str, offset: int = 0, filters: dict | None = None) -> dict:
     """
-    Shell out to the C++ binary and parse its stdout.
+    Spawn the C++ binary in --partial mode and parse its stdout.
+
+    The binary prints one JSON object covering bytes [offset, end_offset):
+        {"start_offset": 0, "end_offset": 624510, "total_lines": 138,
+         "agents": {"<model>": {"total": .., "errors": .., "latency": {...}}}}
 
-    The binary prints two lines:
-        Total lines: 123
-        Error lines: 45
+    Why asyncio subprocesses?
+    ─────────────────────────
+    A blocking subprocess.run() inside an async endpoint freezes every other
+    request on the worker until the binary exits.  Here we only await its
+    pipes.  If we time out or get cancelled (the client went away) the child
+    is killed rather than left to finish work nobody will read.
     """
-    result = subprocess.run(
-        [CPP_BINARY, file_path],
-        capture_output=True,
-        text=True,
-        timeout=30,
-    )
+    with phase("spawn"):
+        proc = await asyncio.create_subprocess_exec(
+            CPP_BINARY, "--partial", "--offset", str(offset), *_filter_args(filters), file_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    with phase("processor"):
+        SUBPROCESSES_INFLIGHT.inc()
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), PROCESSOR_TIMEOUT)
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+            raise
+        finally:
+            SUBPROCESSES_INFLIGHT.dec()
 
-    if result.returncode != 0:
+    if proc.returncode != 0:
         raise HTTPException(
             status_code=500,
-            detail=f"log_processor failed: {result.stderr.strip()}",
+            detail=f"log_processor failed: {stderr.decode(errors='replace').strip()}",
+        )
+
+    with phase("json_parse"):
+        return json.loads(stdout)
+
+
+def _filter_args(filters: dict | None) -> list[str]:
+    """Command-line form of a filter dict for a one-shot log_processor run."""
+    args = []
+    for key, flag in (("agent", "--agent"), ("error_type", "--error-type"),
+                      ("since_ms", "--since"), ("until_ms", "--until")):
+        if (filters or {}).get(key) is not None:
+            args += [flag, str(filters[key])]
+    if (filters or {}).get("validation") is not None:
+        args += ["--validation", "passed" if filters["validation"] else "failed"]
+    return args
+
+
+async def _scan(file_path: str, offset: int, filters: dict | None = None) -> dict:
+    """
+    Get the partial aggregate for *file_path* from *offset*.
+
+    Backends, in order of preference:
+        1. the shared library, in-process (PROCESSOR_LIB_PATH)
+        2. the persistent worker pool (PROCESSOR_POOL_SIZE)
+        3. one-shot spawn of the binary
+
+    All of them go through processor_gate.  The library call can't be
+    interrupted once it has started; the other two kill their child process
+    on cancellation.
+    """
+    queued = time.perf_counter()
+    try:
+        async with processor_gate.slot():
+            record_phase("queue_wait", time.perf_counter() - queued)
+            if native_processor is not None:
+                with phase("processor"):
+                    return await asyncio.to_thread(native_processor.scan_file, file_path, offset, filters)
+            if processor_pool is not None:
+                return await processor_pool.scan(file_path, offset, filters)
+            return await _run_cpp_processor(file_path, offset, filters)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=503, detail=f"log_processor queue is full: {exc}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="log_processor timed out")
+    except ProcessorError as exc:
+        raise HTTPException(status_code=500, detail=f"log_processor failed: {exc}")
+
+
+async def _until_disconnected(request: Request, aw):
+    """
+    Await *aw*, cancelling it if the client disconnects first.
+
+    Starlette doesn't cancel a handler when its client goes away, so without
+    this an abandoned request would still run log_processor to completion.
+    """
+    task = asyncio.ensure_future(aw)
+
+    async def watch():
+        while not task.done():
+            if await request.is_disconnected():
+                task.cancel()
+                return
+            await asyncio.sleep(DISCONNECT_POLL)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if watcher.done() and not watcher.cancelled():
+            raise HTTPException(status_code=499, detail="Client disconnected")
+        raise
+    finally:
+        watcher.cancel()
+
+
+async def _aggregate(file_path: str, filters: dict | None = None) -> tuple[dict, str]:
+    """
+    Aggregate *file_path*, scanning only bytes appended since the last run.
+
+    Returns (stats, scan) where scan is "incremental" or "full".
+    See api/incremental.py for how truncation / rotation are detected.
+    """
+    variant = _filter_key(filters)
+    with phase("checkpoint_load"):
+        checkpoint = await load_checkpoint(redis_client, file_path, variant)
+    identity = file_identity(file_path)  # before the scan: see make_checkpoint()
+    offset, state = resume_point(file_path, checkpoint)
+
+    partial = await _scan(file_path, offset, filters)
+    with phase("merge"):
+        state = merge_partial(state, partial)
+
+    with phase("checkpoint_save"):
+        await save_checkpoint(
+            redis_client, file_path,
+            make_checkpoint(identity, state, partial["end_offset"]),
+            variant,
+            ttl=CACHE_TTL if variant else None,  # filter sets are open-ended
         )
+    return render(state), ("incremental" if offset else "full")
+
+
+async def _wait_for_remote(key: str, lock_key: str) -> dict | None:
+    """
+    Another worker holds the lock for *key* — poll until its result lands in
+    the cache.  Returns None if the lock disappears (holder crashed / timed
+    out) without a result, so the caller computes it itself.
+    """
+    deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(CACHE_LOCK_POLL)
+        cached = await redis_client.get(key)
+        if cached:
+            return json.loads(cached)
+        if not await redis_client.exists(lock_key):
+            return None
+    return None
+
+
+async def _compute_and_store(key: str, target: str, filters: dict | None = None) -> tuple[dict, str, str]:
+    """
+    Produce the result for *key*, at most once across all workers.
 
-    # Parse "Total lines: N" / "Error lines: N"
-    parsed = {}
-    for line in result.stdout.strip().splitlines():
-        key, _, value = line.partition(":")
-        parsed[key.strip().lower().replace(" ", "_")] = int(value.strip())
+    Returns (result, scan, cache) — cache is "miss" if we ran the binary or
+    "coalesced" if another worker did it for us.
 
-    return parsed
+    Why a Redis lock on top of SingleFlight?
+    ────────────────────────────────────────
+    SingleFlight only sees requests in this process.  With several uvicorn
+    workers (or several nodes) the lock makes sure only one of them runs
+    log_processor per key.  The lock expires after CACHE_LOCK_TIMEOUT so a
+    crashed holder can't wedge everyone else.
+    """
+    lock = None
+    if redis_client:
+        lock_key = f"{key}:lock"
+        try:
+            lock = redis_client.lock(lock_key, timeout=CACHE_LOCK_TIMEOUT)
+            if not await lock.acquire(blocking=False):
+                lock = None
+                remote = await _wait_for_remote(key, lock_key)
+                if remote is not None:
+                    return remote, remote.get("scan", "full"), "coalesced"
+        except RedisError:
+            lock = None  # degrade gracefully: compute without coordination
+
+    try:
+        result, scan = await _aggregate(target, filters)
+        result = {**result, "computed_at": time.time()}
+
+        path = _scope(target, filters)
+        l1_cache.invalidate(key, path)
+
+        if redis_client:
+            try:
+                with phase("redis_set"):
+                    await redis_client.setex(key, CACHE_TTL, json.dumps({**result, "scan": scan}))
+                    await redis_client.publish(
+                        INVALIDATION_CHANNEL,
+                        json.dumps({"origin": WORKER_ID, "key": key, "path": path}),
+                    )
+            except RedisError:
+                pass
+
+        return result, scan, "miss"
+    finally:
+        if lock is not None:
+            try:
+                await lock.release()
+            except (LockError, RedisError):
+                pass  # expired or Redis went away — TTL cleans it up
+
+
+def _cache_stats() -> dict:
+    """L1 / L2 hit ratios are reported separately — see /health."""
+    l2_lookups = cache_metrics["l2_hits"] + cache_metrics["l2_misses"]
+    return {
+        "l1": l1_cache.stats(),
+        "l2": {
+            "hits": cache_metrics["l2_hits"],
+            "misses": cache_metrics["l2_misses"],
+            "hit_ratio": cache_metrics["l2_hits"] / l2_lookups if l2_lookups else 0.0,
+        },
+        "misses": cache_metrics["misses"],
+        "stale": cache_metrics["stale"],
+        "not_modified": cache_metrics["not_modified"],
+        "coalesced_local": cache_metrics["coalesced_local"],
+        "coalesced_remote": cache_metrics["coalesced_remote"],
+        "inflight": _inflight.inflight(),
+    }
+
+
+async def _stale_result(target: str, endpoint: str, filters: dict | None = None) -> dict | None:
+    """
+    The previous aggregate for *target*, if the endpoint's SWR policy allows
+    serving it.  It comes from the incremental checkpoint, which always holds
+    the last state we computed for the file.
+    """
+    policy = SWR_POLICIES[endpoint]
+    if policy["window"] <= 0:
+        return None
+
+    checkpoint = await load_checkpoint(redis_client, target, _filter_key(filters))
+    if not checkpoint or "computed_at" not in checkpoint:
+        return None
+
+    now = time.time()
+    age = now - checkpoint["computed_at"]
+    changed_ago = now - os.stat(target).st_mtime
+
+    if changed_ago > policy["window"] or age > policy["max_staleness"]:
+        return None
+
+    return {**render(checkpoint["state"]), "computed_at": checkpoint["computed_at"]}
+
+
+def _refresh_in_background(key: str, target: str, filters: dict | None = None) -> None:
+    """Recompute *key* without anyone waiting on it (deduped by SingleFlight)."""
+    async def refresh():
+        detach_request()  # nobody is waiting: keep it out of the caller's Server-Timing
+        try:
+            (result, scan, _), _ = await _inflight.do(key, lambda: _compute_and_store(key, target, filters))
+        except Exception:
+            return  # the next request will retry in the foreground if needed
+        # Without Redis this is the only place the refreshed result lands.
+        l1_cache.set(key, _scope(target, filters), {**result, "scan": scan})
+
+    task = asyncio.create_task(refresh())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+def _parse_filters(agent, since, until, error_type, validation) -> dict | None:
+    """/process-logs query params → the filter dict log_processor takes (None = no filter)."""
+    filters = {}
+    if agent:
+        filters["agent"] = agent
+    if error_type:
+        filters["error_type"] = error_type
+    for name, value in (("since_ms", since), ("until_ms", until)):
+        if value:
+            ms = parse_time_ms(value)
+            if ms < 0:
+                raise HTTPException(status_code=400, detail="since/until must be ISO-8601 timestamps")
+            step = FILTER_TIME_BUCKET_SEC * 1000
+            if step:
+                ms -= ms % step
+                if name == "until_ms":
+                    ms += step - 1  # inclusive: the last millisecond of its bucket
+            filters[name] = ms
+    if validation:
+        filters["validation"] = validation == "passed"
+    return filters or None
+
+
+def _with_age(result: dict) -> dict:
+    """Add age_sec (seconds since the aggregate was computed) to a response."""
+    computed_at = result.get("computed_at")
+    if computed_at is None:
+        return result
+    return {**result, "age_sec": max(0.0, time.time() - computed_at)}
+
+
+async def _run_index(path: str) -> RunIndex:
+    """
+    The sidecar index for *path*, refreshed with any newly appended runs.
+    It's a snapshot, so a refresh by a concurrent request can't change the
+    files it reads halfway through this one.
+    """
+    path = os.path.abspath(path)
+    index = _run_indexes.setdefault(path, RunIndex(path))
+    lock = _run_index_locks.setdefault(path, asyncio.Lock())
+    async with lock:
+        await asyncio.to_thread(index.refresh)
+    return index.snapshot()
+
+
+def _tail_subscribe(path: str, agent: str | None, failures: bool) -> tuple[LogTailer, Subscriber]:
+    path = os.path.abspath(path)
+    tailer = _tailers.setdefault(path, LogTailer(path, TAIL_POLL_INTERVAL))
+    return tailer, tailer.subscribe(Subscriber(TAIL_BUFFER_BATCHES, agent, failures))
+
+
+async def _rollup_store(path: str) -> RollupStore:
+    """The rollups for *path*, with any newly appended runs folded in."""
+    path = os.path.abspath(path)
+    store = _rollups.setdefault(path, RollupStore(path))
+    lock = _run_index_locks.setdefault(path + ".rollups", asyncio.Lock())
+    async with lock:
+        await asyncio.to_thread(store.refresh)
+    return store
+
+
+def _iso(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat()
+
+
+def _encode_cursor(seq: int, order: str, ino: int) -> str:
+    raw = json.dumps({"seq": seq, "order": order, "ino": ino}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, order: str, ino: int) -> int:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        seq = int(data["seq"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Malformed cursor")
+    if data.get("order") != order:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different order")
+    if data.get("ino") != ino:
+        raise HTTPException(status_code=410, detail="Log was rotated; cursor expired")
+    return seq
 
 
 # ---------------------------------------------------------------------------
@@ -126,11 +997,18 @@ async def health():
     redis_ok = False
     if redis_client:
         try:
-            redis_ok = redis_client.ping()
-        except redis.ConnectionError:
+            redis_ok = await redis_client.ping()
+        except RedisError:
             pass
 
     cpp_exists = Path(CPP_BINARY).is_file()
+    pool = processor_pool.stats() if processor_pool else None
+    if native_processor:
+        backend = "library"
+    elif processor_pool:
+        backend = "pool"
+    else:
+        backend = "subprocess"
 
     status = "healthy" if (redis_ok and cpp_exists) else "degraded"
 
@@ -140,51 +1018,593 @@ async def health():
             "redis": "connected" if redis_ok else "unavailable",
             "cpp_binary": "found" if cpp_exists else "missing",
         },
+        "redis_pool": _redis_pool_stats(),
+        "cache": _cache_stats(),
+        "processor_backend": backend,
+        "processor_pool": pool,
+        "processor_queue": processor_gate.stats(),
+        "tail": {path: t.stats() for path, t in _tailers.items() if len(t)},
+        "benchmark_jobs": benchmark_jobs.stats() if benchmark_jobs else None,
+        "watch": {**file_watcher.stats(), "warmed": warm_metrics},
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus text exposition, merged across every uvicorn worker.
+
+    Route and phase latency histograms, cache counters, processor slot and
+    subprocess gauges, and per-agent call latency — see api/metrics.py.
+    """
+    return Response(
+        await metrics_exporter.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 @app.get("/process-logs")
 async def process_logs(
+    request: Request,
     file: str = Query(default=None, description="Path to a .jsonl log file"),
+    agent: str | None = Query(default=None, description="Only this model_name"),
+    since: str | None = Query(default=None, description="ISO-8601 lower bound on the record time"),
+    until: str | None = Query(default=None, description="ISO-8601 upper bound on the record time"),
+    error_type: str | None = Query(default=None, description="Only records with this error_meta.error_type"),
+    validation: str | None = Query(default=None, pattern="^(passed|failed)$"),
 ):
     """
-    Run the C++ log_processor on the given file and return line counts.
+    Run the C++ log_processor on the given file and return per-agent stats.
 
-    Results are cached in Redis keyed by the SHA-256 of the file content,
-    so identical files are never processed twice within the TTL window.
+    Results are cached in Redis keyed by a fingerprint of the file,
+    so unchanged files are never processed twice within the TTL window.
 
     Cache flow:
-        1. Hash the file content → cache key
-        2. Check Redis for that key
-        3. HIT  → return cached JSON instantly
-        4. MISS → run C++ binary → store result in Redis → return
+        1. Fingerprint the file → cache key
+        2. Check the in-process L1, then Redis (L2) for that key
+        3. HIT  → return cached JSON instantly (L2 hits also fill L1)
+        4. MISS → run C++ binary on the bytes appended since the last
+                  checkpoint → merge → store in L1 + Redis → publish an
+                  invalidation so other workers drop stale L1 entries
+
+    Concurrent misses for the same key are coalesced: one request computes,
+    the rest wait for it ("cache": "coalesced") — see _compute_and_store.
+
+    Stale-while-revalidate: right after the log changes, a miss may instead
+    return the previous aggregate ("cache": "stale", "stale": true) and
+    refresh it in the background — see SWR_POLICIES.  Every response carries
+    age_sec, the number of seconds since its aggregate was computed.
+
+    Responses carry an ETag derived from the cache key; a matching
+    If-None-Match gets a bodyless 304 before any cache lookup.  Bodies are
+    zstd/gzip-compressed per Accept-Encoding — see api/responses.py.
+
+    Filters (agent, since/until, error_type, validation) are pushed down
+    into log_processor, which drops non-matching lines while scanning.
+    Each filter set has its own cache key and incremental checkpoint.
     """
-    target = file or LOG_FILE
+    target = resolve_log_file(file, LOG_FILE)
 
-    if not Path(target).is_file():
-        raise HTTPException(status_code=404, detail=f"File not found: {target}")
+    filters = _parse_filters(agent, since, until, error_type, validation)
+    if filters is None:
+        file_watcher.add(target)  # keep this file's aggregate warm from now on
+
+    # --- Cache lookup: L1 (this worker) then L2 (Redis) ---
+    with phase("cache_key"):
+        key = _cache_key(target, filters)
+    path = _scope(target, filters)
+    etag = make_etag(key)
 
-    # --- Cache lookup ---
-    cache_hit = False
-    key = _cache_key(target)
+    if etag_matches(request, etag):
+        cache_metrics["not_modified"] += 1
+        return not_modified(etag)
+
+    result = l1_cache.get(key)
+    if result is not None:
+        payload = _with_age({**result, "cache": "hit", "cache_tier": "l1", "stale": False})
+        return json_response(request, payload, etag)
 
     if redis_client:
         try:
-            cached = redis_client.get(key)
+            with phase("redis_get"):
+                cached = await redis_client.get(key)
             if cached:
-                cache_hit = True
-                result = json.loads(cached)
-                return {**result, "cache": "hit"}
-        except redis.ConnectionError:
+                cache_metrics["l2_hits"] += 1
+                with phase("json_parse"):
+                    result = json.loads(cached)
+                l1_cache.set(key, path, result)
+                payload = _with_age({**result, "cache": "hit", "cache_tier": "l2", "stale": False})
+                return json_response(request, payload, etag)
+            cache_metrics["l2_misses"] += 1
+        except RedisError:
             pass  # degrade gracefully
 
-    # --- Cache miss: run the binary ---
-    result = _run_cpp_processor(target)
+    # --- Cache miss: serve the previous aggregate if it's recent enough ---
+    stale = await _stale_result(target, "/process-logs", filters)
+    if stale is not None:
+        _refresh_in_background(key, target, filters)
+        stale_etag = make_etag("stale", path, str(stale["computed_at"]))
+        if etag_matches(request, stale_etag):
+            cache_metrics["not_modified"] += 1
+            return not_modified(stale_etag)
+        cache_metrics["stale"] += 1
+        payload = _with_age({**stale, "cache": "stale", "stale": True})
+        return json_response(request, payload, stale_etag)
 
-    if redis_client:
+    # --- Otherwise one computation per key, everyone else waits on it ---
+    (result, scan, cache), shared = await _until_disconnected(
+        request, _inflight.do(key, lambda: _compute_and_store(key, target, filters))
+    )
+
+    if shared:
+        cache = "coalesced"
+        cache_metrics["coalesced_local"] += 1
+    elif cache == "coalesced":
+        cache_metrics["coalesced_remote"] += 1
+    else:
+        cache_metrics["misses"] += 1
+
+    l1_cache.set(key, path, {**result, "scan": scan})
+    payload = _with_age({**result, "cache": cache, "scan": scan, "stale": False})
+    return json_response(request, payload, etag)
+
+
+@app.get("/api/runs")
+async def list_runs(
+    request: Request,
+    file: str = Query(default=None, description="Path to a .jsonl log file"),
+    limit: int = Query(default=50, ge=1, le=RUNS_PAGE_MAX),
+    cursor: str | None = Query(default=None, description="next_cursor from the previous page"),
+    order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    model_name: str | None = Query(default=None),
+    ok: bool | None = Query(default=None, description="Filter on error_meta.ok"),
+    since: str | None = Query(default=None, description="ISO-8601 lower bound on time_stamp"),
+    until: str | None = Query(default=None, description="ISO-8601 upper bound on time_stamp"),
+):
+    """
+    Page through run history, newest first by default.
+
+    Backed by a sidecar byte-offset index (api/runindex.py): a page is a
+    contiguous read of fixed-width index records plus one seek per returned
+    run, and since/until are binary searches — so latency doesn't grow with
+    the size of the log.
+
+    Pagination is keyset-based: pass next_cursor back as ?cursor= to get the
+    following page.  next_cursor is null once there is nothing left.
+    """
+    target = resolve_log_file(file, LOG_FILE)
+
+    since_ms = parse_time_ms(since) if since else None
+    until_ms = parse_time_ms(until) if until else None
+    if since_ms == -1 or until_ms == -1:
+        raise HTTPException(status_code=400, detail="since/until must be ISO-8601 timestamps")
+
+    index = await _run_index(target)
+    ino = index.meta["ino"]
+    descending = order == "desc"
+
+    model_id = None
+    if model_name is not None:
+        model_id = index.model_id(model_name)
+        if model_id is None:
+            return json_response(request, {"items": [], "count": 0, "next_cursor": None})
+
+    def page():
+        if cursor:
+            seq = _decode_cursor(cursor, order, ino)
+        elif descending:
+            seq = index.count() - 1
+        else:
+            seq = 0
+
+        if descending and until_ms is not None:
+            seq = min(seq, index.bisect_time(until_ms + 1) - 1)
+        if not descending and since_ms is not None:
+            seq = max(seq, index.bisect_time(since_ms))
+
+        matches, resume = index.scan(
+            start=seq, descending=descending, limit=limit, scan_cap=RUNS_SCAN_CAP,
+            model_id=model_id,
+            ok=None if ok is None else (OK_TRUE if ok else OK_FALSE),
+            since_ms=since_ms, until_ms=until_ms,
+        )
+        return index.read([rec for _, rec in matches]), resume
+
+    items, resume = await asyncio.to_thread(page)
+
+    return json_response(request, {
+        "items": items,
+        "count": len(items),
+        "next_cursor": None if resume is None else _encode_cursor(resume, order, ino),
+    })
+
+
+@app.get("/export")
+async def export_records(
+    source: str = Query(default="runs", pattern="^(runs|benchmarks)$"),
+    file: str = Query(default=None, description="Path to a .jsonl file (overrides source)"),
+    fields: str | None = Query(default=None, description="Comma-separated, dotted paths to keep"),
+    where: list[str] = Query(default=[], description="field=value equality filters (repeatable)"),
+    model_name: str | None = Query(default=None),
+    ok: bool | None = Query(default=None, description="Filter on error_meta.ok"),
+    since: str | None = Query(default=None, description="ISO-8601 lower bound on the record time"),
+    until: str | None = Query(default=None, description="ISO-8601 upper bound on the record time"),
+):
+    """
+    Stream matching records as NDJSON (one JSON object per line).
+
+    Memory stays bounded regardless of file size, and a slow client slows
+    the reader down rather than buffering output — see api/export.py.
+    """
+    target = resolve_log_file(file, EXPORT_SOURCES[source])
+
+    since_ms = parse_time_ms(since) if since else None
+    until_ms = parse_time_ms(until) if until else None
+    if since_ms == -1 or until_ms == -1:
+        raise HTTPException(status_code=400, detail="since/until must be ISO-8601 timestamps")
+
+    try:
+        flt = ExportFilter(model_name=model_name, model_fallback=EXPORT_MODEL_FALLBACK.get(source),
+                           ok=ok, since_ms=since_ms, until_ms=until_ms, where=parse_where(where))
+        projection = parse_fields(fields)
+    except ExportError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    # The /api/runs index already knows where `since` starts; skip straight there.
+    start = 0
+    if since_ms is not None:
+        index = await _run_index(target)
+        seq = index.bisect_time(since_ms)
+        if seq < index.count():
+            start = index.offset_of(seq)
+        else:
+            start = index.meta["log_offset"]
+
+    scan = await asyncio.to_thread(ExportScan, target, flt, projection, start)
+
+    async def body():
         try:
-            redis_client.setex(key, CACHE_TTL, json.dumps(result))
-        except redis.ConnectionError:
-            pass
+            while (chunk := await asyncio.to_thread(scan.next_chunk)) is not None:
+                yield chunk
+        finally:
+            scan.close()
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Content-Type-Options": "nosniff"},
+    )
+
+
+@app.get("/tail")
+async def tail_sse(
+    file: str = Query(default=None, description="Path to a .jsonl log file"),
+    agent: str | None = Query(default=None, description="Only runs from this model"),
+    failures: bool = Query(default=False, description="Only failed runs"),
+    batch: bool = Query(default=True, description="One event per poll instead of one per run"),
+):
+    """
+    Follow the log from its current end as Server-Sent Events.
+
+    Events: `runs` (a JSON array, batch=true) or `run` (one object each),
+    `dropped` ({"dropped": n} when this client fell behind), and a comment
+    keepalive every TAIL_HEARTBEAT seconds.
+    """
+    target = resolve_log_file(file, LOG_FILE)
+    tailer, sub = _tail_subscribe(target, agent, failures)
+
+    async def events():
+        try:
+            yield b"retry: 2000\n\n"
+            while True:
+                records = await sub.next_batch(TAIL_HEARTBEAT)
+                dropped = sub.take_dropped()
+                if dropped:
+                    yield b"event: dropped\ndata: " + json.dumps({"dropped": dropped}).encode() + b"\n\n"
+                if records is None:
+                    yield b": keepalive\n\n"
+                elif batch:
+                    yield b"event: runs\ndata: [" + b",".join(records) + b"]\n\n"
+                else:
+                    yield b"".join(b"event: run\ndata: " + r + b"\n\n" for r in records)
+        finally:
+            tailer.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/tail/ws")
+async def tail_ws(
+    websocket: WebSocket,
+    file: str | None = None,
+    agent: str | None = None,
+    failures: bool = False,
+):
+    """
+    Same feed as /tail over a WebSocket.  Messages are JSON objects:
+    {"type": "runs", "records": [...]}, {"type": "dropped", "dropped": n}
+    and {"type": "heartbeat"}.
+    """
+    try:
+        target = resolve_log_file(file, LOG_FILE)
+    except HTTPException as exc:
+        await websocket.close(code=1008, reason=exc.detail)
+        return
+
+    await websocket.accept()
+    tailer, sub = _tail_subscribe(target, agent, failures)
+
+    async def client_gone():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass  # clients don't send anything we act on
 
-    return {**result, "cache": "miss"}
+    closed = asyncio.create_task(client_gone())
+    try:
+        while True:
+            waiter = asyncio.ensure_future(sub.next_batch(TAIL_HEARTBEAT))
+            await asyncio.wait({waiter, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if closed.done():
+                waiter.cancel()
+                break
+            records = waiter.result()
+            dropped = sub.take_dropped()
+            if dropped:
+                await websocket.send_text(json.dumps({"type": "dropped", "dropped": dropped}))
+            if records is None:
+                await websocket.send_text('{"type":"heartbeat"}')
+            else:
+                await websocket.send_text(
+                    (b'{"type":"runs","records":[' + b",".join(records) + b"]}").decode()
+                )
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closed.cancel()
+        tailer.unsubscribe(sub)
+
+
+@app.get("/stats")
+async def stats(
+    request: Request,
+    file: str = Query(default=None, description="Path to a .jsonl log file"),
+    bucket: str = Query(default="hour", pattern="^(minute|hour|day)$"),
+    from_: str | None = Query(default=None, alias="from", description="ISO-8601 start (inclusive)"),
+    to: str | None = Query(default=None, description="ISO-8601 end (exclusive); defaults to now"),
+    agent: str | None = Query(default=None, description="Only this model"),
+):
+    """
+    Per-bucket, per-agent counts and latency percentiles.
+
+    Served from incrementally maintained rollups (api/rollups.py), so the
+    cost is proportional to the number of buckets in the range, not to the
+    number of runs they cover.  Each series entry has the same shape as
+    /process-logs; `totals` merges the whole range.
+    """
+    target = resolve_log_file(file, LOG_FILE)
+
+    to_ms = parse_time_ms(to) if to else int(time.time() * 1000)
+    from_ms = parse_time_ms(from_) if from_ else to_ms - STATS_DEFAULT_SPAN[bucket]
+    if from_ms == -1 or to_ms == -1:
+        raise HTTPException(status_code=400, detail="from/to must be ISO-8601 timestamps")
+    if from_ms >= to_ms:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    if (to_ms - from_ms) / BUCKETS[bucket] > STATS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range spans more than {STATS_MAX_BUCKETS} {bucket} buckets; use a coarser bucket",
+        )
+
+    store = await _rollup_store(target)
+    rows = await asyncio.to_thread(store.query, bucket, from_ms, to_ms, agent)
+
+    series: dict[int, dict] = {}
+    totals = empty_state()
+    for start_ms, name, total, errors, val_failed, null_responses, latency in rows:
+        partial = {"total_lines": total, "agents": {name: {
+            "total": total, "errors": errors, "val_failed": val_failed,
+            "null_responses": null_responses, "latency": latency,
+        }}}
+        merge_partial(series.setdefault(start_ms, empty_state()), partial)
+        merge_partial(totals, partial)
+
+    return json_response(request, {
+        "bucket": bucket,
+        "from": _iso(from_ms),
+        "to": _iso(to_ms),
+        "series": [{"start": _iso(start), **render(state)} for start, state in sorted(series.items())],
+        "totals": render(totals),
+    })
+
+
+class RunRequest(BaseModel):
+    prompt: str = Field(min_length=1)
+    agents: list[str] | None = Field(default=None, description="Registry keys; default: all available")
+    timeout: float = Field(default=20, gt=0, le=300, description="Per-agent timeout in seconds")
+    stream_tokens: bool = Field(default=True, description="Emit token events for streaming agents")
+
+
+@app.post("/api/run")
+async def run_prompt(
+    request: Request,
+    body: RunRequest,
+    format: str | None = Query(default=None, pattern="^(ndjson|sse)$"),
+):
+    """
+    Fan a prompt out to the agents and stream each validated result as soon
+    as that agent finishes — a fast agent never waits for the slowest one.
+
+    Output is NDJSON by default, or Server-Sent Events with ?format=sse (or
+    Accept: text/event-stream).  Event shapes are documented in
+    api/fanout.py.  Runs are appended to data/runs.jsonl like run.py does.
+    """
+    if not agent_registry:
+        raise HTTPException(status_code=503, detail="No LLM agents are available")
+
+    keys = body.agents or list(agent_registry)
+    unknown = [k for k in keys if k not in agent_registry]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unavailable agent(s) {unknown}. Available: {sorted(agent_registry)}",
+        )
+    agents = {k: agent_registry[k] for k in dict.fromkeys(keys)}
+
+    sse = format == "sse" or (format is None and "text/event-stream" in request.headers.get("accept", ""))
+
+    async def body_stream():
+        async for event in fan_out(body.prompt, agents, body.timeout, body.stream_tokens):
+            if sse:
+                yield b"event: " + event["type"].encode() + b"\ndata: " + dumps(event) + b"\n\n"
+            else:
+                yield dumps(event) + b"\n"
+
+    return StreamingResponse(
+        body_stream(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class BenchmarkRequest(BaseModel):
+    agents: list[str] | None = Field(default=None, description="Registry keys; default: all available")
+    prompt_ids: list[str] | None = Field(default=None, description="Subset of benchmarks/prompts.json")
+    tags: list[str] | None = Field(default=None, description="Only prompts carrying one of these tags")
+    timeout: float = Field(default=20, gt=0, le=300, description="Per-agent call timeout in seconds")
+
+
+@app.post("/api/benchmark", status_code=202)
+async def start_benchmark(body: BenchmarkRequest):
+    """
+    Queue a benchmark job and return its id straight away.
+
+    The job runs the prompts from benchmarks/prompts.json against the chosen
+    agents, appending rows to data/benchmark_results.jsonl as each prompt
+    finishes.  Follow it with /api/benchmark/{job_id}/events or poll
+    /api/benchmark/{job_id}.
+    """
+    if not agent_registry:
+        raise HTTPException(status_code=503, detail="No LLM agents are available")
+
+    keys = list(dict.fromkeys(body.agents or agent_registry))
+    unknown = [k for k in keys if k not in agent_registry]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unavailable agent(s) {unknown}. Available: {sorted(agent_registry)}",
+        )
+
+    from benchmarks.runner import load_prompts
+
+    prompts = await asyncio.to_thread(load_prompts)
+    if body.prompt_ids is not None:
+        missing = set(body.prompt_ids) - {p["id"] for p in prompts}
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Unknown prompt id(s) {sorted(missing)}")
+        prompts = [p for p in prompts if p["id"] in body.prompt_ids]
+    if body.tags is not None:
+        prompts = [p for p in prompts if set(p.get("tags", [])) & set(body.tags)]
+    if not prompts:
+        raise HTTPException(status_code=400, detail="No prompts selected")
+
+    try:
+        job = await benchmark_jobs.submit(keys, prompts, body.timeout)
+    except JobQueueFullError as exc:
+        raise HTTPException(status_code=503, detail=f"Benchmark queue is full: {exc}")
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "total": len(prompts),
+        "links": {
+            "status": f"/api/benchmark/{job.id}",
+            "events": f"/api/benchmark/{job.id}/events",
+        },
+    }
+
+
+@app.get("/api/benchmark/{job_id}")
+async def benchmark_status(
+    request: Request,
+    job_id: str,
+    offset: int = Query(default=0, ge=0, description="Skip results already fetched"),
+):
+    """
+    Status, progress and the results collected so far — available while the
+    job is still running.  Pass the previous response's next_offset as
+    ?offset= to fetch only new rows.
+    """
+    snapshot = await benchmark_jobs.load_snapshot(job_id, results_from=offset, events_from=None)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Unknown benchmark job: {job_id}")
+
+    return json_response(request, {**snapshot, "next_offset": offset + len(snapshot["results"])})
+
+
+@app.delete("/api/benchmark/{job_id}", status_code=202)
+async def cancel_benchmark(job_id: str):
+    """Cancel a queued or running job; rows already written stay in the results file."""
+    if not await benchmark_jobs.cancel(job_id):
+        raise HTTPException(status_code=404, detail=f"Unknown benchmark job: {job_id}")
+    return {"job_id": job_id, "status": "cancelling"}
+
+
+@app.get("/api/benchmark/{job_id}/events")
+async def benchmark_events(
+    request: Request,
+    job_id: str,
+    format: str | None = Query(default=None, pattern="^(ndjson|sse)$"),
+):
+    """
+    Stream a job's events: queued, started, one progress event per finished
+    prompt, then done.  Earlier events are replayed first, so a client can
+    attach at any point.  NDJSON by default, SSE with ?format=sse or
+    Accept: text/event-stream.
+    """
+    job = benchmark_jobs.get(job_id)
+    if job is None and await benchmark_jobs.load_snapshot(job_id, None, None) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown benchmark job: {job_id}")
+
+    sse = format == "sse" or (format is None and "text/event-stream" in request.headers.get("accept", ""))
+
+    def encode(event: dict) -> bytes:
+        if sse:
+            return b"event: " + event["type"].encode() + b"\ndata: " + dumps(event) + b"\n\n"
+        return dumps(event) + b"\n"
+
+    async def follow_local():
+        seen = 0
+        while True:
+            await job.wait(seen, TAIL_HEARTBEAT)
+            fresh = job.events[seen:]
+            seen += len(fresh)
+            if fresh:
+                yield b"".join(encode(e) for e in fresh)
+            elif job.finished:
+                return
+            elif sse:
+                yield b": keepalive\n\n"
+
+    async def follow_remote():
+        # Another worker runs this job: follow the snapshot it mirrors to Redis.
+        seen = 0
+        while True:
+            snapshot = await benchmark_jobs.load_snapshot(job_id, results_from=None, events_from=seen)
+            if snapshot is None:
+                return
+            fresh = snapshot["events"]
+            seen += len(fresh)
+            if fresh:
+                yield b"".join(encode(e) for e in fresh)
+            if snapshot["status"] in FINISHED:
+                return
+            await asyncio.sleep(BENCHMARK_POLL)
+
+    return StreamingResponse(
+        follow_local() if job is not None else follow_remote(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,463 @@
+"""
+Prometheus metrics without a client library.
+
+/health answers "is it up"; /metrics answers "where does the time go".  The
+hot paths record into plain Python containers:
+
+  * a histogram observation is one bisect plus two list updates, a counter
+    increment is one dict update — well under a microsecond each;
+  * there are no locks.  Every update happens on the event loop thread,
+    which already serialises them (values owned by worker threads, like the
+    agents' latency windows, are read at scrape time by a collector instead);
+  * values that are already counted elsewhere (cache_metrics, pool stats,
+    AgentLatencyAnalysis) are not double-booked on the hot path — collector
+    callbacks copy them into the registry when /metrics is scraped.
+
+Uvicorn runs several worker processes and a scrape reaches only one of them,
+so every worker writes its snapshot to METRICS_DIR (every flush_interval
+seconds, and whenever it serves /metrics).  A scrape merges the snapshots of
+all live workers: counters, gauges and histograms are summed; families that
+only make sense per process (per_worker=True) get a `worker` label instead.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable
+
+# Prometheus' default buckets, plus a few sub-millisecond ones: cache hits
+# and hashing phases are measured in microseconds.
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), per_worker: bool = False):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.per_worker = per_worker
+        self.series: dict[tuple, object] = {}
+
+    def describe(self) -> dict:
+        return {"kind": self.kind, "help": self.help, "labelnames": self.labelnames,
+                "per_worker": self.per_worker}
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def set(self, value: float, *labels) -> None:
+        """For collectors mirroring a total that is counted somewhere else."""
+        self.series[labels] = value
+
+
+class Gauge(_Family):
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        self.series[labels] = value
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.series[labels] = self.series.get(labels, 0) - amount
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def describe(self) -> dict:
+        return {**super().describe(), "buckets": self.buckets}
+
+    def observe(self, value: float, *labels) -> None:
+        # [count per bucket..., count above the last bound, sum]; cumulated on render
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+
+class Summary(_Family):
+    """Quantiles computed elsewhere; series values are [q..., count, sum]."""
+
+    kind = "summary"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), quantiles: tuple = (0.5, 0.95, 0.99)):
+        # quantiles of different processes can't be added up
+        super().__init__(name, help, labelnames, per_worker=True)
+        self.quantiles = tuple(quantiles)
+
+    def describe(self) -> dict:
+        return {**super().describe(), "quantiles": self.quantiles}
+
+    def set(self, quantile_values, count: int, total: float, *labels) -> None:
+        self.series[labels] = [*quantile_values, count, total]
+
+
+class Registry:
+    def __init__(self):
+        self.families: dict[str, _Family] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def register(self, family: _Family) -> _Family:
+        self.families[family.name] = family
+        return family
+
+    def counter(self, name: str, help: str, labelnames: tuple = (), **kw) -> Counter:
+        return self.register(Counter(name, help, labelnames, **kw))
+
+    def gauge(self, name: str, help: str, labelnames: tuple = (), **kw) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, **kw))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), **kw) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, **kw))
+
+    def summary(self, name: str, help: str, labelnames: tuple = (), **kw) -> Summary:
+        return self.register(Summary(name, help, labelnames, **kw))
+
+    def collector(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Decorator: *fn* refreshes mirrored values just before each snapshot."""
+        self._collectors.append(fn)
+        return fn
+
+    def snapshot(self) -> dict:
+        for fn in self._collectors:
+            fn()
+        return {
+            name: {
+                **family.describe(),
+                "series": [[list(k), v[:] if isinstance(v, list) else v] for k, v in family.series.items()],
+            }
+            for name, family in self.families.items()
+        }
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time until the response headers were sent, per route",
+    ("method", "route", "status"),
+)
+PHASE_SECONDS = REGISTRY.histogram(
+    "logproc_phase_duration_seconds",
+    "Time spent in each phase of serving an aggregate",
+    ("phase",),
+)
+
+
+# ---------------------------------------------------------------------------
+# Phases
+# ---------------------------------------------------------------------------
+# Each phase lands in PHASE_SECONDS and, while a request is being served, in
+# that request's own breakdown (its Server-Timing header).  The breakdown is a
+# dict in a ContextVar: tasks started by the request (the SingleFlight
+# leader, say) inherit it, so their phases are billed to the request that
+# started them.
+
+_request_phases: ContextVar[dict | None] = ContextVar("request_phases", default=None)
+
+
+def record_phase(name: str, seconds: float) -> None:
+    PHASE_SECONDS.observe(seconds, name)
+    phases = _request_phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+class phase:
+    """`with phase("redis_get"): ...` records the block's duration."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_phase(self.name, time.perf_counter() - self.start)
+
+
+def detach_request() -> None:
+    """Stop billing phases to the request that spawned this task (background work)."""
+    _request_phases.set(None)
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+
+def server_timing(phases: dict, total: float) -> bytes:
+    """{"cache_key": 0.0004, ...} → b"cache_key;dur=0.4, ..., total;dur=3.1" (ms)."""
+    entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in phases.items()]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries).encode()
+
+
+class MetricsMiddleware:
+    """
+    Time every HTTP request: REQUEST_SECONDS, the Server-Timing header and
+    the slow-request log.
+
+    A plain ASGI middleware rather than @app.middleware("http"): that one
+    re-wraps every response body in an extra task and queue, which costs
+    more than the measurement.  The route label is the matched path template
+    (/api/benchmark/{job_id}), never the raw path, to keep cardinality flat.
+    Everything is measured up to the response headers, since that is where
+    Server-Timing has to go; streams are timed to their first byte.
+
+    Requests slower than *slow_request_ms* (0 = never) are printed with
+    their phase breakdown.
+    """
+
+    def __init__(self, app, server_timing: bool = True, slow_request_ms: float = 0):
+        self.app = app
+        self.server_timing = server_timing
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        phases: dict[str, float] = {}
+        token = _request_phases.set(phases)
+        observed = False
+
+        async def send_wrapper(message):
+            nonlocal observed
+            if message["type"] == "http.response.start" and not observed:
+                observed = True
+                total = time.perf_counter() - start
+                route = getattr(scope.get("route"), "path", "unmatched")
+                REQUEST_SECONDS.observe(total, scope["method"], route, str(message["status"]))
+                if self.server_timing:
+                    message["headers"] = [
+                        *message.get("headers", []), (b"server-timing", server_timing(phases, total)),
+                    ]
+                if self.slow_request_ms and total * 1000 >= self.slow_request_ms:
+                    self._log_slow(scope, route, message["status"], total, phases)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_phases.reset(token)
+
+    @staticmethod
+    def _log_slow(scope, route: str, status: int, total: float, phases: dict) -> None:
+        query = scope.get("query_string", b"").decode(errors="replace")
+        print("[slow] " + json.dumps({
+            "method": scope["method"],
+            "path": scope["path"] + (f"?{query}" if query else ""),
+            "route": route,
+            "status": status,
+            "total_ms": round(total * 1000, 3),
+            "phases_ms": {name: round(seconds * 1000, 3) for name, seconds in phases.items()},
+        }), flush=True)
+
+
+# ---------------------------------------------------------------------------
+# Cross-worker exposition
+# ---------------------------------------------------------------------------
+
+
+def default_dir() -> str:
+    """Shared by the workers of one uvicorn master (they have the same parent).
+
+    A later server whose parent has the same PID (a restart from the same
+    shell) lands in the same directory; Exporter prunes what the old one left.
+    """
+    return os.path.join(tempfile.gettempdir(), f"logproc-metrics-{os.getppid()}")
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# A live worker rewrites its snapshot every flush_interval.  One that has not
+# for this many intervals belongs to a dead worker whose PID was reused.
+STALE_FLUSHES = 3
+STALE_MIN_SEC = 30.0
+
+
+class Exporter:
+    def __init__(self, registry: Registry, directory: str, flush_interval: float):
+        self.registry = registry
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.path = os.path.join(directory, f"{os.getpid()}.json")
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._prune()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush(self.registry.snapshot())
+            except OSError:
+                pass  # e.g. /tmp full; the next scrape still sees this worker's own values
+
+    def flush(self, snapshot: dict) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, self.path)
+
+    def _prune(self) -> dict[int, str]:
+        """Delete the snapshots of workers that are gone; {pid: path} of the rest.
+
+        Exited workers never remove their file if they were killed, and their
+        counts would otherwise be summed into every later scrape.
+        """
+        live = {}
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return live
+        stale_before = time.time() - max(STALE_FLUSHES * self.flush_interval, STALE_MIN_SEC)
+        for name in names:
+            pid, _, suffix = name.partition(".")
+            if suffix not in ("json", "json.tmp") or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stale = os.stat(path).st_mtime < stale_before
+            except OSError:
+                continue
+            if stale or not _alive(int(pid)):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            elif suffix == "json":
+                live[int(pid)] = path
+        return live
+
+    def _peers(self) -> dict[int, dict]:
+        """Latest snapshots of the other live workers (blocking)."""
+        peers = {}
+        for pid, path in self._prune().items():
+            try:
+                with open(path, encoding="utf-8") as f:
+                    peers[pid] = json.load(f)
+            except (OSError, ValueError):
+                continue
+        return peers
+
+    async def render(self) -> bytes:
+        """Text exposition (format 0.0.4) merged across every live worker."""
+        own = self.registry.snapshot()
+        try:
+            await asyncio.to_thread(self.flush, own)
+        except OSError:
+            pass
+        peers = await asyncio.to_thread(self._peers)
+        return render({os.getpid(): own, **peers})
+
+
+def render(snapshots: dict[int, dict]) -> bytes:
+    """Merge per-worker snapshots ({pid: Registry.snapshot()}) into exposition text."""
+    merged: dict[str, dict] = {}
+    for pid, snapshot in snapshots.items():
+        for name, family in snapshot.items():
+            out = merged.setdefault(name, {**family, "series": {}})
+            for labels, value in family["series"]:
+                if family["per_worker"]:
+                    labels = [*labels, str(pid)]
+                key = tuple(labels)
+                current = out["series"].get(key)
+                if current is None:
+                    out["series"][key] = value
+                elif isinstance(value, list):
+                    out["series"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    out["series"][key] = current + value
+
+    lines: list[str] = []
+    for name, family in merged.items():
+        if not family["series"]:
+            continue
+        names = tuple(family["labelnames"]) + (("worker",) if family["per_worker"] else ())
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        for labels, value in sorted(family["series"].items()):
+            if family["kind"] == "histogram":
+                cumulative = 0
+                for bound, count in zip([*family["buckets"], float("inf")], value[:-1]):
+                    cumulative += count
+                    le = 'le="' + _number(float(bound)) + '"'
+                    lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(names, labels)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+            elif family["kind"] == "summary":
+                for q, v in zip(family["quantiles"], value):
+                    quantile = f'quantile="{q}"'
+                    lines.append(f"{name}{_labels(names, labels, quantile)} {_number(v)}")
+                lines.append(f"{name}_count{_labels(names, labels)} {_number(value[-2])}")
+                lines.append(f"{name}_sum{_labels(names, labels)} {_number(value[-1])}")
+            else:
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+    return ("\n".join(lines) + "\n").encode()
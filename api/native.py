@@ -0,0 +1,174 @@
+"""
+In-process access to the C++ log processor via its shared-library build.
+
+    g++ -O2 -pthread -shared -fPIC -DLOGPROC_LIBRARY \
+        -o cpp/liblog_processor.so cpp/log_processor.cpp
+
+The library exposes a small C ABI (bottom of cpp/log_processor.cpp).  We read
+the aggregate through its getters and build the same dict that
+`log_processor --partial` prints, so callers can't tell which backend ran —
+minus the process spawn and the JSON encode/decode.
+
+ctypes releases the GIL for the duration of a foreign call, so running
+scan_file() in a worker thread doesn't block the event loop.
+
+CLI usage:
+    python -m api.native data/runs.jsonl
+    python -m api.native --lib build/liblog_processor.so data/runs.jsonl
+"""
+
+import ctypes
+import json
+import os
+from argparse import ArgumentParser
+
+from api.incremental import empty_state, merge_partial, render
+from api.sketch import ALPHA
+from api.workers import ProcessorError
+
+DEFAULT_LIB_PATH = "cpp/liblog_processor.so"
+
+_ERR_LEN = 256
+
+
+class _AgentStats(ctypes.Structure):
+    # Must match `struct logproc_agent` in cpp/log_processor.cpp
+    _fields_ = [
+        ("total", ctypes.c_longlong),
+        ("errors", ctypes.c_longlong),
+        ("val_failed", ctypes.c_longlong),
+        ("null_responses", ctypes.c_longlong),
+        ("lat_count", ctypes.c_longlong),
+        ("lat_zero", ctypes.c_longlong),
+        ("lat_sum", ctypes.c_double),
+        ("lat_min", ctypes.c_double),
+        ("lat_max", ctypes.c_double),
+    ]
+
+
+class _Filter(ctypes.Structure):
+    # Must match `struct logproc_filter` in cpp/log_processor.cpp
+    _fields_ = [
+        ("agent", ctypes.c_char_p),
+        ("error_type", ctypes.c_char_p),
+        ("since_ms", ctypes.c_longlong),
+        ("until_ms", ctypes.c_longlong),
+        ("validation", ctypes.c_int),
+    ]
+
+    @classmethod
+    def from_dict(cls, filters: dict) -> "_Filter":
+        """Same keys as the --serve "filter" object (see api/main.py)."""
+        validation = filters.get("validation")
+        return cls(
+            agent=filters["agent"].encode() if filters.get("agent") else None,
+            error_type=filters["error_type"].encode() if filters.get("error_type") else None,
+            since_ms=filters.get("since_ms", -1),
+            until_ms=filters.get("until_ms", -1),
+            validation=-1 if validation is None else int(validation),
+        )
+
+
+class NativeProcessor:
+    def __init__(self, lib_path: str = DEFAULT_LIB_PATH):
+        """Load the library.  Raises OSError if it is missing or unloadable."""
+        self.lib_path = lib_path
+        lib = ctypes.CDLL(os.path.abspath(lib_path))
+
+        handle = ctypes.c_void_p
+        lib.logproc_scan_file.argtypes = [ctypes.c_char_p, ctypes.c_longlong, ctypes.c_char_p, ctypes.c_size_t]
+        lib.logproc_scan_file.restype = handle
+        lib.logproc_scan_file_filtered.argtypes = [
+            ctypes.c_char_p, ctypes.c_longlong, ctypes.POINTER(_Filter), ctypes.c_char_p, ctypes.c_size_t,
+        ]
+        lib.logproc_scan_file_filtered.restype = handle
+        lib.logproc_scan_buffer.argtypes = [ctypes.c_char_p, ctypes.c_size_t]
+        lib.logproc_scan_buffer.restype = handle
+        for name in ("logproc_total_lines", "logproc_start_offset", "logproc_end_offset"):
+            getattr(lib, name).argtypes = [handle]
+            getattr(lib, name).restype = ctypes.c_longlong
+        lib.logproc_agent_count.argtypes = [handle]
+        lib.logproc_agent_count.restype = ctypes.c_size_t
+        lib.logproc_agent_name.argtypes = [handle, ctypes.c_size_t]
+        lib.logproc_agent_name.restype = ctypes.c_char_p
+        lib.logproc_agent_stats.argtypes = [handle, ctypes.c_size_t, ctypes.POINTER(_AgentStats)]
+        lib.logproc_agent_stats.restype = None
+        lib.logproc_agent_bins.argtypes = [
+            handle, ctypes.c_size_t,
+            ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_longlong), ctypes.c_size_t,
+        ]
+        lib.logproc_agent_bins.restype = ctypes.c_size_t
+        lib.logproc_free.argtypes = [handle]
+        lib.logproc_free.restype = None
+        self._lib = lib
+
+    # -- public ------------------------------------------------------------
+
+    def scan_file(self, path: str, offset: int = 0, filters: dict | None = None) -> dict:
+        """Partial aggregate of *path* from byte *offset* (same shape as --partial)."""
+        err = ctypes.create_string_buffer(_ERR_LEN)
+        flt = ctypes.byref(_Filter.from_dict(filters)) if filters else None
+        h = self._lib.logproc_scan_file_filtered(os.fsencode(path), offset, flt, err, _ERR_LEN)
+        if not h:
+            raise ProcessorError(err.value.decode(errors="replace") or "scan failed")
+        return self._collect(h)
+
+    def scan_buffer(self, data: bytes) -> dict:
+        """Partial aggregate of JSONL records already in memory."""
+        return self._collect(self._lib.logproc_scan_buffer(data, len(data)))
+
+    # -- internals ---------------------------------------------------------
+
+    def _collect(self, h) -> dict:
+        lib = self._lib
+        try:
+            agents = {}
+            row = _AgentStats()
+            for i in range(lib.logproc_agent_count(h)):
+                name = lib.logproc_agent_name(h, i).decode("utf-8", errors="replace")
+                lib.logproc_agent_stats(h, i, ctypes.byref(row))
+
+                n = lib.logproc_agent_bins(h, i, None, None, 0)
+                idx = (ctypes.c_int * n)()
+                cnt = (ctypes.c_longlong * n)()
+                lib.logproc_agent_bins(h, i, idx, cnt, n)
+
+                agents[name] = {
+                    "total": row.total,
+                    "errors": row.errors,
+                    "val_failed": row.val_failed,
+                    "null_responses": row.null_responses,
+                    "latency": {
+                        "alpha": ALPHA,
+                        "count": row.lat_count,
+                        "sum": row.lat_sum,
+                        "min": row.lat_min,
+                        "max": row.lat_max,
+                        "zero": row.lat_zero,
+                        "bins": {str(idx[k]): cnt[k] for k in range(n)},
+                    },
+                }
+
+            return {
+                "start_offset": lib.logproc_start_offset(h),
+                "end_offset": lib.logproc_end_offset(h),
+                "total_lines": lib.logproc_total_lines(h),
+                "agents": agents,
+            }
+        finally:
+            lib.logproc_free(h)
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Aggregate a JSONL log in-process via liblog_processor")
+    parser.add_argument("file", help="Path to a .jsonl log file")
+    parser.add_argument("--lib", default=os.getenv("PROCESSOR_LIB_PATH") or DEFAULT_LIB_PATH,
+                        help=f"Path to the shared library (default: {DEFAULT_LIB_PATH})")
+    args = parser.parse_args()
+
+    partial = NativeProcessor(args.lib).scan_file(args.file)
+    print(json.dumps(render(merge_partial(empty_state(), partial)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Conditional + compressed JSON responses.
+
+Dashboards poll /process-logs, and once errors_by_agent covers hundreds of
+agents the body gets large.  Three things keep polling cheap:
+
+  * ETag / If-None-Match — the cache key already identifies the file
+    version, so an unchanged file answers 304 with no body at all.
+  * Content-Encoding — zstd if the client accepts it and `zstandard` is
+    installed, otherwise gzip.  Small bodies go out uncompressed.
+  * orjson for serialisation when installed (several times faster than the
+    stdlib encoder), falling back to json.dumps.
+"""
+
+import gzip
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+from api.metrics import phase
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib fallback
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip only
+    zstandard = None
+
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+_zstd = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard else None
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def make_etag(*parts: str) -> str:
+    """Weak ETag — the body also carries age_sec, which changes every second."""
+    digest = hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison per RFC 9110: W/ prefixes are ignored."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    wanted = etag.removeprefix("W/")
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == wanted:
+            return True
+    return False
+
+
+def _pick_encoding(accept_encoding: str) -> str | None:
+    """Highest-q of zstd / gzip the client accepts (q=0 means refused)."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    candidates = [("gzip", accepted.get("gzip", 0))]
+    if _zstd is not None:
+        candidates.insert(0, ("zstd", accepted.get("zstd", 0)))  # wins ties
+
+    name, q = max(candidates, key=lambda c: c[1])
+    return name if q > 0 else None
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def json_response(request: Request, payload, etag: str | None = None) -> Response:
+    with phase("serialize"):
+        body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag:
+        headers["ETag"] = etag
+
+    if len(body) >= COMPRESS_MIN_BYTES:
+        encoding = _pick_encoding(request.headers.get("accept-encoding", ""))
+        if encoding is not None:
+            with phase("compress"):
+                if encoding == "zstd":
+                    body = _zstd.compress(body)
+                else:
+                    body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = encoding
+
+    return Response(content=body, media_type="application/json", headers=headers)
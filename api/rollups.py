@@ -0,0 +1,225 @@
+"""
+Time-bucketed rollups of a JSONL run log.
+
+failure_rate_by_hour and latency-trend charts need per-agent numbers per time
+bucket.  Rescanning the log for every chart doesn't scale, so we keep minute,
+hour and day rollups in a SQLite sidecar next to the log (runs.jsonl.rollups):
+
+    rollups(bucket, start_ms, agent) -> total, errors, val_failed,
+                                        null_responses, latency sketch
+
+Each refresh() parses only the bytes appended since the last one (same
+dev/ino/offset/head bookkeeping as the incremental aggregator) and folds them
+into the affected rows.  Counts add and sketches merge, so the result is
+identical to a full rebuild.  Rows and the log offset are committed in one
+transaction, so a crash never double-counts.
+
+A /stats query is a primary-key range scan: its cost depends on the number
+of buckets asked for, not on how many records they summarise.
+"""
+
+import json
+import os
+import sqlite3
+
+from api.incremental import head_digest
+from api.runindex import INDEX_VERSION, record_fields
+from api.sketch import LatencySketch
+from api.tail import is_failure
+
+BUCKETS = {"minute": 60_000, "hour": 3_600_000, "day": 86_400_000}
+ROLLUP_BATCH_LINES = 50_000  # records folded per transaction during a refresh
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    bucket         TEXT    NOT NULL,
+    start_ms       INTEGER NOT NULL,
+    agent          TEXT    NOT NULL,
+    total          INTEGER NOT NULL,
+    errors         INTEGER NOT NULL,
+    val_failed     INTEGER NOT NULL,
+    null_responses INTEGER NOT NULL,
+    latency        TEXT    NOT NULL,
+    PRIMARY KEY (bucket, start_ms, agent)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS source (
+    id       INTEGER PRIMARY KEY CHECK (id = 0),
+    dev      INTEGER NOT NULL,
+    ino      INTEGER NOT NULL,
+    offset   INTEGER NOT NULL,
+    head     TEXT    NOT NULL,
+    untimed  INTEGER NOT NULL
+);
+"""
+
+_COUNTERS = ("total", "errors", "val_failed", "null_responses")
+
+
+def extract_latency_ms(entry: dict) -> float:
+    """Mirror of log_processor's extract_latency_ms(); -1 when absent."""
+    for field, scale in (("fan_out_latency_sec", 1000.0), ("latency_ms", 1.0), ("latency(ms) ", 1.0)):
+        value = entry.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value * scale
+    return -1.0
+
+
+def _record_stats(entry: dict) -> dict:
+    validation = entry.get("validation")
+    response = entry.get("ai_response", ...)
+    return {
+        "total": 1,
+        "errors": int(is_failure(entry)),
+        "val_failed": int(isinstance(validation, dict) and validation.get("passed") is False),
+        "null_responses": int(response is None or response == ""),
+    }
+
+
+class RollupStore:
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+        self.db_path = log_path + ".rollups"
+        self._signature: tuple | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    # -- maintenance (blocking: call from a worker thread) ------------------
+
+    def refresh(self) -> None:
+        """Fold newly appended records into the rollups (a no-op if unchanged)."""
+        st = os.stat(self.log_path)
+        signature = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        if signature == self._signature:
+            return
+
+        conn = self._connect()
+        try:
+            offset = self._resume_offset(conn, st)
+            while offset < st.st_size:
+                new_offset = self._fold(conn, offset, st.st_size)
+                if new_offset == offset:
+                    break  # only an incomplete trailing line left
+                offset = new_offset
+        finally:
+            conn.close()
+        self._signature = signature
+
+    def _resume_offset(self, conn: sqlite3.Connection, st: os.stat_result) -> int:
+        row = conn.execute("SELECT dev, ino, offset, head FROM source WHERE id = 0").fetchone()
+        (version,) = conn.execute("PRAGMA user_version").fetchone()
+        if row and version == INDEX_VERSION:
+            dev, ino, offset, head = row
+            if (
+                (dev, ino) == (st.st_dev, st.st_ino)
+                and st.st_size >= offset
+                and head_digest(self.log_path, offset) == head
+            ):
+                return offset
+
+        # rotated, truncated, rewritten, built by an older record_fields() or
+        # brand new: rebuild from scratch
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM rollups")
+        conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        conn.execute(
+            "INSERT OR REPLACE INTO source VALUES (0, ?, ?, 0, ?, 0)",
+            (st.st_dev, st.st_ino, head_digest(self.log_path, 0)),
+        )
+        conn.execute("COMMIT")
+        return 0
+
+    def _fold(self, conn: sqlite3.Connection, offset: int, end: int) -> int:
+        """Aggregate up to ROLLUP_BATCH_LINES records from *offset* and commit them."""
+        start = offset
+        pending: dict[tuple, dict] = {}
+        untimed = 0
+
+        with open(self.log_path, "rb") as log:
+            log.seek(offset)
+            for _ in range(ROLLUP_BATCH_LINES):
+                if offset >= end:
+                    break
+                line = log.readline()
+                if not line.endswith(b"\n"):
+                    break  # still being written
+                offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(entry, dict):
+                    continue
+
+                ts, agent, _ = record_fields(entry)
+                if ts < 0:
+                    untimed += 1
+                    continue
+                stats = _record_stats(entry)
+                latency = extract_latency_ms(entry)
+                for bucket, width in BUCKETS.items():
+                    row = pending.setdefault((bucket, ts - ts % width, agent), {
+                        **dict.fromkeys(_COUNTERS, 0), "latency": LatencySketch(),
+                    })
+                    for field in _COUNTERS:
+                        row[field] += stats[field]
+                    if latency >= 0.0:
+                        row["latency"].add(latency)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have folded this range while we were reading.
+            current = conn.execute("SELECT offset FROM source WHERE id = 0").fetchone()
+            if current is None or current[0] != start:
+                conn.execute("ROLLBACK")
+                return current[0] if current else 0
+            for key, row in pending.items():
+                self._merge_row(conn, key, row)
+            conn.execute(
+                "UPDATE source SET offset = ?, head = ?, untimed = untimed + ? WHERE id = 0",
+                (offset, head_digest(self.log_path, offset), untimed),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return offset
+
+    def _merge_row(self, conn: sqlite3.Connection, key: tuple, row: dict) -> None:
+        existing = conn.execute(
+            "SELECT total, errors, val_failed, null_responses, latency FROM rollups "
+            "WHERE bucket = ? AND start_ms = ? AND agent = ?",
+            key,
+        ).fetchone()
+        sketch = row["latency"]
+        counts = [row[field] for field in _COUNTERS]
+        if existing:
+            counts = [a + b for a, b in zip(counts, existing[:4])]
+            sketch.merge(LatencySketch.from_dict(json.loads(existing[4])))
+        conn.execute(
+            "INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (*key, *counts, json.dumps(sketch.to_dict())),
+        )
+
+    # -- queries -----------------------------------------------------------
+
+    def query(self, bucket: str, from_ms: int, to_ms: int, agent: str | None = None) -> list[tuple]:
+        """Rows (start_ms, agent, total, errors, val_failed, null_responses, sketch dict)."""
+        width = BUCKETS[bucket]
+        sql = (
+            "SELECT start_ms, agent, total, errors, val_failed, null_responses, latency "
+            "FROM rollups WHERE bucket = ? AND start_ms >= ? AND start_ms < ?"
+        )
+        params: list = [bucket, from_ms - from_ms % width, to_ms]
+        if agent is not None:
+            sql += " AND agent = ?"
+            params.append(agent)
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql + " ORDER BY start_ms, agent", params).fetchall()
+        finally:
+            conn.close()
+        return [(*row[:6], json.loads(row[6])) for row in rows]
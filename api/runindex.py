@@ -0,0 +1,311 @@
+"""
+Sidecar byte-offset index for JSONL run logs.
+
+Paging through data/runs.jsonl by reading it from the start makes page N cost
+O(N).  Instead we keep two files next to the log:
+
+    runs.jsonl.idx       fixed-width records, one per JSON line (RECORD below)
+    runs.jsonl.idx.meta  JSON: which file / how many bytes are indexed,
+                         model-name table, running max timestamp
+
+Record i lives at byte i * RECORD.size, so "record i" is one pread, a page is
+one contiguous read, and a time bound is a binary search — latency is the
+same for 1K or 50M runs.  The index is extended incrementally (only bytes
+appended since the last refresh are parsed) and rebuilt from scratch if the
+log was rotated, truncated or rewritten.
+
+A rebuild writes a new .idx beside the old one and swaps it in with
+os.replace(), and refresh() keeps the .idx and the log open for queries.  A
+reader therefore always sees the files it started with, even if another
+worker rotates and rebuilds in the meantime.  snapshot() pins the current
+pair for a request that makes several queries.
+
+Time filters use ts_max, the running maximum of timestamps seen so far, for
+the binary search.  That assumes runs are appended in (roughly) time order,
+which log_run guarantees in practice.
+"""
+
+import copy
+import json
+import os
+import struct
+import threading
+from datetime import datetime, timezone
+
+from api.incremental import head_digest
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process coordination only
+    fcntl = None
+
+try:
+    from os import pread
+except ImportError:  # Windows
+    _pread_lock = threading.Lock()
+
+    def pread(fd: int, size: int, offset: int) -> bytes:
+        with _pread_lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            return os.read(fd, size)
+
+# offset, ts_ms (-1 = unknown), ts_max_ms, length, model_id, ok (0/1, 2 = unknown)
+RECORD = struct.Struct("<QqqIIB3x")
+OK_FALSE, OK_TRUE, OK_UNKNOWN = 0, 1, 2
+
+READ_BLOCK_RECORDS = 4096   # index records fetched per read while scanning
+_APPEND_BATCH = 8192        # records buffered before writing during refresh
+INDEX_VERSION = 3           # bump when record_fields() changes; older indexes are rebuilt
+
+_TIME_FIELDS = ("time_stamp", "time_stamp ", "timestamp")
+
+
+def parse_time_ms(value) -> int:
+    """
+    ISO-8601 → epoch milliseconds, or -1 if missing / unparseable.  A
+    timestamp without a zone is UTC, as in log_processor's parse_iso_ms().
+    """
+    if not isinstance(value, str):
+        return -1
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return -1
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def record_fields(entry: dict) -> tuple[int, str, int]:
+    """
+    (ts_ms, model_name, ok) the same way log_processor reads them: the first
+    of _TIME_FIELDS present, `model_name` (else "unknown") and error_meta.ok.
+    """
+    ts = -1
+    for field in _TIME_FIELDS:
+        if field in entry:
+            ts = parse_time_ms(entry[field])
+            break
+
+    model = entry["model_name"] if isinstance(entry.get("model_name"), str) else "unknown"
+
+    ok = OK_UNKNOWN
+    meta = entry.get("error_meta")
+    if isinstance(meta, dict) and isinstance(meta.get("ok"), bool):
+        ok = OK_TRUE if meta["ok"] else OK_FALSE
+    return ts, model, ok
+
+
+class RunIndex:
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+        self.idx_path = log_path + ".idx"
+        self.meta_path = log_path + ".idx.meta"
+        self.meta: dict = {}
+        self._signature: tuple | None = None
+        self._idx = None   # the .idx and log that self.meta describes,
+        self._log = None   # opened under the builder lock
+
+    # -- maintenance (blocking: call from a worker thread) ------------------
+
+    def refresh(self) -> None:
+        """Bring the index up to date with the log (a no-op if it hasn't changed)."""
+        st = os.stat(self.log_path)
+        signature = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        if signature == self._signature:
+            return
+
+        with open(self.meta_path, "a+") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # one builder across workers
+            try:
+                self._refresh_locked()
+                self._signature = signature
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh_locked(self) -> None:
+        log = open(self.log_path, "rb")
+        st = os.fstat(log.fileno())
+        meta = self._load_meta()
+
+        if not self._meta_valid(meta, st):
+            # Build beside the live index: readers keep the file they opened,
+            # and a crash mid-build leaves the old meta, which is invalid anyway.
+            meta = {
+                "version": INDEX_VERSION, "dev": st.st_dev, "ino": st.st_ino, "log_offset": 0, "head": "",
+                "records": 0, "ts_max": -1, "models": [],
+            }
+            tmp = self.idx_path + ".tmp"
+            open(tmp, "wb").close()
+            self._append(meta, log, tmp)
+            os.replace(tmp, self.idx_path)
+            self._save_meta(meta)
+        else:
+            # A crash between writing records and writing meta leaves extras.
+            with open(self.idx_path, "ab") as idx:
+                if idx.tell() != meta["records"] * RECORD.size:
+                    idx.truncate(meta["records"] * RECORD.size)
+            if st.st_size > meta["log_offset"]:
+                self._append(meta, log, self.idx_path)
+
+        self._idx = open(self.idx_path, "rb")
+        self._log = log
+        self.meta = meta
+
+    def _meta_valid(self, meta: dict | None, st: os.stat_result) -> bool:
+        if not meta or meta.get("version") != INDEX_VERSION:
+            return False
+        if (st.st_dev, st.st_ino) != (meta["dev"], meta["ino"]):
+            return False  # rotated
+        if st.st_size < meta["log_offset"]:
+            return False  # truncated
+        if head_digest(self.log_path, meta["log_offset"]) != meta["head"]:
+            return False  # rewritten
+        return os.path.exists(self.idx_path)
+
+    def _append(self, meta: dict, log, idx_path: str) -> None:
+        """Index *log* from meta["log_offset"] into *idx_path*."""
+        model_ids = {name: i for i, name in enumerate(meta["models"])}
+        pending: list[bytes] = []
+
+        def flush():
+            with open(idx_path, "ab") as idx:
+                idx.write(b"".join(pending))
+            meta["records"] += len(pending)
+            pending.clear()
+            if idx_path == self.idx_path:
+                self._save_meta(meta)  # a rebuild saves meta once it's swapped in
+
+        log.seek(meta["log_offset"])  # queries use pread(), so the position is ours
+        offset = meta["log_offset"]
+        for line in log:
+            if not line.endswith(b"\n"):
+                break  # still being written — pick it up next refresh
+            length = len(line) - 1
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = None
+
+            if isinstance(entry, dict):
+                ts, model, ok = record_fields(entry)
+                if model not in model_ids:
+                    model_ids[model] = len(meta["models"])
+                    meta["models"].append(model)
+                meta["ts_max"] = max(meta["ts_max"], ts)
+                pending.append(RECORD.pack(offset, ts, meta["ts_max"], length, model_ids[model], ok))
+
+            offset += len(line)
+            meta["log_offset"] = offset
+            if len(pending) >= _APPEND_BATCH:
+                meta["head"] = head_digest(self.log_path, offset)
+                flush()
+
+        meta["head"] = head_digest(self.log_path, meta["log_offset"])
+        flush()
+
+    def _load_meta(self) -> dict | None:
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                return json.loads(f.read() or "null")
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, meta: dict) -> None:
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
+
+    # -- queries -----------------------------------------------------------
+
+    def snapshot(self) -> "RunIndex":
+        """This index as of now; later refreshes don't change what it reads."""
+        return copy.copy(self)
+
+    def count(self) -> int:
+        return self.meta.get("records", 0)
+
+    def model_id(self, name: str) -> int | None:
+        try:
+            return self.meta["models"].index(name)
+        except ValueError:
+            return None
+
+    def offset_of(self, seq: int) -> int:
+        """Byte offset in the log where record *seq* starts."""
+        return self._records(seq, seq + 1)[0][0]
+
+    def _records(self, start: int, stop: int) -> list[tuple]:
+        """Records [start, stop) as tuples."""
+        data = pread(self._idx.fileno(), (stop - start) * RECORD.size, start * RECORD.size)
+        return list(RECORD.iter_unpack(data))
+
+    def bisect_time(self, ts_ms: int) -> int:
+        """First seq whose ts_max >= ts_ms (count() if none)."""
+        lo, hi = 0, self.count()
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._records(mid, mid + 1)[0][2] < ts_ms:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def scan(self, *, start: int, descending: bool, limit: int, scan_cap: int,
+             model_id: int | None = None, ok: int | None = None,
+             since_ms: int | None = None, until_ms: int | None = None) -> tuple[list[tuple], int | None]:
+        """
+        Walk records from seq *start* and return up to *limit* matches.
+
+        Returns (matches, resume_seq).  Each match is (seq, record).
+        resume_seq is where the next page starts, or None when there is
+        nothing left.  At most *scan_cap* records are examined per call, so a
+        very selective filter returns a short page instead of a slow one.
+        """
+        total = self.count()
+        matches: list[tuple] = []
+        scanned = 0
+        seq = start
+
+        while 0 <= seq < total and len(matches) < limit and scanned < scan_cap:
+            if descending:
+                lo = max(0, seq - READ_BLOCK_RECORDS + 1)
+                block = list(zip(range(lo, seq + 1), self._records(lo, seq + 1)))[::-1]
+            else:
+                hi = min(total, seq + READ_BLOCK_RECORDS)
+                block = list(zip(range(seq, hi), self._records(seq, hi)))
+
+            for s, rec in block:
+                scanned += 1
+                seq = s - 1 if descending else s + 1
+                _, ts, ts_max, _, mid, rec_ok = rec
+
+                # ts_max is monotonic, so past the window nothing else can match
+                if descending and since_ms is not None and ts_max < since_ms:
+                    return matches, None
+                if not descending and until_ms is not None and ts_max > until_ms:
+                    return matches, None
+                if model_id is not None and mid != model_id:
+                    continue
+                if ok is not None and rec_ok != ok:
+                    continue
+                if since_ms is not None and (ts < 0 or ts < since_ms):
+                    continue
+                if until_ms is not None and (ts < 0 or ts > until_ms):
+                    continue
+
+                matches.append((s, rec))
+                if len(matches) >= limit or scanned >= scan_cap:
+                    break
+
+        if not 0 <= seq < total:
+            return matches, None
+        return matches, seq
+
+    def read(self, records: list[tuple]) -> list[dict]:
+        """Load the log lines behind *records* (one pread each)."""
+        fd = self._log.fileno()
+        return [json.loads(pread(fd, length, offset)) for offset, _, _, length, _, _ in records]
@@ -0,0 +1,59 @@
+"""
+Per-key single-flight for coroutines.
+
+When the log changes, every request that arrives before the first recompute
+finishes would otherwise start its own log_processor run.  SingleFlight makes
+the first caller for a key the "leader"; everyone else awaits the leader's
+task instead of starting a new one.
+
+This only coalesces within one worker process — cross-worker coalescing is
+done with a Redis lock in api/main.py.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._waiters: dict[str, int] = {}
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """
+        Run fn() once per key at a time.
+
+        Returns (result, shared) — shared is True when this caller piggy-backed
+        on a computation started by someone else.
+
+        Why shield()?
+        ─────────────
+        If the leader's client disconnects, its request gets cancelled.  The
+        shield keeps the underlying task alive for the other waiters.  Only
+        when the *last* waiter gives up is the task itself cancelled, so an
+        abandoned computation doesn't keep a log_processor child running.
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            if self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0 and not task.done():
+                    task.cancel()  # everyone gave up
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            del self._waiters[key]
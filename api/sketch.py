@@ -0,0 +1,106 @@
+"""
+Mergeable latency sketch — the Python twin of LatencySketch in
+cpp/log_processor.cpp.
+
+A value v > 0 lands in bucket ceil(log_gamma(v)) with
+gamma = (1 + ALPHA) / (1 - ALPHA).  Reading a quantile back returns the
+bucket's representative value, which is within ALPHA (1%) of every value
+that fell in that bucket.  Merging two sketches is just adding bucket counts,
+so partial aggregates from different byte ranges, files or runs combine
+without keeping the raw latencies around.
+
+The bucket layout MUST match the C++ side, otherwise merged sketches are
+meaningless.
+"""
+
+import math
+
+ALPHA = 0.01
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+
+
+class LatencySketch:
+    def __init__(self):
+        self.bins: dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    # -- building ----------------------------------------------------------
+
+    def add(self, value: float) -> None:
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if self.count == 0 or value > self.max:
+            self.max = value
+        self.count += 1
+        self.sum += value
+        if value <= 0:
+            self.zero += 1
+            return
+        idx = math.ceil(math.log(value) / math.log(GAMMA))
+        self.bins[idx] = self.bins.get(idx, 0) + 1
+
+    def merge(self, other: "LatencySketch") -> None:
+        if other.count == 0:
+            return
+        if self.count == 0 or other.min < self.min:
+            self.min = other.min
+        if self.count == 0 or other.max > self.max:
+            self.max = other.max
+        self.count += other.count
+        self.sum += other.sum
+        self.zero += other.zero
+        for idx, c in other.bins.items():
+            self.bins[idx] = self.bins.get(idx, 0) + c
+
+    # -- reading -----------------------------------------------------------
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """
+        Value at quantile *q* (0..1), using the same nearest-rank rule as the
+        C++ percentile(): rank = floor(q * (count - 1)).
+        """
+        if self.count == 0:
+            return 0.0
+        rank = int(q * (self.count - 1))
+        if rank < self.zero:
+            return self.min
+        seen = self.zero
+        for idx in sorted(self.bins):
+            seen += self.bins[idx]
+            if seen > rank:
+                estimate = 2 * GAMMA ** idx / (GAMMA + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    # -- (de)serialisation — same shape as LatencySketch::to_json() ---------
+
+    def to_dict(self) -> dict:
+        return {
+            "alpha": ALPHA,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "zero": self.zero,
+            "bins": {str(i): c for i, c in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencySketch":
+        if data.get("alpha", ALPHA) != ALPHA:
+            raise ValueError(f"Sketch alpha {data.get('alpha')} != {ALPHA}")
+        s = cls()
+        s.count = int(data.get("count", 0))
+        s.sum = float(data.get("sum", 0.0))
+        s.min = float(data.get("min", 0.0))
+        s.max = float(data.get("max", 0.0))
+        s.zero = int(data.get("zero", 0))
+        s.bins = {int(i): int(c) for i, c in data.get("bins", {}).items()}
+        return s
@@ -0,0 +1,163 @@
+"""
+Live tail of an append-only JSONL log.
+
+Operators watching for failures used to re-poll /process-logs.  Instead, one
+LogTailer per file follows it from the end and fans each batch of new
+records out to every subscriber:
+
+  * one reader task per file per worker, however many clients are attached —
+    it starts with the first subscriber and stops with the last;
+  * each poll reads only the bytes appended since the previous one, parses
+    them once, and hands the same parsed batch to every subscriber;
+  * every subscriber has a bounded queue of batches.  When a slow client's
+    queue is full its oldest batch is dropped (and counted) instead of
+    letting server memory grow.
+
+Rotation (new inode) or truncation restarts from the top of the new file.
+"""
+
+import asyncio
+import json
+import os
+
+from api.responses import dumps
+from api.runindex import record_fields
+
+TAIL_READ_LIMIT = 4 * 1024 * 1024  # max bytes consumed per poll
+
+
+def is_failure(entry: dict) -> bool:
+    """Same rule as log_processor's is_error(): error_meta.ok, else validation.passed."""
+    meta = entry.get("error_meta")
+    if isinstance(meta, dict) and isinstance(meta.get("ok"), bool):
+        return not meta["ok"]
+    validation = entry.get("validation")
+    if isinstance(validation, dict) and isinstance(validation.get("passed"), bool):
+        return not validation["passed"]
+    return False
+
+
+class Subscriber:
+    def __init__(self, max_batches: int, agent: str | None = None, failures_only: bool = False):
+        self.agent = agent
+        self.failures_only = failures_only
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_batches)
+
+    def offer(self, batch: list[tuple[dict, bytes]]) -> None:
+        """Queue the records this subscriber wants; drop the oldest batch if full."""
+        wanted = [encoded for entry, encoded in batch if self._wants(entry)]
+        if not wanted:
+            return
+        if self._queue.full():
+            self.dropped += len(self._queue.get_nowait())
+        self._queue.put_nowait(wanted)
+
+    def _wants(self, entry: dict) -> bool:
+        if self.agent is not None and record_fields(entry)[1] != self.agent:
+            return False
+        if self.failures_only and not is_failure(entry):
+            return False
+        return True
+
+    async def next_batch(self, timeout: float) -> list[bytes] | None:
+        """Next batch of encoded records, or None if nothing arrived in *timeout*."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def take_dropped(self) -> int:
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class LogTailer:
+    def __init__(self, path: str, poll_interval: float):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.records = 0
+        self._subscribers: set[Subscriber] = set()
+        self._task: asyncio.Task | None = None
+        self._offset = 0
+        self._identity: tuple | None = None
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, sub: Subscriber) -> Subscriber:
+        self._subscribers.add(sub)
+        if self._task is None or self._task.done():
+            self._seek_to_end()
+            self._task = asyncio.create_task(self._run())
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subscribers.discard(sub)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def close(self) -> None:
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subscribers), "offset": self._offset, "records": self.records}
+
+    def _seek_to_end(self) -> None:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self._identity, self._offset = None, 0
+            return
+        self._identity = (st.st_dev, st.st_ino)
+        self._offset = st.st_size
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                batch = await asyncio.to_thread(self._read_new)
+            except OSError:
+                continue  # file briefly missing during rotation
+            if batch:
+                self.records += len(batch)
+                for sub in list(self._subscribers):
+                    sub.offer(batch)
+
+    def _read_new(self) -> list[tuple[dict, bytes]]:
+        """Parse complete lines appended since the last poll (blocking)."""
+        st = os.stat(self.path)
+        identity = (st.st_dev, st.st_ino)
+        if identity != self._identity or st.st_size < self._offset:
+            self._identity, self._offset = identity, 0  # rotated / truncated
+        if st.st_size == self._offset:
+            return []
+
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(min(st.st_size - self._offset, TAIL_READ_LIMIT))
+
+        end = data.rfind(b"\n") + 1  # a trailing partial line waits for the next poll
+        if end == 0:
+            if len(data) == TAIL_READ_LIMIT:
+                self._offset += len(data)  # absurdly long line: skip it
+            return []
+        self._offset += end
+
+        batch = []
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                batch.append((entry, dumps(entry)))
+        return batch
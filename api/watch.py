@@ -0,0 +1,132 @@
+"""
+Debounced change detection for the log files the API serves.
+
+Without it, the first /process-logs after a restart, and the first one after
+every append, pays for the recompute.  FileWatcher polls the watched files'
+stat() signatures (dev, inode, size, mtime) and calls on_change(path) once a
+file has settled:
+
+  * debounce — a burst of appends triggers one recompute, WATCH_DEBOUNCE
+    seconds after the last change;
+  * max delay — a file that never stops changing is still recomputed every
+    WATCH_MAX_DELAY seconds, so its cache never falls far behind;
+  * one recompute per file at a time — changes seen while one is running
+    are picked up by the next.
+
+Polling a handful of stat() calls once a second is cheap, survives rotation
+(a new inode is just a new signature) and needs no inotify dependency — the
+same trade-off LogTailer makes.  Files named in the config are pinned; files
+registered by requests are evicted least-recently-used beyond max_files.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+
+class _Watched:
+    __slots__ = ("pinned", "signature", "first_change", "last_change", "task")
+
+    def __init__(self, pinned: bool):
+        self.pinned = pinned
+        self.signature: tuple | None = None
+        self.first_change: float | None = None  # start of the current burst
+        self.last_change = 0.0
+        self.task: asyncio.Task | None = None
+
+
+def _signature(path: str) -> tuple | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None  # missing for now (rotation in progress, not created yet)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class FileWatcher:
+    def __init__(self, on_change: Callable[[str], Awaitable[None]], interval: float,
+                 debounce: float, max_delay: float, max_files: int):
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_files = max_files
+        self.recomputes = 0
+        self.failures = 0
+        self._files: OrderedDict[str, _Watched] = OrderedDict()
+        self._task: asyncio.Task | None = None
+
+    def add(self, path: str, pinned: bool = False) -> None:
+        """Watch *path*; requests re-adding a file keep it from being evicted."""
+        path = os.path.abspath(path)
+        watched = self._files.get(path)
+        if watched is not None:
+            watched.pinned = watched.pinned or pinned
+            self._files.move_to_end(path)
+            return
+        self._files[path] = _Watched(pinned)
+        self._files[path].signature = _signature(path)
+        unpinned = [p for p, w in self._files.items() if not w.pinned]
+        for stale in unpinned[:max(0, len(unpinned) - self.max_files)]:
+            del self._files[stale]
+
+    def paths(self) -> list[str]:
+        return list(self._files)
+
+    def start(self) -> None:
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        tasks = [w.task for w in self._files.values() if w.task and not w.task.done()]
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self._files),
+            "pending": sum(1 for w in self._files.values() if w.first_change is not None),
+            "recomputes": self.recomputes,
+            "failures": self.failures,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            paths = list(self._files)
+            signatures = await asyncio.to_thread(lambda: [_signature(p) for p in paths])
+            now = time.monotonic()
+            for path, signature in zip(paths, signatures):
+                watched = self._files.get(path)
+                if watched is None or signature is None:
+                    continue
+                if signature != watched.signature:
+                    watched.signature = signature
+                    watched.last_change = now
+                    if watched.first_change is None:
+                        watched.first_change = now
+                if self._due(watched, now):
+                    watched.first_change = None
+                    watched.task = asyncio.create_task(self._recompute(path))
+
+    def _due(self, watched: _Watched, now: float) -> bool:
+        if watched.first_change is None:
+            return False
+        if watched.task is not None and not watched.task.done():
+            return False  # still busy with the previous change
+        return (now - watched.last_change >= self.debounce
+                or now - watched.first_change >= self.max_delay)
+
+    async def _recompute(self, path: str) -> None:
+        try:
+            await self.on_change(path)
+            self.recomputes += 1
+        except Exception as exc:
+            self.failures += 1
+            print(f"[warn] background recompute of {path} failed: {exc!r}")
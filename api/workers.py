@@ -0,0 +1,190 @@
+"""
+Supervised pool of long-lived `log_processor --serve` workers.
+
+Spawning the binary on every cache miss pays for fork/exec, dynamic loading
+and teardown each time.  Instead each uvicorn worker keeps PROCESSOR_POOL_SIZE
+processes running and talks to them over stdin/stdout, one JSON object per
+line (see serve() in cpp/log_processor.cpp for the frame format).
+
+Supervision rules:
+  * a worker that exited is respawned the next time it is checked out
+  * a worker that misses its deadline (writing the request included),
+    returns garbage or is interrupted mid-request is killed — its pipe may
+    still hold a stale response — and replaced lazily
+  * close() stops every process the pool spawned, busy or idle
+"""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+from api.metrics import phase
+
+# Partial aggregates are one JSON line; many agents × sketch bins can exceed
+# asyncio's default 64 KB line limit.
+_STREAM_LIMIT = 16 * 1024 * 1024
+
+
+class ProcessorError(Exception):
+    """log_processor reported an error or its worker died mid-request."""
+
+
+class QueueFullError(Exception):
+    """Too many requests are already waiting for a processor slot."""
+
+
+class ProcessorGate:
+    """
+    Bounded concurrency + bounded queue in front of every processor backend.
+
+    At most *limit* scans run at once; up to *max_queue* more wait their turn
+    and anything beyond that is rejected straight away (the API answers 503)
+    rather than piling up behind a slow scan.
+    """
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._sem = asyncio.Semaphore(limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": 1000 * self.total_wait / self.admitted if self.admitted else 0.0,
+            "max_wait_ms": 1000 * self.max_wait,
+        }
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"{self.waiting} scans already queued")
+
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._sem.release()
+
+
+class ProcessorPool:
+    def __init__(self, binary: str, size: int, timeout: float):
+        self.binary = binary
+        self.size = size
+        self.timeout = timeout
+        self.restarts = 0
+        self.requests = 0
+        self._next_id = 0
+        # Idle workers.  None is a slot whose process must be (re)spawned.
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._procs: set[asyncio.subprocess.Process] = set()  # every live one, busy or idle
+
+    async def start(self) -> None:
+        for _ in range(self.size):
+            self._idle.put_nowait(await self._spawn())
+
+    async def close(self) -> None:
+        async def stop(proc: asyncio.subprocess.Process) -> None:
+            if proc.returncode is None:
+                proc.stdin.close()  # serve() exits at EOF, after any request in hand
+                try:
+                    await asyncio.wait_for(proc.wait(), timeout=2)
+                except asyncio.TimeoutError:
+                    proc.kill()
+                    await proc.wait()
+
+        procs, self._procs = self._procs, set()
+        await asyncio.gather(*(stop(proc) for proc in procs))
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "requests": self.requests,
+            "restarts": self.restarts,
+        }
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        proc = await asyncio.create_subprocess_exec(
+            self.binary, "--serve",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=_STREAM_LIMIT,
+        )
+        self._procs.add(proc)
+        return proc
+
+    async def scan(self, path: str, offset: int = 0, filters: dict | None = None) -> dict:
+        """Ask a worker for the --partial aggregate of *path* from *offset*."""
+        proc = await self._idle.get()
+        healthy = False
+        try:
+            if proc is None or proc.returncode is not None:
+                if proc is not None:
+                    self.restarts += 1
+                    self._procs.discard(proc)
+                proc = await self._spawn()
+
+            self._next_id += 1
+            req_id = self._next_id
+            self.requests += 1
+
+            request = {"id": req_id, "path": path, "offset": offset}
+            if filters:
+                request["filter"] = filters
+            frame = json.dumps(request).encode() + b"\n"
+
+            async def exchange() -> bytes:
+                # drain() blocks if the worker stops reading: keep it under the deadline
+                proc.stdin.write(frame)
+                await proc.stdin.drain()
+                return await proc.stdout.readline()
+
+            with phase("processor"):
+                line = await asyncio.wait_for(exchange(), self.timeout)
+            if not line:
+                raise ProcessorError("log_processor worker exited unexpectedly")
+
+            with phase("json_parse"):
+                resp = json.loads(line)
+            if resp.get("id") != req_id:
+                raise ProcessorError("log_processor worker sent an out-of-order response")
+            healthy = True
+
+            if not resp.get("ok"):
+                raise ProcessorError(resp.get("error", "unknown error"))
+            return resp["result"]
+        except (OSError, ValueError) as exc:
+            raise ProcessorError(f"log_processor worker failed: {exc}") from exc
+        finally:
+            if not healthy and proc is not None and proc.returncode is None:
+                proc.kill()
+                self.restarts += 1
+                self._procs.discard(proc)
+                proc = None
+            self._idle.put_nowait(proc)
@@ -21,7 +21,6 @@ from typing import List
 
 from dotenv import load_dotenv
 
-from llm.client import build_registry
 from validators.base import contextValidation
 from validators.basic_validators import EmptyOutputValidator, ShortOutputValidator, LongOutputValidator
 from validators.runner import RunAllTests
@@ -29,6 +28,7 @@ from validators.runner import RunAllTests
 PROMPTS_FILE  = Path(__file__).parent / "prompts.json"
 RESULTS_FILE  = Path("data/benchmark_results.jsonl")
 ALLOWED_AGENTS = ["gemini", "stub", "openai"]
+VALIDATORS     = [EmptyOutputValidator(), ShortOutputValidator(), LongOutputValidator()]
 
 
 def load_prompts() -> list:
@@ -36,9 +36,10 @@ def load_prompts() -> list:
         return json.load(f)
 
 
-def save_results(results: list) -> None:
-    RESULTS_FILE.parent.mkdir(exist_ok=True)
-    with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+def save_results(results: list, path: Path = RESULTS_FILE) -> None:
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
         for record in results:
             f.write(json.dumps(record, ensure_ascii=False) + "\n")
 
@@ -91,9 +92,30 @@ def print_summary(results: list) -> None:
     print("=" * 62 + "\n")
 
 
+def build_record(item: dict, agent_key: str, agent_name: str, response_text: str,
+                 error_meta: dict, latency_sec, fan_elapsed: float, ts: str) -> dict:
+    """Validate one agent's answer to one benchmark prompt and shape the result row."""
+    ctx        = contextValidation(item["prompt"], response_text, agent_name)
+    validation = RunAllTests.run_validators(ctx, VALIDATORS)
+
+    return {
+        "run_id":             f"bench-{ts}-{item['id']}-{agent_key}",
+        "prompt_id":          item["id"],
+        "tags":               item.get("tags", []),
+        "prompt":             item["prompt"],
+        "agent_key":          agent_key,
+        "agent_name":         agent_name,
+        "response":           response_text,
+        "validation":         validation,
+        "latency_sec":        latency_sec,
+        "fan_out_latency_sec": fan_elapsed,
+        "error_meta":         error_meta,
+        "timestamp":          ts,
+    }
+
+
 async def run_benchmark(agent_keys: List[str], registry: dict, timeout: int) -> list:
     prompts    = load_prompts()
-    validators = [EmptyOutputValidator(), ShortOutputValidator(), LongOutputValidator()]
     all_results: list = []
 
     selected_keys  = [k for k in agent_keys if k in registry]
@@ -106,7 +128,6 @@ async def run_benchmark(agent_keys: List[str], registry: dict, timeout: int) ->
     for i, item in enumerate(prompts, 1):
         prompt    = item["prompt"]
         prompt_id = item["id"]
-        tags      = item.get("tags", [])
 
         preview = prompt[:55] + "..." if len(prompt) > 55 else prompt
         print(f"  [{i:2}/{total}] {prompt_id:<28} \"{preview}\"")
@@ -128,29 +149,18 @@ async def run_benchmark(agent_keys: List[str], registry: dict, timeout: int) ->
             response_text = bot.errorLogs.set_from_result(result)
             error_meta    = bot.errorLogs.get_meta()
 
-            ctx        = contextValidation(prompt, response_text, agent_name)
-            validation = RunAllTests.run_validators(ctx, validators)
-
-            record = {
-                "run_id":             f"bench-{ts}-{prompt_id}-{agent_key}",
-                "prompt_id":          prompt_id,
-                "tags":               tags,
-                "prompt":             prompt,
-                "agent_key":          agent_key,
-                "agent_name":         agent_name,
-                "response":           response_text,
-                "validation":         validation,
-                "latency_sec":        bot.monitor.last_latency,
-                "fan_out_latency_sec": fan_elapsed,
-                "error_meta":         error_meta,
-                "timestamp":          ts,
-            }
+            record = build_record(
+                item, agent_key, agent_name, response_text, error_meta,
+                bot.monitor.last_latency, fan_elapsed, ts,
+            )
             all_results.append(record)
 
     return all_results
 
 
 async def main() -> None:
+    from llm.client import build_registry  # imports the LLM SDKs; keep them off the API's import path
+
     load_dotenv()
 
     parser = ArgumentParser(description="Benchmark runner — runs predefined prompts against LLM agents")
@@ -1,29 +1,261 @@
 #include <iostream>
 #include <fstream>
 #include <string>
+#include <string_view>
 #include <vector>
 #include <thread>
+#include <condition_variable>
+#include <deque>
+#include <memory>
+#include <atomic>
+#include <chrono>
 #include <mutex>
 #include <map>
 #include <algorithm>
 #include <numeric>
 #include <sstream>
+#include <cmath>
+#include <stdexcept>
+#include <cstring>
+#include <cstdlib>
+#include <cstdint>
+#include <charconv>
+#include <cerrno>
+#include <fcntl.h>
+#include <sched.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 #include "json.hpp"
 using json = nlohmann::json;
 
+// ── Step 0: Mergeable latency sketch ─────────────────────────────────────────
+// Log-bucketed histogram: a value v > 0 lands in bucket ceil(log_gamma(v)) with
+// gamma = (1 + ALPHA) / (1 - ALPHA).  Every value in a bucket is within ALPHA
+// (1%) of the bucket's representative value, so quantiles read from the sketch
+// have at most 1% relative error.  Two sketches merge by adding bucket counts,
+// which is what lets the API combine partial aggregates (see api/sketch.py —
+// the bucket layout there must stay identical to this one).
+//
+// Error bounds, as used for the p50/p95/p99 in the report:
+//   * the rank is exact: quantile(q) picks the bucket holding the value at
+//     rank floor(q * (count - 1)), the same rule as the exact percentile();
+//   * for a value v > 0 the answer is within 1% of v (and is clamped to
+//     [min, max], so p99 of a single record is that record);
+//   * values <= 0 share one bucket and read back as `min`;
+//   * count, sum (so the average), min and max are exact.
+// Size depends on the spread of the values, not their number: there are
+// about 115 buckets per factor of ten, so latencies from 1 ms to 1 hour need
+// at most ~760 buckets per agent however many records there are.
+struct LatencySketch {
+    static constexpr double ALPHA = 0.01;
+    std::map<int, long long> bins;
+    long long zero  = 0;   // values <= 0 can't be log-bucketed
+    long long count = 0;
+    double sum = 0.0;
+    double min = 0.0;
+    double max = 0.0;
+
+    static double gamma() { return (1.0 + ALPHA) / (1.0 - ALPHA); }
+
+    void add(double v) {
+        if (count == 0 || v < min) min = v;
+        if (count == 0 || v > max) max = v;
+        count++;
+        sum += v;
+        if (v <= 0.0) { zero++; return; }
+        bins[static_cast<int>(std::ceil(std::log(v) / std::log(gamma())))]++;
+    }
+
+    void merge(const LatencySketch& o) {
+        if (o.count == 0) return;
+        if (count == 0 || o.min < min) min = o.min;
+        if (count == 0 || o.max > max) max = o.max;
+        count += o.count;
+        sum   += o.sum;
+        zero  += o.zero;
+        for (auto& [i, c] : o.bins) bins[i] += c;
+    }
+
+    // Same rule and representative value as api/sketch.py's quantile()
+    double quantile(double q) const {
+        if (count == 0) return 0.0;
+        long long rank = static_cast<long long>(q * (count - 1));
+        if (rank < zero) return min;
+        long long seen = zero;
+        for (auto& [i, c] : bins) {
+            seen += c;
+            if (seen > rank) {
+                double estimate = 2.0 * std::pow(gamma(), i) / (gamma() + 1.0);
+                return std::min(std::max(estimate, min), max);
+            }
+        }
+        return max;
+    }
+
+    json to_json() const {
+        json b = json::object();
+        for (auto& [i, c] : bins) b[std::to_string(i)] = c;
+        return {
+            {"alpha", ALPHA}, {"count", count}, {"sum", sum},
+            {"min", min}, {"max", max}, {"zero", zero}, {"bins", b},
+        };
+    }
+
+    // Inverse of to_json().  Throws if `j` isn't a sketch with the same ALPHA
+    // (bucket indexes from a different gamma can't be merged).
+    static LatencySketch from_json(const json& j) {
+        if (j.at("alpha").get<double>() != ALPHA)
+            throw std::invalid_argument("latency sketch has a different alpha");
+        LatencySketch s;
+        s.count = j.at("count").get<long long>();
+        s.sum   = j.at("sum").get<double>();
+        s.min   = j.at("min").get<double>();
+        s.max   = j.at("max").get<double>();
+        s.zero  = j.value("zero", 0LL);
+        for (auto& [i, c] : j.at("bins").items())
+            s.bins[std::stoi(i)] = c.get<long long>();
+        return s;
+    }
+};
+
 // ── Step 1: Define the struct FIRST before anything uses it ──────────────────
-// C++ reads top to bottom — global_stats uses AgentStats, so this must come first
+// C++ reads top to bottom — Aggregate uses AgentStats, so this must come first
 struct AgentStats {
     long long total        = 0;
     long long error_count  = 0;
     long long val_failed   = 0;
     long long null_resp    = 0;
-    std::vector<double> latencies;
+    LatencySketch sketch;
+    std::vector<double> latencies;   // every value, only kept with --exact
+};
+
+// ── Step 2: Optional record filter (predicate pushdown) ──────────────────────
+// Empty strings / -1 mean "don't filter on this".  The API passes these for
+// questions like "gemini errors in the last 6 hours" so lines that can't
+// match are dropped inside the scanner — most of them before json::parse().
+struct Filter {
+    std::string agent;          // model_name
+    std::string error_type;     // error_meta.error_type
+    long long since_ms = -1;    // record time >= since_ms
+    long long until_ms = -1;    // record time <= until_ms
+    int validation     = -1;    // 1 = validation.passed true, 0 = false
+
+    // Quoted forms searched for in the raw line; left empty when the value
+    // could be escaped differently in the file (then only the DOM check runs).
+    std::string agent_needle;
+    std::string error_needle;
+
+    bool active() const {
+        return !agent.empty() || !error_type.empty()
+            || since_ms >= 0 || until_ms >= 0 || validation >= 0;
+    }
+
+    static std::string needle(const std::string& v) {
+        if (v.empty()) return "";
+        for (unsigned char c : v)
+            if (c < 0x20 || c >= 0x7f || c == '"' || c == '\\') return "";
+        return "\"" + v + "\"";
+    }
+
+    void prepare() {
+        // records without model_name count as "unknown", which isn't in the line
+        agent_needle = agent == "unknown" ? "" : needle(agent);
+        error_needle = needle(error_type);
+    }
+};
+
+// ── Step 2b: Which JSON reader process_chunk() uses ──────────────────────────
+// Both give identical results; `ondemand` only reads the fields it needs (see
+// Helper 6).  --parser picks one per run; LOGPROC_PARSER sets the default, so
+// the API's subprocesses, --serve workers and the shared library can be
+// switched without code changes.
+enum class Parser { Dom, OnDemand };
+
+static bool parse_parser(const char* name, Parser& out) {
+    if (std::strcmp(name, "dom") == 0)      { out = Parser::Dom;      return true; }
+    if (std::strcmp(name, "ondemand") == 0) { out = Parser::OnDemand; return true; }
+    return false;
+}
+
+static Parser default_parser() {
+    Parser parser = Parser::Dom;
+    if (const char* env = std::getenv("LOGPROC_PARSER"))
+        parse_parser(env, parser);
+    return parser;
+}
+
+// ── Step 2c: How many threads a scan uses ───────────────────────────────────
+// All the cores this process may run on, unless --threads or LOGPROC_THREADS
+// says otherwise.
+static int available_cores() {
+#ifdef __linux__
+    cpu_set_t set;
+    if (sched_getaffinity(0, sizeof set, &set) == 0)
+        return CPU_COUNT(&set);   // honours taskset / container cpusets
+#endif
+    unsigned n = std::thread::hardware_concurrency();
+    return n ? static_cast<int>(n) : 4;
+}
+
+static int default_threads() {
+    if (const char* env = std::getenv("LOGPROC_THREADS")) {
+        int n = std::atoi(env);
+        if (n > 0) return n;
+    }
+    return available_cores();
+}
+
+// Streaming-mode memory budget in bytes (see scan_stream); LOGPROC_MAX_MEMORY
+// takes the same "512M" / "2G" sizes as --max-memory.
+static bool parse_size(const char* v, size_t& out);
+
+static size_t default_max_memory() {
+    size_t n = 0;
+    if (const char* env = std::getenv("LOGPROC_MAX_MEMORY"))
+        parse_size(env, n);
+    return n;
+}
+
+// What --stats reports: how the scan was split and how busy each thread was
+struct ThreadStats {
+    double    busy_ms = 0.0;   // wall time spent parsing and merging
+    double    cpu_ms  = 0.0;   // CPU time; less than busy_ms when cores are oversubscribed
+    long long tasks   = 0;
+    long long bytes   = 0;
+    long long lines   = 0;
 };
 
-// ── Step 2: Now we can declare globals that use AgentStats ───────────────────
-std::mutex mtx;
-std::map<std::string, AgentStats> global_stats;
+struct ScanStats {
+    std::string mode;          // "mmap" or "stream"
+    size_t task_bytes = 0;     // task size (mmap) or block size (stream)
+    size_t tasks      = 0;
+    double wall_ms    = 0.0;
+    double read_ms      = 0.0; // stream: time in read()
+    double read_wait_ms = 0.0; // stream: reader waiting for a free block (parsers are the bottleneck)
+    std::vector<ThreadStats> threads;
+};
+
+// ── Step 3: One scan's worth of results ──────────────────────────────────────
+// No globals: the shared library (see the C ABI at the bottom) may run several
+// scans at once from different Python threads, so each scan owns its state.
+struct Aggregate {
+    std::mutex mtx;
+    std::map<std::string, AgentStats> stats;
+    Filter filter;
+    Parser parser          = default_parser();
+    int threads            = default_threads();
+    size_t max_memory      = default_max_memory();   // 0 = map the file when possible
+    bool exact             = false;  // keep every latency for exact percentiles (--exact)
+    ScanStats scan;
+    long long total_lines  = 0;
+    long long matched      = 0;   // lines that passed `filter`
+    long long start_offset = 0;
+    long long end_offset   = 0;
+
+    // With a filter, "total_lines" means the lines that matched it
+    long long reported_lines() const { return filter.active() ? matched : total_lines; }
+};
 
 // ── Helper 1: Extract latency in ms regardless of which field name was used ──
 // Your logs changed field names 3 times across your project history
@@ -57,69 +289,649 @@ bool is_error(const json& j) {
     return false;
 }
 
-// ── Helper 3: Compute a percentile from a vector of values ───────────────────
+// ── Helper 3: ISO-8601 timestamp → epoch milliseconds ────────────────────────
+// Accepts "2026-02-12T11:26:50.618359+00:00", a trailing "Z", or no zone
+// (taken as UTC).  Returns -1 if the text isn't a timestamp.
+static long long days_from_civil(long long y, unsigned m, unsigned d) {
+    y -= m <= 2;
+    const long long era = (y >= 0 ? y : y - 399) / 400;
+    const unsigned yoe  = static_cast<unsigned>(y - era * 400);
+    const unsigned doy  = (153 * (m + (m > 2 ? -3 : 9)) + 2) / 5 + d - 1;
+    const unsigned doe  = yoe * 365 + yoe / 4 - yoe / 100 + doy;
+    return era * 146097 + static_cast<long long>(doe) - 719468;
+}
+
+long long parse_iso_ms(const char* s, size_t n) {
+    auto num = [&](size_t pos, size_t len, int& out) {
+        if (pos + len > n) return false;
+        out = 0;
+        for (size_t i = pos; i < pos + len; i++) {
+            if (s[i] < '0' || s[i] > '9') return false;
+            out = out * 10 + (s[i] - '0');
+        }
+        return true;
+    };
+
+    int Y, M, D, h, m, sec;
+    if (!num(0, 4, Y) || n < 19 || s[4] != '-' || !num(5, 2, M) || s[7] != '-' || !num(8, 2, D)
+        || (s[10] != 'T' && s[10] != ' ') || !num(11, 2, h) || s[13] != ':' || !num(14, 2, m)
+        || s[16] != ':' || !num(17, 2, sec))
+        return -1;
+    if (M < 1 || M > 12 || D < 1 || D > 31 || h > 23 || m > 59 || sec > 60)
+        return -1;
+
+    size_t pos = 19;
+    long long ms = 0;
+    if (pos < n && s[pos] == '.') {
+        int digits = 0;
+        for (pos++; pos < n && s[pos] >= '0' && s[pos] <= '9'; pos++, digits++)
+            if (digits < 3) ms = ms * 10 + (s[pos] - '0');
+        if (digits == 0) return -1;
+        for (; digits < 3; digits++) ms *= 10;
+    }
+
+    long long offset_min = 0;
+    if (pos < n && (s[pos] == 'Z' || s[pos] == 'z')) {
+        pos++;
+    } else if (pos < n && (s[pos] == '+' || s[pos] == '-')) {
+        int oh, om;
+        bool colon = pos + 3 < n && s[pos + 3] == ':';
+        if (!num(pos + 1, 2, oh) || !num(pos + (colon ? 4 : 3), 2, om)) return -1;
+        offset_min = (s[pos] == '-' ? -1 : 1) * (oh * 60 + om);
+        pos += colon ? 6 : 5;
+    }
+    if (pos != n) return -1;
+
+    long long days = days_from_civil(Y, static_cast<unsigned>(M), static_cast<unsigned>(D));
+    long long secs = days * 86400 + h * 3600 + m * 60 + sec - offset_min * 60;
+    return secs * 1000 + ms;
+}
+
+// Record time, from the first of these fields that is present (-1 if none
+// or unparseable) — the same rule as api/runindex.py's record_fields().
+static const char* const TIME_FIELDS[] = {"time_stamp", "time_stamp ", "timestamp"};
+
+long long record_time_ms(const json& j) {
+    for (const char* field : TIME_FIELDS) {
+        if (!j.contains(field)) continue;
+        const auto& v = j[field];
+        if (!v.is_string()) return -1;
+        const auto& str = v.get_ref<const std::string&>();
+        return parse_iso_ms(str.data(), str.size());
+    }
+    return -1;
+}
+
+// ── Helper 4: Filter checks ───────────────────────────────────────────────────
+// line_may_match() works on the raw bytes and only says "no" when it is sure:
+// a record whose model_name is X must contain "X" somewhere, and a top-level
+// time field can be read without parsing the rest of the object.  Anything it
+// lets through is checked exactly by record_matches() after json::parse().
+static long long raw_time_ms(std::string_view line) {
+    for (const char* field : TIME_FIELDS) {
+        std::string key = std::string("\"") + field + "\"";
+        size_t at = line.find(key);
+        // a key is never preceded by a backslash; an escaped quote inside a value is
+        while (at != std::string_view::npos && at > 0 && line[at - 1] == '\\')
+            at = line.find(key, at + 1);
+        if (at == std::string_view::npos) continue;
+
+        size_t p = at + key.size();
+        while (p < line.size() && (line[p] == ' ' || line[p] == '\t')) p++;
+        if (p >= line.size() || line[p] != ':') return -1;
+        p++;
+        while (p < line.size() && (line[p] == ' ' || line[p] == '\t')) p++;
+        if (p >= line.size() || line[p] != '"') return -1;
+        size_t end = line.find('"', p + 1);
+        if (end == std::string_view::npos) return -1;
+        return parse_iso_ms(line.data() + p + 1, end - p - 1);
+    }
+    return -1;
+}
+
+bool line_may_match(std::string_view line, const Filter& f) {
+    if (!f.agent_needle.empty() && line.find(f.agent_needle) == std::string_view::npos)
+        return false;
+    if (!f.error_needle.empty() && line.find(f.error_needle) == std::string_view::npos)
+        return false;
+    if (f.since_ms >= 0 || f.until_ms >= 0) {
+        long long ts = raw_time_ms(line);
+        if (ts >= 0 && ((f.since_ms >= 0 && ts < f.since_ms) || (f.until_ms >= 0 && ts > f.until_ms)))
+            return false;
+    }
+    return true;
+}
+
+bool record_matches(const json& j, const std::string& model, const Filter& f) {
+    if (!f.agent.empty() && model != f.agent)
+        return false;
+
+    if (f.since_ms >= 0 || f.until_ms >= 0) {
+        long long ts = record_time_ms(j);
+        if (ts < 0 || (f.since_ms >= 0 && ts < f.since_ms) || (f.until_ms >= 0 && ts > f.until_ms))
+            return false;
+    }
+
+    if (!f.error_type.empty()) {
+        if (!j.contains("error_meta") || !j["error_meta"].is_object())
+            return false;
+        const auto& em = j["error_meta"];
+        if (!em.contains("error_type") || em["error_type"] != f.error_type)
+            return false;
+    }
+
+    if (f.validation >= 0) {
+        if (!j.contains("validation") || !j["validation"].is_object())
+            return false;
+        const auto& v = j["validation"];
+        if (!v.contains("passed") || !v["passed"].is_boolean()
+            || v["passed"].get<bool>() != (f.validation == 1))
+            return false;
+    }
+    return true;
+}
+
+// ── Helper 5: Compute a percentile from a sorted vector of values (--exact) ──
 // p=50 gives median, p=95 gives p95, etc.
-double percentile(std::vector<double>& v, double p) {
+double percentile(const std::vector<double>& v, double p) {
     if (v.empty()) return 0.0;
-    std::sort(v.begin(), v.end());
     size_t idx = static_cast<size_t>(p / 100.0 * (v.size() - 1));
     return v[idx];
 }
 
-// ── Thread worker: processes one chunk of lines ───────────────────────────────
-void process_chunk(const std::vector<std::string>& chunk) {
-    // Local map — no lock needed while building this
-    std::map<std::string, AgentStats> local_stats;
+// ── Helper 6: On-demand record reader (--parser ondemand) ────────────────────
+// json::parse() builds a DOM of the whole line — including ai_response and
+// validation.results, which are most of the bytes — to read six fields.
+// OnDemand walks the top-level object once instead: the fields we use are
+// captured as raw tokens, everything else is validated and skipped without
+// allocating.  Plain string bytes are skipped 8 at a time (SWAR).  Lines that
+// json::parse() would reject (bad syntax, bad escapes, invalid UTF-8, trailing
+// garbage) are rejected here too, so both parsers produce the same numbers.
+struct Token {
+    std::string_view raw;   // the JSON text, quotes included for strings
+    char kind    = 0;       // 0 absent, 's' string, 'n' number, 't' / 'f' bool, 'z' null, '{', '['
+    bool escaped = false;   // string contains a backslash escape
+};
 
-    for (const auto& line : chunk) {
-        if (line.empty()) continue;
+struct RecordView {
+    Token model_name;
+    Token latency[3];       // fan_out_latency_sec, latency_ms, "latency(ms) "
+    Token time[3];          // TIME_FIELDS, in the same order
+    Token ai_response;
+    bool  error_meta = false;   // error_meta is an object
+    Token ok, error_type;
+    bool  validation = false;   // validation is an object
+    Token passed;
+};
 
-        json j;
-        try {
-            j = json::parse(line);
-        } catch (...) {
-            continue; // skip malformed lines — don't crash
+static std::string token_string(const Token& t) {
+    if (!t.escaped) return std::string(t.raw.substr(1, t.raw.size() - 2));
+    return json::parse(t.raw.begin(), t.raw.end()).get<std::string>();
+}
+
+static bool key_is(const Token& key, std::string_view name) {
+    if (!key.escaped) return key.raw.substr(1, key.raw.size() - 2) == name;
+    return token_string(key) == name;
+}
+
+class OnDemand {
+public:
+    // false: not valid JSON (json::parse() would throw)
+    bool parse(std::string_view line, RecordView& out) {
+        p   = line.data();
+        end = line.data() + line.size();
+        out = RecordView();
+        if (end - p >= 3 && std::memcmp(p, "\xEF\xBB\xBF", 3) == 0) p += 3; // BOM, as json::parse()
+        ws();
+        if (p < end && *p == '{') {
+            if (!object([&](const Token& k) { return field(k, out); })) return false;
+        } else if (!skip_value()) {
+            return false; // (a top-level scalar or array has none of our fields)
         }
+        ws();
+        return p == end;
+    }
 
-        // Get model name, default to "unknown" if missing
-        std::string model = "unknown";
-        if (j.contains("model_name") && j["model_name"].is_string())
-            model = j["model_name"].get<std::string>();
+private:
+    const char* p   = nullptr;
+    const char* end = nullptr;
+    std::vector<char> open;   // container stack for skip_value(), reused across lines
 
-        AgentStats& s = local_stats[model]; // & = reference, modifies the map entry directly
-        s.total++;
+    bool field(const Token& k, RecordView& out) {
+        static const char* const LATENCY_FIELDS[] = {"fan_out_latency_sec", "latency_ms", "latency(ms) "};
+        if (key_is(k, "model_name"))  return value(out.model_name);
+        if (key_is(k, "ai_response")) return value(out.ai_response);
+        for (int i = 0; i < 3; i++) {
+            if (key_is(k, LATENCY_FIELDS[i])) return value(out.latency[i]);
+            if (key_is(k, TIME_FIELDS[i]))    return value(out.time[i]);
+        }
+        if (key_is(k, "error_meta")) {   // a repeated key replaces the earlier value
+            out.ok = out.error_type = Token();
+            out.error_meta = p < end && *p == '{';
+            if (!out.error_meta) return skip_value();
+            return object([&](const Token& ik) {
+                if (key_is(ik, "ok"))         return value(out.ok);
+                if (key_is(ik, "error_type")) return value(out.error_type);
+                return skip_value();
+            });
+        }
+        if (key_is(k, "validation")) {
+            out.passed = Token();
+            out.validation = p < end && *p == '{';
+            if (!out.validation) return skip_value();
+            return object([&](const Token& ik) {
+                return key_is(ik, "passed") ? value(out.passed) : skip_value();
+            });
+        }
+        return skip_value();
+    }
+
+    void ws() {
+        while (p < end && (*p == ' ' || *p == '\t' || *p == '\n' || *p == '\r')) p++;
+    }
+
+    // `{ "key": value, ... }`; on_key is called positioned at each value and must consume it
+    template <class OnKey>
+    bool object(OnKey on_key) {
+        p++;
+        ws();
+        if (p < end && *p == '}') { p++; return true; }
+        for (;;) {
+            Token key;
+            if (!member_key(key)) return false;
+            if (!on_key(key)) return false;
+            ws();
+            if (p >= end) return false;
+            if (*p == '}') { p++; return true; }
+            if (*p++ != ',') return false;
+        }
+    }
+
+    bool member_key(Token& key) {
+        ws();
+        if (p >= end || *p != '"' || !string(key)) return false;
+        ws();
+        if (p >= end || *p != ':') return false;
+        p++;
+        ws();
+        return true;
+    }
+
+    bool value(Token& t) {
+        const char* start = p;
+        if (p >= end) return false;
+        if (*p == '"') return string(t);
+        t.kind = *p == '{' || *p == '[' ? *p : *p == 't' ? 't' : *p == 'f' ? 'f' : *p == 'n' ? 'z' : 'n';
+        t.escaped = false;
+        if (!skip_value()) return false;
+        t.raw = std::string_view(start, p - start);
+        return true;
+    }
+
+    // Any value, containers included; iterative so deep nesting can't overflow.
+    bool skip_value() {
+        open.clear();
+        for (;;) {
+            ws();
+            if (p >= end) return false;
+            char c = *p;
+            if (c == '{' || c == '[') {
+                p++;
+                ws();
+                if (p < end && *p == (c == '{' ? '}' : ']')) {
+                    p++;
+                } else {
+                    open.push_back(c);
+                    Token key;
+                    if (c == '{' && !member_key(key)) return false;
+                    continue;
+                }
+            } else if (!scalar()) {
+                return false;
+            }
+            // after a value: close finished containers, or step to the next element
+            for (;;) {
+                if (open.empty()) return true;
+                ws();
+                if (p >= end) return false;
+                char close = open.back() == '{' ? '}' : ']';
+                if (*p == close) { p++; open.pop_back(); continue; }
+                if (*p++ != ',') return false;
+                Token key;
+                if (open.back() == '{' && !member_key(key)) return false;
+                break;
+            }
+        }
+    }
+
+    bool scalar() {
+        Token t;
+        switch (*p) {
+            case '"': return string(t);
+            case 't': return literal("true", 4);
+            case 'f': return literal("false", 5);
+            case 'n': return literal("null", 4);
+            default:  return number();
+        }
+    }
+
+    bool literal(const char* word, size_t n) {
+        if (static_cast<size_t>(end - p) < n || std::memcmp(p, word, n) != 0) return false;
+        p += n;
+        return true;
+    }
+
+    bool number() {
+        auto digits = [&] {
+            const char* s = p;
+            while (p < end && *p >= '0' && *p <= '9') p++;
+            return p > s;
+        };
+        const char* start = p;
+        bool exponent = false;
+        if (p < end && *p == '-') p++;
+        if (p < end && *p == '0') p++;
+        else if (!digits()) return false;
+        if (p < end && *p == '.') { p++; if (!digits()) return false; }
+        if (p < end && (*p == 'e' || *p == 'E')) {
+            exponent = true;
+            p++;
+            if (p < end && (*p == '+' || *p == '-')) p++;
+            if (!digits()) return false;
+        }
+        // json::parse() rejects a number that overflows a double (1e400).
+        // Only one with an exponent or over 308 characters can, so only
+        // those pay for the conversion.
+        return (!exponent && p - start <= 308) || fits_double(start, p);
+    }
 
-        double lat = extract_latency_ms(j);
-        if (lat >= 0.0)
-            s.latencies.push_back(lat);
+    static bool fits_double(const char* s, const char* e) {
+        double value;
+        if (std::from_chars(s, e, value).ec != std::errc::result_out_of_range) return true;
+        // out of range is overflow (rejected) or underflow to 0 (accepted),
+        // and from_chars() doesn't say which; strtod() is what json::parse() uses
+        return std::isfinite(std::strtod(std::string(s, e).c_str(), nullptr));
+    }
+
+    // 8 bytes with no '"', '\\', control character or non-ASCII byte
+    static bool plain8(const char* s) {
+        constexpr uint64_t ONES = 0x0101010101010101ULL, HIGH = 0x8080808080808080ULL;
+        uint64_t w;
+        std::memcpy(&w, s, 8);
+        auto zero_byte = [](uint64_t v) { return (v - ONES) & ~v; };
+        return ((zero_byte(w ^ (ONES * '"')) | zero_byte(w ^ (ONES * '\\'))
+                 | ((w - ONES * 0x20) & ~w) | w) & HIGH) == 0;
+    }
+
+    bool string(Token& t) {
+        const char* start = p++;
+        t.kind = 's';
+        t.escaped = false;
+        for (;;) {
+            while (end - p >= 8 && plain8(p)) p += 8;
+            if (p >= end) return false;
+            unsigned char c = static_cast<unsigned char>(*p);
+            if (c == '"') break;
+            if (c == '\\') {
+                t.escaped = true;
+                if (!escape()) return false;
+            } else if (c < 0x20) {
+                return false;
+            } else if (c < 0x80) {
+                p++;
+            } else if (!utf8()) {
+                return false;
+            }
+        }
+        p++;
+        t.raw = std::string_view(start, p - start);
+        return true;
+    }
 
-        if (is_error(j))
-            s.error_count++;
+    bool escape() {
+        if (end - p < 2) return false;
+        switch (p[1]) {
+            case '"': case '\\': case '/': case 'b': case 'f': case 'n': case 'r': case 't':
+                p += 2;
+                return true;
+            case 'u': break;
+            default:  return false;
+        }
+        int unit = hex4(p + 2);
+        if (unit < 0 || (unit >= 0xDC00 && unit <= 0xDFFF)) return false; // lone low surrogate
+        p += 6;
+        if (unit >= 0xD800 && unit <= 0xDBFF) {                           // needs its low half
+            int low = end - p >= 6 && p[0] == '\\' && p[1] == 'u' ? hex4(p + 2) : -1;
+            if (low < 0xDC00 || low > 0xDFFF) return false;
+            p += 6;
+        }
+        return true;
+    }
 
-        if (j.contains("validation") && j["validation"].is_object()) {
-            auto& v = j["validation"];
-            if (v.contains("passed") && v["passed"].is_boolean())
-                if (!v["passed"].get<bool>())
-                    s.val_failed++;
+    int hex4(const char* s) const {
+        if (end - s < 4) return -1;
+        int v = 0;
+        for (int i = 0; i < 4; i++) {
+            char c = s[i];
+            int d = c >= '0' && c <= '9' ? c - '0'
+                  : c >= 'a' && c <= 'f' ? c - 'a' + 10
+                  : c >= 'A' && c <= 'F' ? c - 'A' + 10 : -1;
+            if (d < 0) return -1;
+            v = v * 16 + d;
         }
+        return v;
+    }
+
+    // One UTF-8 sequence, with the same rules as json::parse() (RFC 3629:
+    // no overlong forms, no surrogates, nothing above U+10FFFF)
+    bool utf8() {
+        const unsigned char* s = reinterpret_cast<const unsigned char*>(p);
+        unsigned char lo = 0x80, hi = 0xBF;
+        int n;
+        if (s[0] >= 0xC2 && s[0] <= 0xDF)                       n = 1;
+        else if (s[0] == 0xE0)                                  { n = 2; lo = 0xA0; }
+        else if (s[0] == 0xED)                                  { n = 2; hi = 0x9F; }
+        else if (s[0] >= 0xE1 && s[0] <= 0xEF)                  n = 2;
+        else if (s[0] == 0xF0)                                  { n = 3; lo = 0x90; }
+        else if (s[0] >= 0xF1 && s[0] <= 0xF3)                  n = 3;
+        else if (s[0] == 0xF4)                                  { n = 3; hi = 0x8F; }
+        else return false;
+        if (end - p <= n || s[1] < lo || s[1] > hi) return false;
+        for (int i = 2; i <= n; i++)
+            if (s[i] < 0x80 || s[i] > 0xBF) return false;
+        p += n + 1;
+        return true;
+    }
+};
+
+// ── One record's contribution, whichever parser read it ──────────────────────
+struct Record {
+    std::string model = "unknown";  // default when model_name is missing
+    double latency_ms = -1.0;
+    bool error        = false;
+    bool val_failed   = false;
+    bool null_resp    = false;
+};
+
+// Both return false when the line is skipped: malformed, or rejected by `filter`.
+static bool dom_record(std::string_view line, const Filter* filter, Record& r) {
+    json j;
+    try {
+        j = json::parse(line.begin(), line.end());
+    } catch (...) {
+        return false; // skip malformed lines — don't crash
+    }
+
+    if (j.contains("model_name") && j["model_name"].is_string())
+        r.model = j["model_name"].get<std::string>();
+
+    if (filter && !record_matches(j, r.model, *filter)) return false;
+
+    r.latency_ms = extract_latency_ms(j);
+    r.error      = is_error(j);
+
+    if (j.contains("validation") && j["validation"].is_object()) {
+        auto& v = j["validation"];
+        if (v.contains("passed") && v["passed"].is_boolean())
+            r.val_failed = !v["passed"].get<bool>();
+    }
+
+    if (j.contains("ai_response")) {
+        auto& resp = j["ai_response"];
+        if (resp.is_null())
+            r.null_resp = true;
+        else if (resp.is_string() && resp.get<std::string>().empty())
+            r.null_resp = true;
+    }
+    return true;
+}
+
+// record_matches() for a RecordView
+static bool view_matches(const RecordView& v, const std::string& model, const Filter& f) {
+    if (!f.agent.empty() && model != f.agent)
+        return false;
+
+    if (f.since_ms >= 0 || f.until_ms >= 0) {
+        long long ts = -1;
+        for (const Token& t : v.time) {
+            if (!t.kind) continue;
+            if (t.kind == 's') {
+                std::string str = token_string(t);
+                ts = parse_iso_ms(str.data(), str.size());
+            }
+            break;
+        }
+        if (ts < 0 || (f.since_ms >= 0 && ts < f.since_ms) || (f.until_ms >= 0 && ts > f.until_ms))
+            return false;
+    }
+
+    if (!f.error_type.empty()
+        && !(v.error_meta && v.error_type.kind == 's' && token_string(v.error_type) == f.error_type))
+        return false;
+
+    if (f.validation >= 0 && !(v.validation && v.passed.kind == (f.validation == 1 ? 't' : 'f')))
+        return false;
+    return true;
+}
+
+static bool ondemand_record(OnDemand& reader, RecordView& v, std::string_view line,
+                            const Filter* filter, Record& r) {
+    if (!reader.parse(line, v)) return false;
+
+    if (v.model_name.kind == 's')
+        r.model = token_string(v.model_name);
+
+    if (filter && !view_matches(v, r.model, *filter)) return false;
+
+    static const double LATENCY_SCALE[] = {1000.0, 1.0, 1.0}; // fan_out_latency_sec is in seconds
+    for (int i = 0; i < 3; i++) {
+        const Token& t = v.latency[i];
+        if (t.kind != 'n') continue;
+        double value = 0.0;
+        if (std::from_chars(t.raw.data(), t.raw.data() + t.raw.size(), value).ec != std::errc())
+            value = 0.0; // underflow: parse() has already rejected overflow
+        if (value == 0.0 && t.raw.find_first_of(".eE") == std::string_view::npos)
+            value = 0.0; // json::parse() reads the integer "-0" as 0, not -0.0
+        r.latency_ms = value * LATENCY_SCALE[i];
+        break;
+    }
+
+    const bool ok_known     = v.error_meta && (v.ok.kind == 't' || v.ok.kind == 'f');
+    const bool passed_known = v.validation && (v.passed.kind == 't' || v.passed.kind == 'f');
+    r.val_failed = passed_known && v.passed.kind == 'f';
+    r.error      = ok_known ? v.ok.kind == 'f' : r.val_failed; // same fallback as is_error()
+    r.null_resp  = v.ai_response.kind == 'z'
+                || (v.ai_response.kind == 's' && v.ai_response.raw.size() == 2); // ""
+    return true;
+}
+
+// ── Thread worker: processes the lines in bytes [begin, end) ─────────────────
+// Lines are string_views into the caller's buffer (usually the mmap'd file):
+// nothing is copied before json::parse().  A final line without '\n' counts,
+// empty lines count towards total_lines — the same as std::getline().
+//
+// With `mapped` set the bytes are a read-only file mapping, and pages already
+// parsed are handed back to the kernel every DROP_BEHIND_BYTES: they would
+// otherwise stay resident (and count in RSS) until the scan ends.
+static const size_t DROP_BEHIND_BYTES = 8 << 20;
+
+static void drop_behind(const char*& released, const char* upto) {
+    static const uintptr_t page = static_cast<uintptr_t>(sysconf(_SC_PAGESIZE));
+    uintptr_t from = reinterpret_cast<uintptr_t>(released) & ~(page - 1);
+    uintptr_t to   = reinterpret_cast<uintptr_t>(upto) & ~(page - 1);
+    if (to > from)
+        madvise(reinterpret_cast<void*>(from), to - from, MADV_DONTNEED);
+    released = upto;
+}
+
+// One thread's results: built without locking, merged into the Aggregate
+// once, when the thread runs out of tasks.
+struct Partial {
+    std::map<std::string, AgentStats> stats;
+    long long lines   = 0;
+    long long matched = 0;
+};
+
+void process_chunk(const char* begin, const char* end, bool mapped,
+                   const Aggregate& agg, Partial& out) {
+    std::map<std::string, AgentStats>& local_stats = out.stats;
+    const Filter& filter = agg.filter;
+    const bool filtered  = filter.active();
+    long long lines      = 0;
+    long long matched    = 0;
+    const char* released = begin;
+
+    const bool ondemand = agg.parser == Parser::OnDemand;
+    OnDemand reader;
+    RecordView view;
 
-        if (j.contains("ai_response")) {
-            auto& r = j["ai_response"];
-            if (r.is_null())
-                s.null_resp++;
-            else if (r.is_string() && r.get<std::string>().empty())
-                s.null_resp++;
+    for (const char* p = begin; p < end; ) {
+        const char* nl = static_cast<const char*>(std::memchr(p, '\n', end - p));
+        std::string_view line(p, (nl ? nl : end) - p);
+        p = nl ? nl + 1 : end;
+        lines++;
+        if (mapped && static_cast<size_t>(line.data() - released) >= DROP_BEHIND_BYTES)
+            drop_behind(released, line.data());
+
+        if (line.empty()) continue;
+        if (filtered && !line_may_match(line, filter)) continue; // no parse for this line
+
+        Record r;
+        bool counted = ondemand ? ondemand_record(reader, view, line, filtered ? &filter : nullptr, r)
+                                : dom_record(line, filtered ? &filter : nullptr, r);
+        if (!counted) continue;
+        matched++;
+
+        AgentStats& s = local_stats[r.model]; // & = reference, modifies the map entry directly
+        s.total++;
+
+        if (r.latency_ms >= 0.0) {
+            s.sketch.add(r.latency_ms);
+            if (agg.exact) s.latencies.push_back(r.latency_ms);
         }
+        if (r.error)      s.error_count++;
+        if (r.val_failed) s.val_failed++;
+        if (r.null_resp)  s.null_resp++;
     }
 
-    // ONE lock per chunk — merge local results into global
-    std::lock_guard<std::mutex> lock(mtx);
-    for (auto& [model, ls] : local_stats) {
-        auto& gs = global_stats[model];
+    out.lines   += lines;
+    out.matched += matched;
+    if (mapped)
+        drop_behind(released, end);
+}
+
+// ONE lock per thread — merge its results into the shared aggregate
+void merge_partial(const Partial& part, Aggregate& agg) {
+    std::lock_guard<std::mutex> lock(agg.mtx);
+    agg.total_lines += part.lines;
+    agg.matched     += part.matched;
+    for (auto& [model, ls] : part.stats) {
+        auto& gs = agg.stats[model];
         gs.total       += ls.total;
         gs.error_count += ls.error_count;
         gs.val_failed  += ls.val_failed;
         gs.null_resp   += ls.null_resp;
+        gs.sketch.merge(ls.sketch);
         gs.latencies.insert(gs.latencies.end(),
                             ls.latencies.begin(), ls.latencies.end());
     }
@@ -127,22 +939,32 @@ void process_chunk(const std::vector<std::string>& chunk) {
 
 // ── Output: prints structured JSON to stdout ──────────────────────────────────
 // Python can do: json.loads(subprocess.check_output(["./log_processor", "file"]))
-void emit_json(long long total_lines) {
+// Percentiles come from the sketch (within 1%, see Step 0), or with --exact
+// from every latency, sorted once.
+void emit_json(Aggregate& agg) {
     json out;
-    out["total_lines"] = total_lines;
+    out["total_lines"] = agg.reported_lines();
 
     long long total_errors   = 0;
     long long total_val_fail = 0;
 
     json agents = json::object();
-    for (auto& [model, s] : global_stats) {
+    for (auto& [model, s] : agg.stats) {
         total_errors   += s.error_count;
         total_val_fail += s.val_failed;
 
-        double avg = 0.0;
-        if (!s.latencies.empty())
-            avg = std::accumulate(s.latencies.begin(), s.latencies.end(), 0.0)
-                  / s.latencies.size();
+        double avg = s.sketch.count > 0 ? s.sketch.sum / s.sketch.count : 0.0;
+        double p50 = s.sketch.quantile(0.50);
+        double p95 = s.sketch.quantile(0.95);
+        double p99 = s.sketch.quantile(0.99);
+        if (agg.exact) {
+            std::sort(s.latencies.begin(), s.latencies.end());
+            avg = s.latencies.empty() ? 0.0
+                : std::accumulate(s.latencies.begin(), s.latencies.end(), 0.0) / s.latencies.size();
+            p50 = percentile(s.latencies, 50.0);
+            p95 = percentile(s.latencies, 95.0);
+            p99 = percentile(s.latencies, 99.0);
+        }
 
         double err_rate = s.total > 0 ? 100.0 * s.error_count / s.total : 0.0;
 
@@ -153,9 +975,9 @@ void emit_json(long long total_lines) {
             {"val_failed",      s.val_failed},
             {"null_responses",  s.null_resp},
             {"avg_latency_ms",  avg},
-            {"p50_latency_ms",  percentile(s.latencies, 50.0)},
-            {"p95_latency_ms",  percentile(s.latencies, 95.0)},
-            {"p99_latency_ms",  percentile(s.latencies, 99.0)},
+            {"p50_latency_ms",  p50},
+            {"p95_latency_ms",  p95},
+            {"p99_latency_ms",  p99},
         };
     }
 
@@ -166,50 +988,778 @@ void emit_json(long long total_lines) {
     std::cout << out.dump(2) << std::endl;
 }
 
-// ── main ──────────────────────────────────────────────────────────────────────
-int main(int argc, char* argv[]) {
-    if (argc < 2) {
-        std::cerr << "Usage: ./log_processor <path_to_file>\n";
-        return 1;
+// ── Output (--partial): mergeable state instead of final numbers ──────────────
+// Used by the API's incremental aggregation: it remembers end_offset, later
+// runs the binary with --offset <end_offset> and merges the two partials.
+json partial_json(const Aggregate& agg) {
+    json agents = json::object();
+    for (auto& [model, s] : agg.stats) {
+        agents[model] = {
+            {"total",          s.total},
+            {"errors",         s.error_count},
+            {"val_failed",     s.val_failed},
+            {"null_responses", s.null_resp},
+            {"latency",        s.sketch.to_json()},
+        };
     }
 
-    std::ifstream inputFile(argv[1]);
-    if (!inputFile) {
-        std::cerr << "Sorry, could not open file!\n";
-        return 1;
-    }
+    json out;
+    out["start_offset"] = agg.start_offset;
+    out["end_offset"]   = agg.end_offset;
+    out["total_lines"]  = agg.reported_lines();
+    out["agents"]       = agents;
+    return out;
+}
 
-    // Read all lines into memory first (fast sequential I/O)
-    std::vector<std::string> lines;
+// ── Merge (--merge): fold --partial results back into one aggregate ─────────
+// Each input holds --partial outputs, one JSON object per line, from other
+// files, runs or machines.  Counts add and sketches merge, so the result is
+// what a single scan over all their records would report (percentiles from
+// the sketch — --exact needs the raw records).  Offsets span the inputs.
+// `merged` counts the partials folded in so far, across calls.  Returns false
+// (and fills `err`) on the first line that isn't a partial.
+bool merge_partials(std::istream& in, const std::string& name, Aggregate& agg,
+                    long long& merged, std::string& err) {
     std::string line;
-    while (std::getline(inputFile, line))
-        lines.push_back(std::move(line));
+    for (long long n = 1; std::getline(in, line); n++) {
+        if (line.empty()) continue;
+        try {
+            json p = json::parse(line);
+            for (auto& [model, a] : p.at("agents").items()) {
+                AgentStats& s = agg.stats[model];
+                s.total       += a.at("total").get<long long>();
+                s.error_count += a.at("errors").get<long long>();
+                s.val_failed  += a.at("val_failed").get<long long>();
+                s.null_resp   += a.at("null_responses").get<long long>();
+                s.sketch.merge(LatencySketch::from_json(a.at("latency")));
+            }
+            long long start = p.at("start_offset").get<long long>();
+            long long end   = p.at("end_offset").get<long long>();
+            agg.start_offset = merged == 0 ? start : std::min(agg.start_offset, start);
+            agg.end_offset   = merged == 0 ? end   : std::max(agg.end_offset, end);
+            agg.total_lines += p.at("total_lines").get<long long>();
+            merged++;
+        } catch (const std::exception& e) {
+            err = name + ":" + std::to_string(n) + ": not a --partial result (" + e.what() + ")";
+            return false;
+        }
+    }
+    return true;
+}
 
-    long long total = static_cast<long long>(lines.size());
-    if (total == 0) {
-        std::cerr << "File is empty.\n";
-        return 1;
+// ── Scan: many small byte-range tasks, pulled by a pool of threads ──────────
+// Task i holds the lines that *start* in bytes [i * task, (i + 1) * task) of
+// the range; each bound is found by skipping to the next '\n', so tasks never
+// overlap and threads need nothing more than an atomic counter to share them.
+// A thread takes the next task as soon as it finishes one, so a stretch of
+// huge responses slows down only the thread that drew it.
+static const size_t MIN_TASK_BYTES = 64 << 10;
+static const size_t MAX_TASK_BYTES = 4 << 20;
+static const size_t TASKS_PER_THREAD = 8;   // target, for inputs below MAX_TASK_BYTES per task
+
+static double thread_cpu_ms() {
+    timespec ts;
+    clock_gettime(CLOCK_THREAD_CPUTIME_ID, &ts);
+    return ts.tv_sec * 1e3 + ts.tv_nsec / 1e6;
+}
+
+static const char* line_start_at(const char* begin, const char* end, size_t at) {
+    if (at == 0) return begin;
+    if (at >= static_cast<size_t>(end - begin)) return end;
+    const char* nl = static_cast<const char*>(std::memchr(begin + at - 1, '\n', end - (begin + at - 1)));
+    return nl ? nl + 1 : end;
+}
+
+void scan_range(const char* begin, const char* end, bool mapped, Aggregate& agg) {
+    using clock = std::chrono::steady_clock;
+    const auto wall_start = clock::now();
+    const size_t len = static_cast<size_t>(end - begin);
+
+    const size_t wanted = static_cast<size_t>(std::max(agg.threads, 1));
+    const size_t task   = std::clamp(len / (wanted * TASKS_PER_THREAD), MIN_TASK_BYTES, MAX_TASK_BYTES);
+    const size_t tasks  = (len + task - 1) / task;
+    const size_t n_threads = std::max<size_t>(1, std::min(wanted, tasks));
+
+    agg.scan.task_bytes = task;
+    agg.scan.tasks      = tasks;
+    agg.scan.threads.assign(n_threads, ThreadStats());
+
+    std::atomic<size_t> next{0};
+    auto worker = [&](size_t id) {
+        ThreadStats& st = agg.scan.threads[id];
+        const double cpu_start = thread_cpu_ms();
+        Partial part;
+        for (size_t i; (i = next.fetch_add(1, std::memory_order_relaxed)) < tasks; ) {
+            const auto t0 = clock::now();
+            const char* from = line_start_at(begin, end, i * task);
+            const char* to   = line_start_at(begin, end, (i + 1) * task);
+            process_chunk(from, to, mapped, agg, part);
+            st.busy_ms += std::chrono::duration<double, std::milli>(clock::now() - t0).count();
+            st.tasks++;
+            st.bytes += to - from;
+        }
+        const auto t0 = clock::now();
+        merge_partial(part, agg);
+        st.busy_ms += std::chrono::duration<double, std::milli>(clock::now() - t0).count();
+        st.lines  = part.lines;
+        st.cpu_ms = thread_cpu_ms() - cpu_start;
+    };
+
+    // the calling thread is worker 0
+    std::vector<std::thread> threads;
+    for (size_t id = 1; id < n_threads; id++)
+        threads.emplace_back(worker, id);
+    worker(0);
+    for (auto& t : threads)
+        t.join();
+
+    agg.scan.wall_ms = std::chrono::duration<double, std::milli>(clock::now() - wall_start).count();
+}
+
+// ── Input: the file, memory-mapped read-only ─────────────────────────────────
+// The kernel pages the log in as the threads touch it and can drop clean pages
+// again under pressure, so peak RSS is the parser's working set rather than
+// a second copy of the file.
+//
+// Touching a page past the end of a file that was truncated after mapping
+// raises SIGBUS.  That kills one CLI or --serve process, which the API
+// replaces; loaded into the API itself it would kill the whole worker, so the
+// shared library always streams instead.
+#ifdef LOGPROC_LIBRARY
+static constexpr bool MAP_INPUT = false;
+#else
+static constexpr bool MAP_INPUT = true;
+#endif
+
+struct MappedFile {
+    const char* data = nullptr;   // bytes [offset, size) of the file
+    size_t size      = 0;
+    void*  base      = nullptr;   // mapping, from `offset` rounded down to a page
+    size_t map_len   = 0;
+
+    MappedFile() = default;
+    MappedFile(const MappedFile&) = delete;
+    MappedFile& operator=(const MappedFile&) = delete;
+    ~MappedFile() { if (base) munmap(base, map_len); }
+
+    // false if mmap() refused (some special filesystems): stream it instead
+    bool map(int fd, long long offset, size_t file_size) {
+        const size_t from = static_cast<size_t>(std::max(offset, 0LL));
+        if (from >= file_size) return true; // nothing past the offset
+        const size_t page    = static_cast<size_t>(sysconf(_SC_PAGESIZE));
+        const size_t aligned = from - from % page;
+        map_len = file_size - aligned;
+        void* m = mmap(nullptr, map_len, PROT_READ, MAP_PRIVATE, fd, static_cast<off_t>(aligned));
+        if (m == MAP_FAILED) return false;
+        base = m;
+        madvise(base, map_len, MADV_SEQUENTIAL);
+        data = static_cast<const char*>(base) + (from - aligned);
+        size = file_size - from;
+        return true;
+    }
+};
+
+// ── Input: streamed through a fixed pool of blocks (--max-memory) ────────────
+// For inputs that are larger than memory, can't be mapped (pipes, stdin) or
+// shouldn't evict the page cache: one reader thread fills blocks with read()
+// and hands them to the parser threads through a queue.  A block always ends
+// on a line boundary — the reader carries the incomplete tail over into the
+// next block — so parsers never see half a record.  Blocks are recycled, and
+// at most max_memory / block_bytes of them exist, so when the parsers fall
+// behind the reader waits for a free block instead of allocating: I/O and
+// parsing overlap and memory stays within the budget.  (A single line longer
+// than a block grows that block, which is the only way past the budget.)
+static const size_t DEFAULT_STREAM_MEMORY = 64 << 20;   // inputs that can't be mapped
+static const size_t MIN_BLOCK_BYTES       = 64 << 10;
+static const size_t MAX_BLOCK_BYTES       = 16 << 20;
+
+struct Block {
+    std::vector<char> buf;
+    size_t len = 0;      // bytes handed to the parsers, always whole lines
+};
+
+// Blocking FIFO; pop() returns nullptr once close() was called and it is empty
+class BlockQueue {
+public:
+    void push(Block* b) {
+        { std::lock_guard<std::mutex> lock(mtx); q.push_back(b); }
+        cv.notify_one();
+    }
+    void close() {
+        { std::lock_guard<std::mutex> lock(mtx); closed = true; }
+        cv.notify_all();
+    }
+    Block* pop() {
+        std::unique_lock<std::mutex> lock(mtx);
+        cv.wait(lock, [&] { return !q.empty() || closed; });
+        if (q.empty()) return nullptr;
+        Block* b = q.front();
+        q.pop_front();
+        return b;
+    }
+
+private:
+    std::mutex mtx;
+    std::condition_variable cv;
+    std::deque<Block*> q;
+    bool closed = false;
+};
+
+// "512M", "2G", "65536" → bytes; false if it isn't a size
+static bool parse_size(const char* v, size_t& out) {
+    char* end = nullptr;
+    double n = std::strtod(v, &end);
+    if (end == v || n <= 0) return false;
+    switch (*end) {
+        case 'k': case 'K': n *= 1 << 10; end++; break;
+        case 'm': case 'M': n *= 1 << 20; end++; break;
+        case 'g': case 'G': n *= 1 << 30; end++; break;
+        default: break;
     }
+    if (*end == 'B' || *end == 'b') end++;
+    if (*end != '\0') return false;
+    out = static_cast<size_t>(n);
+    return true;
+}
+
+// Reads `fd` from `offset` to EOF.  Returns false (and fills `err`) on a read error.
+bool scan_stream(int fd, long long offset, bool partial, Aggregate& agg, std::string& err) {
+    using clock = std::chrono::steady_clock;
+    auto ms_since = [](clock::time_point t0) {
+        return std::chrono::duration<double, std::milli>(clock::now() - t0).count();
+    };
+    const auto wall_start = clock::now();
+
+    const size_t parsers    = static_cast<size_t>(std::max(agg.threads, 1));
+    const size_t budget     = agg.max_memory ? agg.max_memory : DEFAULT_STREAM_MEMORY;
+    // enough blocks for every parser to hold one with one more queued, plus the reader's
+    const size_t block      = std::clamp(budget / (2 * parsers + 2), MIN_BLOCK_BYTES, MAX_BLOCK_BYTES);
+    const size_t max_blocks = std::max<size_t>(2, std::min(budget / block, 4 * (parsers + 1)));
 
-    // Split into chunks and launch threads
-    const int NUM_THREADS = 4;
+    agg.scan.mode       = "stream";
+    agg.scan.task_bytes = block;
+    agg.scan.threads.assign(parsers, ThreadStats());
+
+    BlockQueue full, empty;
+    auto parser = [&](size_t id) {
+        ThreadStats& st = agg.scan.threads[id];
+        const double cpu_start = thread_cpu_ms();
+        Partial part;
+        while (Block* b = full.pop()) {
+            const auto t0 = clock::now();
+            process_chunk(b->buf.data(), b->buf.data() + b->len, false, agg, part);
+            st.busy_ms += ms_since(t0);
+            st.tasks++;
+            st.bytes += b->len;
+            empty.push(b);
+        }
+        const auto t0 = clock::now();
+        merge_partial(part, agg);
+        st.busy_ms += ms_since(t0);
+        st.lines  = part.lines;
+        st.cpu_ms = thread_cpu_ms() - cpu_start;
+    };
     std::vector<std::thread> threads;
-    long long chunk_size = total / NUM_THREADS;
+    for (size_t id = 0; id < parsers; id++)
+        threads.emplace_back(parser, id);
+
+    // ── the reader (this thread) ──
+    posix_fadvise(fd, 0, 0, POSIX_FADV_SEQUENTIAL);
+    bool failed = false;
+    auto read_some = [&](char* dst, size_t cap) -> size_t {   // 0 = EOF or error
+        for (;;) {
+            const auto t0 = clock::now();
+            ssize_t n = ::read(fd, dst, cap);
+            agg.scan.read_ms += ms_since(t0);
+            if (n >= 0) return static_cast<size_t>(n);
+            if (errno == EINTR) continue;
+            failed = true;
+            return 0;
+        }
+    };
+
+    if (offset > 0 && lseek(fd, static_cast<off_t>(offset), SEEK_SET) < 0) {
+        std::vector<char> skip(MIN_BLOCK_BYTES);   // not seekable: read past the offset
+        for (long long left = offset; left > 0; ) {
+            size_t n = read_some(skip.data(), static_cast<size_t>(std::min<long long>(left, skip.size())));
+            if (n == 0) break;
+            left -= static_cast<long long>(n);
+        }
+    }
+
+    std::vector<std::unique_ptr<Block>> blocks;
+    std::string carry;       // incomplete last line of the previous block
+    long long handed = 0;
+    for (bool eof = false; !eof && !failed; ) {
+        Block* b;
+        if (blocks.size() < max_blocks) {
+            blocks.push_back(std::make_unique<Block>());
+            b = blocks.back().get();
+            b->buf.resize(block);
+        } else {
+            const auto t0 = clock::now();
+            b = empty.pop();   // parsers are behind: wait instead of allocating
+            agg.scan.read_wait_ms += ms_since(t0);
+        }
+
+        size_t len = carry.size();
+        if (b->buf.size() < 2 * len) b->buf.resize(2 * len);
+        std::memcpy(b->buf.data(), carry.data(), len);
+        carry.clear();
 
-    for (int i = 0; i < NUM_THREADS; i++) {
-        long long start = i * chunk_size;
-        long long end   = (i == NUM_THREADS - 1) ? total : start + chunk_size;
+        size_t nl = std::string_view::npos;   // last '\n' in the block
+        for (;;) {
+            while (len < b->buf.size()) {
+                size_t n = read_some(b->buf.data() + len, b->buf.size() - len);
+                if (n == 0) { eof = true; break; }
+                len += n;
+            }
+            nl = std::string_view(b->buf.data(), len).rfind('\n');
+            if (eof || nl != std::string_view::npos) break;
+            b->buf.resize(b->buf.size() * 2);   // one line longer than a block
+        }
+
+        // In --partial mode a trailing line without '\n' is a record still being
+        // appended: leave it out so end_offset lands on a line boundary.
+        size_t cut = len;
+        if (!eof || partial)
+            cut = nl == std::string_view::npos ? 0 : nl + 1;
+        if (!eof)
+            carry.assign(b->buf.data() + cut, len - cut);
 
-        std::vector<std::string> chunk(
-            lines.begin() + start,
-            lines.begin() + end
-        );
-        threads.emplace_back(process_chunk, std::move(chunk));
+        b->len  = cut;
+        handed += static_cast<long long>(cut);
+        if (cut > 0) {
+            agg.scan.tasks++;
+            full.push(b);
+        } else {
+            empty.push(b);
+        }
     }
 
+    full.close();
     for (auto& t : threads)
         t.join();
 
-    emit_json(total);
+    agg.start_offset  = offset;
+    agg.end_offset    = offset + handed;
+    agg.scan.wall_ms  = ms_since(wall_start);
+    if (failed) {
+        err = "Sorry, could not read file!";
+        return false;
+    }
+    return true;
+}
+
+// ── Scan a file from `offset` ────────────────────────────────────────────────
+// Returns false (and fills `err`) if the offset is negative or the file can't
+// be opened or read.
+// Regular files are mapped unless a --max-memory budget asks for streaming
+// or this is the shared library (see MAP_INPUT); anything that can't be
+// mapped (a pipe, /dev/stdin) is streamed.
+bool scan_file(const std::string& path, long long offset, bool partial,
+               Aggregate& agg, std::string& err) {
+    if (offset < 0) {   // --serve and the C ABI take it unchecked
+        err = "offset must not be negative";
+        return false;
+    }
+    int fd = ::open(path.c_str(), O_RDONLY | O_CLOEXEC);
+    struct stat st;
+    if (fd < 0 || fstat(fd, &st) != 0 || S_ISDIR(st.st_mode)) {
+        if (fd >= 0) ::close(fd);
+        err = "Sorry, could not open file!";
+        return false;
+    }
+
+    MappedFile file;
+    if (!MAP_INPUT || agg.max_memory > 0 || !S_ISREG(st.st_mode) || !file.map(fd, offset, static_cast<size_t>(st.st_size))) {
+        bool ok = scan_stream(fd, offset, partial, agg, err);
+        ::close(fd);
+        return ok;
+    }
+    ::close(fd);   // the mapping stays valid
+
+    // --offset must point at the start of a line (the API passes the
+    // end_offset of a previous --partial run, which always is one).
+    // In --partial mode a trailing line without '\n' is a record still being
+    // appended: leave it out so end_offset always lands on a line boundary.
+    std::string_view bytes(file.data, file.size);
+    if (partial) {
+        size_t last_nl = bytes.rfind('\n');
+        bytes = bytes.substr(0, last_nl == std::string_view::npos ? 0 : last_nl + 1);
+    }
+    agg.start_offset = offset;
+    agg.end_offset   = offset + static_cast<long long>(bytes.size());
+
+    agg.scan.mode = "mmap";
+    scan_range(bytes.data(), bytes.data() + bytes.size(), true, agg);
+    return true;
+}
+
+// --stats: printed to stderr, so stdout stays the aggregate alone
+json scan_stats_json(const Aggregate& agg) {
+    json per_thread = json::array();
+    double busy = 0.0;
+    for (const auto& t : agg.scan.threads) {
+        busy += t.busy_ms;
+        per_thread.push_back({
+            {"busy_ms", t.busy_ms}, {"cpu_ms", t.cpu_ms}, {"tasks", t.tasks}, {"bytes", t.bytes}, {"lines", t.lines},
+        });
+    }
+    const double capacity = agg.scan.wall_ms * static_cast<double>(agg.scan.threads.size());
+    json out = {
+        {"mode",        agg.scan.mode},
+        {"threads",     agg.scan.threads.size()},
+        {"tasks",       agg.scan.tasks},
+        {"task_bytes",  agg.scan.task_bytes},
+        {"wall_ms",     agg.scan.wall_ms},
+        {"utilization", capacity > 0.0 ? busy / capacity : 0.0},  // 1.0 = no thread ever idle
+        {"per_thread",  per_thread},
+    };
+    if (agg.scan.mode == "stream") {
+        out["max_memory"]   = agg.max_memory ? agg.max_memory : DEFAULT_STREAM_MEMORY;
+        out["read_ms"]      = agg.scan.read_ms;
+        out["read_wait_ms"] = agg.scan.read_wait_ms;
+    }
+    return out;
+}
+
+// ── Scan an in-memory buffer (every line counts, newline-terminated or not) ──
+void scan_buffer(const char* data, size_t len, Aggregate& agg) {
+    agg.start_offset = 0;
+    agg.end_offset   = static_cast<long long>(len);
+    scan_range(data, data + len, false, agg);
+}
+
+#ifndef LOGPROC_LIBRARY
+// ── Server mode (--serve): one long-lived process, many requests ──────────────
+// Framing is one JSON object per line on stdin / stdout:
+//   request:  {"id": 7, "path": "data/runs.jsonl", "offset": 0,
+//              "filter": {"agent": "..", "since_ms": .., "until_ms": ..,
+//                         "error_type": "..", "validation": true},   (optional)
+//              "parser": "dom" | "ondemand"}                           (optional)
+//   response: {"id": 7, "ok": true,  "result": {<partial_json>}}
+//             {"id": 7, "ok": false, "error": "..."}
+// json::dump() never emits a raw newline, so a line is always a whole frame.
+// The API keeps a small pool of these (api/workers.py) instead of paying for
+// fork/exec + binary load on every cache miss.
+
+// One --serve request → its response, minus "id".  Throws json::type_error
+// when a field has the wrong type; serve() turns that into an error response.
+static json handle_request(const json& req, Parser parser, int threads, size_t max_memory) {
+    if (!req.is_object())
+        return {{"ok", false}, {"error", "request must be a JSON object"}};
+    std::string path  = req.value("path", std::string());
+    long long offset  = req.value("offset", 0LL);
+
+    Aggregate agg; // fresh per request — nothing leaks between requests
+    std::string err;
+    agg.parser     = parser;
+    agg.threads    = threads;
+    agg.max_memory = max_memory;
+    if (req.contains("parser") && req["parser"].is_string()
+        && !parse_parser(req["parser"].get_ref<const std::string&>().c_str(), agg.parser))
+        return {{"ok", false}, {"error", "unknown parser"}};
+    if (req.contains("filter") && req["filter"].is_object()) {
+        const auto& f = req["filter"];
+        agg.filter.agent      = f.value("agent", std::string());
+        agg.filter.error_type = f.value("error_type", std::string());
+        agg.filter.since_ms   = f.value("since_ms", -1LL);
+        agg.filter.until_ms   = f.value("until_ms", -1LL);
+        if (f.contains("validation") && f["validation"].is_boolean())
+            agg.filter.validation = f["validation"].get<bool>() ? 1 : 0;
+        agg.filter.prepare();
+    }
+    if (!scan_file(path, offset, true, agg, err))
+        return {{"ok", false}, {"error", err}};
+    return {{"ok", true}, {"result", partial_json(agg)}};
+}
+
+int serve(Parser parser, int threads, size_t max_memory) {
+    std::ios::sync_with_stdio(false);
+    std::string req_line;
+    while (std::getline(std::cin, req_line)) {
+        if (req_line.empty()) continue;
+
+        json resp;
+        json req;
+        try {
+            req = json::parse(req_line);
+        } catch (...) {
+            resp = {{"id", nullptr}, {"ok", false}, {"error", "malformed request"}};
+            std::cout << resp.dump() << '\n' << std::flush;
+            continue;
+        }
+
+        json id = req.is_object() ? req.value("id", json()) : json();
+        try {
+            resp = handle_request(req, parser, threads, max_memory);
+        } catch (const std::exception& e) {
+            // A field of the wrong type ({"offset": "10"}) must not take the
+            // whole worker down with it.
+            resp = {{"ok", false}, {"error", std::string("bad request: ") + e.what()}};
+        }
+        resp["id"] = id;
+        std::cout << resp.dump() << '\n' << std::flush;
+    }
     return 0;
-}
\ No newline at end of file
+}
+#endif // LOGPROC_LIBRARY
+
+// ── C ABI (shared-library build) ──────────────────────────────────────────────
+// Build with:
+//   g++ -O2 -pthread -shared -fPIC -DLOGPROC_LIBRARY -o cpp/liblog_processor.so cpp/log_processor.cpp
+//
+// Python loads this with ctypes (api/native.py) and reads the aggregate
+// through getters — no process spawn and no JSON round-trip.  A handle owns
+// everything it points at, including the strings returned by
+// logproc_agent_name(), until logproc_free() is called.
+extern "C" {
+
+struct logproc_agent {
+    long long total;
+    long long errors;
+    long long val_failed;
+    long long null_responses;
+    long long lat_count;
+    long long lat_zero;
+    double    lat_sum;
+    double    lat_min;
+    double    lat_max;
+};
+
+// Filter for logproc_scan_file_filtered().  NULL / empty strings and -1
+// mean "don't filter on this"; validation is 1 (passed), 0 (failed) or -1.
+struct logproc_filter {
+    const char* agent;
+    const char* error_type;
+    long long   since_ms;
+    long long   until_ms;
+    int         validation;
+};
+
+struct logproc_handle {
+    Aggregate agg;
+    std::vector<std::string> names;       // agent order for index-based access
+    std::vector<const AgentStats*> rows;
+};
+
+static logproc_handle* finish_handle(logproc_handle* h) {
+    for (auto& [model, s] : h->agg.stats) {
+        h->names.push_back(model);
+        h->rows.push_back(&s);
+    }
+    return h;
+}
+
+// Returns NULL if the file can't be opened (message copied into err).
+// `filter` may be NULL.
+logproc_handle* logproc_scan_file_filtered(const char* path, long long offset,
+                                           const logproc_filter* filter,
+                                           char* err, size_t err_len) {
+    auto* h = new logproc_handle();
+    if (filter) {
+        h->agg.filter.agent      = filter->agent ? filter->agent : "";
+        h->agg.filter.error_type = filter->error_type ? filter->error_type : "";
+        h->agg.filter.since_ms   = filter->since_ms;
+        h->agg.filter.until_ms   = filter->until_ms;
+        h->agg.filter.validation = filter->validation;
+        h->agg.filter.prepare();
+    }
+    std::string e;
+    if (!scan_file(path, offset, true, h->agg, e)) {
+        if (err && err_len) {
+            std::strncpy(err, e.c_str(), err_len - 1);
+            err[err_len - 1] = '\0';
+        }
+        delete h;
+        return nullptr;
+    }
+    return finish_handle(h);
+}
+
+logproc_handle* logproc_scan_file(const char* path, long long offset,
+                                  char* err, size_t err_len) {
+    return logproc_scan_file_filtered(path, offset, nullptr, err, err_len);
+}
+
+logproc_handle* logproc_scan_buffer(const char* data, size_t len) {
+    auto* h = new logproc_handle();
+    scan_buffer(data, len, h->agg);
+    return finish_handle(h);
+}
+
+long long logproc_total_lines(const logproc_handle* h)  { return h->agg.reported_lines(); }
+long long logproc_start_offset(const logproc_handle* h) { return h->agg.start_offset; }
+long long logproc_end_offset(const logproc_handle* h)   { return h->agg.end_offset; }
+size_t    logproc_agent_count(const logproc_handle* h)  { return h->rows.size(); }
+
+const char* logproc_agent_name(const logproc_handle* h, size_t i) {
+    return h->names[i].c_str();
+}
+
+void logproc_agent_stats(const logproc_handle* h, size_t i, logproc_agent* out) {
+    const AgentStats& s = *h->rows[i];
+    out->total          = s.total;
+    out->errors         = s.error_count;
+    out->val_failed     = s.val_failed;
+    out->null_responses = s.null_resp;
+    out->lat_count      = s.sketch.count;
+    out->lat_zero       = s.sketch.zero;
+    out->lat_sum        = s.sketch.sum;
+    out->lat_min        = s.sketch.min;
+    out->lat_max        = s.sketch.max;
+}
+
+// Copies up to `cap` sketch bins; returns how many bins the agent has, so a
+// caller can pass cap = 0 first to size its buffers.
+size_t logproc_agent_bins(const logproc_handle* h, size_t i,
+                          int* index, long long* count, size_t cap) {
+    const auto& bins = h->rows[i]->sketch.bins;
+    size_t n = 0;
+    for (auto& [idx, c] : bins) {
+        if (n < cap) {
+            index[n] = idx;
+            count[n] = c;
+        }
+        n++;
+    }
+    return n;
+}
+
+void logproc_free(logproc_handle* h) { delete h; }
+
+} // extern "C"
+
+#ifndef LOGPROC_LIBRARY
+// ── main ──────────────────────────────────────────────────────────────────────
+int main(int argc, char* argv[]) {
+    const char* path    = nullptr;
+    std::vector<const char*> inputs;   // every path given (--merge takes several)
+    bool merge          = false;
+    bool exact          = false;
+    bool partial        = false;
+    long long offset    = 0;
+    bool serve_mode     = false;
+    Parser parser       = default_parser();
+    int threads         = default_threads();
+    size_t max_memory   = default_max_memory();
+    bool stats          = false;
+    Filter filter;
+
+    // --since / --until take epoch milliseconds or an ISO-8601 timestamp
+    auto time_arg = [](const char* v) {
+        char* end = nullptr;
+        long long ms = std::strtoll(v, &end, 10);
+        return (*v && *end == '\0') ? ms : parse_iso_ms(v, std::strlen(v));
+    };
+
+    for (int i = 1; i < argc; i++) {
+        if (std::strcmp(argv[i], "--serve") == 0) {
+            serve_mode = true;
+        } else if (std::strcmp(argv[i], "--parser") == 0 && i + 1 < argc) {
+            if (!parse_parser(argv[++i], parser)) { std::cerr << "--parser takes dom|ondemand\n"; return 1; }
+        } else if (std::strcmp(argv[i], "--threads") == 0 && i + 1 < argc) {
+            threads = std::atoi(argv[++i]);
+            if (threads < 1) { std::cerr << "--threads takes a positive number\n"; return 1; }
+        } else if (std::strcmp(argv[i], "--max-memory") == 0 && i + 1 < argc) {
+            if (!parse_size(argv[++i], max_memory)) { std::cerr << "--max-memory takes a size like 256M or 2G\n"; return 1; }
+        } else if (std::strcmp(argv[i], "--stats") == 0) {
+            stats = true;
+        } else if (std::strcmp(argv[i], "--exact") == 0) {
+            exact = true;
+        } else if (std::strcmp(argv[i], "--merge") == 0) {
+            merge = true;
+        } else if (std::strcmp(argv[i], "--partial") == 0) {
+            partial = true;
+        } else if (std::strcmp(argv[i], "--offset") == 0 && i + 1 < argc) {
+            const char* v = argv[++i];
+            char* end = nullptr;
+            offset = std::strtoll(v, &end, 10);
+            if (!*v || *end != '\0' || offset < 0) { std::cerr << "--offset takes a byte count >= 0\n"; return 1; }
+        } else if (std::strcmp(argv[i], "--agent") == 0 && i + 1 < argc) {
+            filter.agent = argv[++i];
+        } else if (std::strcmp(argv[i], "--error-type") == 0 && i + 1 < argc) {
+            filter.error_type = argv[++i];
+        } else if (std::strcmp(argv[i], "--since") == 0 && i + 1 < argc) {
+            filter.since_ms = time_arg(argv[++i]);
+            if (filter.since_ms < 0) { std::cerr << "Bad --since timestamp\n"; return 1; }
+        } else if (std::strcmp(argv[i], "--until") == 0 && i + 1 < argc) {
+            filter.until_ms = time_arg(argv[++i]);
+            if (filter.until_ms < 0) { std::cerr << "Bad --until timestamp\n"; return 1; }
+        } else if (std::strcmp(argv[i], "--validation") == 0 && i + 1 < argc) {
+            std::string v = argv[++i];
+            if (v != "passed" && v != "failed") { std::cerr << "--validation takes passed|failed\n"; return 1; }
+            filter.validation = v == "passed" ? 1 : 0;
+        } else {
+            path = std::strcmp(argv[i], "-") == 0 ? "/dev/stdin" : argv[i];
+            inputs.push_back(path);
+        }
+    }
+
+    if (serve_mode)
+        return serve(parser, threads, max_memory);
+
+    if (!path) {
+        std::cerr << "Usage: ./log_processor [--partial] [--offset <bytes>] [--parser dom|ondemand] [--exact] [filters] <path_to_file>\n"
+                  << "       ./log_processor [--parser dom|ondemand] [--threads <n>] --serve\n"
+                  << "       ./log_processor --merge [--partial] <partials.jsonl>...   (merge --partial outputs)\n"
+                  << "Scan:    --threads <n> (default: all cores, or LOGPROC_THREADS) --stats (to stderr)\n"
+                  << "         --max-memory <size> stream the file through blocks within this budget\n"
+                  << "         (default: map it; LOGPROC_MAX_MEMORY).  <path_to_file> may be - for stdin\n"
+                  << "Filters: --agent <model_name> --error-type <type> --validation passed|failed\n"
+                  << "         --since <iso|ms> --until <iso|ms>\n"
+                  << "Output:  percentiles come from a latency sketch (within 1%); --exact keeps every\n"
+                  << "         latency for exact ones (memory grows with the file)\n";
+        return 1;
+    }
+
+    if (merge) {
+        Aggregate agg;
+        std::string err;
+        long long merged = 0;
+        for (const char* input : inputs) {
+            std::ifstream in(input, std::ios::binary);
+            if (!in) {
+                std::cerr << "Sorry, could not open file!\n";
+                return 1;
+            }
+            if (!merge_partials(in, input, agg, merged, err)) {
+                std::cerr << err << "\n";
+                return 1;
+            }
+        }
+        if (partial)
+            std::cout << partial_json(agg).dump() << std::endl;
+        else
+            emit_json(agg);
+        return 0;
+    }
+
+    Aggregate agg;
+    agg.exact      = exact;
+    agg.parser     = parser;
+    agg.threads    = threads;
+    agg.max_memory = max_memory;
+    agg.filter     = filter;
+    agg.filter.prepare();
+    std::string err;
+    if (!scan_file(path, offset, partial, agg, err)) {
+        std::cerr << err << "\n";
+        return 1;
+    }
+    if (stats)
+        std::cerr << scan_stats_json(agg).dump() << "\n";
+
+    if (agg.total_lines == 0 && !partial) {
+        std::cerr << "File is empty.\n";
+        return 1;
+    }
+
+    if (partial)
+        std::cout << partial_json(agg).dump() << std::endl;
+    else
+        emit_json(agg);
+    return 0;
+}
+#endif // LOGPROC_LIBRARY
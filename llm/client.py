@@ -1,7 +1,9 @@
 import os
+import asyncio
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
 from google import genai
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import time
 import numpy as np
 
@@ -15,8 +17,12 @@ class AgentLatencyAnalysis:
         self.latencies = []
         self.window_size = window_size
         self.last_latency = None
+        self.count = 0        # calls ever logged (the window only keeps the last window_size)
+        self.total = 0.0
     
     def log_latency(self, latency):
+        self.count += 1
+        self.total += latency
         self.latencies.append(latency)
         if len(self.latencies) > self.window_size:
             self.latencies.pop(0)
@@ -37,17 +43,31 @@ class BaseAgent(ABC):
     monitor: "AgentLatencyAnalysis"
     errorLogs: "HandleErrorLogs"
 
+    # True when astream() yields text as the model produces it
+    supports_streaming = False
+
     @abstractmethod
     def call(self, userPromptText: str) -> str:
         pass
 
+    async def astream(self, userPromptText: str) -> AsyncIterator[str]:
+        """Async version of call() that yields the reply in chunks.
+
+        The default runs call() in a worker thread and yields the whole reply
+        once; agents with an async SDK override it to stream tokens.
+        """
+        yield await asyncio.to_thread(self.call, userPromptText)
+
 
 #Actual code:
 
 class AIBot(BaseAgent):
+    supports_streaming = True
+
     def __init__(self):
         self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        self.chats = self.client.chats.create(model="gemini-2.5-flash")
+        self.model = "gemini-2.5-flash"
+        self.chats = self.client.chats.create(model=self.model)
         self.monitor = AgentLatencyAnalysis()
         self.errorLogs = HandleErrorLogs()
     
@@ -69,10 +89,26 @@ class AIBot(BaseAgent):
 
         finally:
             self.monitor.log_latency(time.perf_counter() - startTime)
+
+    async def astream(self, userPromptText):
+        # one-shot request, not self.chats: API callers must not share a conversation
+        startTime = time.perf_counter()
+        try:
+            responseAi = await self.client.aio.models.generate_content_stream(
+                model=self.model, contents=userPromptText,
+            )
+            async for chunks in responseAi:
+                text = getattr(chunks, "text", "")
+                if text:
+                    yield text
+        finally:
+            self.monitor.log_latency(time.perf_counter() - startTime)
         
         
 
 class SecondAIBot(BaseAgent):
+    supports_streaming = True
+
     def __init__(self):
         key = os.getenv("OPENROUTER_API_KEY")
 
@@ -83,6 +119,10 @@ class SecondAIBot(BaseAgent):
             api_key=key,
             base_url="https://openrouter.ai/api/v1",
         )
+        self.aclient = AsyncOpenAI(
+            api_key=key,
+            base_url="https://openrouter.ai/api/v1",
+        )
         self.model = "google/gemma-3-4b-it:free"
         self.monitor = AgentLatencyAnalysis()
         self.errorLogs = HandleErrorLogs()
@@ -99,6 +139,20 @@ class SecondAIBot(BaseAgent):
         
         finally:
             self.monitor.log_latency(time.perf_counter() - startTime)
+
+    async def astream(self, userPromptText):
+        startTime = time.perf_counter()
+        try:
+            aiResp = await self.aclient.chat.completions.create(
+                model = self.model,
+                messages=[{"role":"user","content": userPromptText}],
+                stream=True,
+            )
+            async for chunk in aiResp:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            self.monitor.log_latency(time.perf_counter() - startTime)
         
 
 # a class which handles errors and test cases to store in a meta data 
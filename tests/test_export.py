@@ -0,0 +1,39 @@
+"""/export model_name filter against both sources (run from the repo root)."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import BENCHMARK_FILE, LOG_FILE, app
+
+client = TestClient(app)
+
+
+def _rows(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _export(**params) -> list[dict]:
+    resp = client.get("/export", params=params)
+    assert resp.status_code == 200
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+@pytest.mark.parametrize("source, path, field", [
+    ("runs", LOG_FILE, "model_name"),
+    ("benchmarks", BENCHMARK_FILE, "agent_name"),
+])
+def test_model_name_filter(source, path, field):
+    rows = _rows(path)
+    models = {row[field] for row in rows if isinstance(row.get(field), str)}
+    assert models, f"{path} has no {field}"
+    for model in models:
+        assert _export(source=source, model_name=model) == [row for row in rows if row.get(field) == model]
+
+
+def test_runs_do_not_fall_back_to_agent_name():
+    # /api/runs, /stats and log_processor only read model_name; so does /export for runs.
+    model = next(row["agent_name"] for row in _rows(BENCHMARK_FILE) if "agent_name" in row)
+    assert _export(source="runs", file=BENCHMARK_FILE, model_name=model) == []
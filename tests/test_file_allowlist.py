@@ -0,0 +1,27 @@
+"""Every endpoint that takes ?file= refuses paths outside the allowlist."""
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from api.main import app, file_watcher
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/process-logs", "/api/runs", "/export", "/tail", "/stats"])
+@pytest.mark.parametrize("file", ["/etc/passwd", "data/../README.md"])
+def test_http_endpoints_reject(path, file):
+    assert client.get(path, params={"file": file}).status_code == 403
+
+
+def test_process_logs_does_not_watch_rejected_file():
+    client.get("/process-logs", params={"file": "/etc/passwd"})
+    assert "/etc/passwd" not in file_watcher.paths()
+
+
+def test_tail_ws_rejects():
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/tail/ws?file=/etc/passwd") as ws:
+            ws.receive_text()
+    assert exc.value.code == 1008
@@ -0,0 +1,21 @@
+"""/process-logs filter sets: time bounds are bucketed before they key caches."""
+
+from api.main import FILTER_TIME_BUCKET_SEC, _filter_key, _parse_filters
+from api.runindex import parse_time_ms
+
+
+def test_rolling_window_shares_a_key():
+    a = _parse_filters(None, "2026-02-12T06:00:05Z", None, None, None)
+    b = _parse_filters(None, "2026-02-12T06:00:41Z", None, None, None)
+    assert _filter_key(a) == _filter_key(b)
+
+
+def test_bounds_are_widened_not_narrowed():
+    since, until = "2026-02-12T06:00:05Z", "2026-02-12T07:30:05Z"
+    filters = _parse_filters(None, since, until, None, None)
+    assert filters["since_ms"] <= parse_time_ms(since)
+    assert filters["until_ms"] >= parse_time_ms(until)
+    assert filters["until_ms"] - filters["since_ms"] + 1 <= (
+        parse_time_ms(until) - parse_time_ms(since) + 2 * FILTER_TIME_BUCKET_SEC * 1000
+    )
+    assert (filters["until_ms"] + 1) % (FILTER_TIME_BUCKET_SEC * 1000) == 0
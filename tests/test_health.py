@@ -0,0 +1,16 @@
+"""/health's redis_pool block must not depend on redis-py internals."""
+
+from types import SimpleNamespace
+
+import api.main as main
+
+
+def test_pool_stats_tolerate_missing_internals(monkeypatch):
+    monkeypatch.setattr(main, "redis_pool", SimpleNamespace(max_connections=7))
+    assert main._redis_pool_stats() == {"max_connections": 7, "in_use": None, "idle": None}
+
+
+def test_pool_stats_count_connections(monkeypatch):
+    pool = SimpleNamespace(max_connections=7, _in_use_connections={1, 2}, _available_connections=[3])
+    monkeypatch.setattr(main, "redis_pool", pool)
+    assert main._redis_pool_stats() == {"max_connections": 7, "in_use": 2, "idle": 1}
@@ -0,0 +1,31 @@
+"""Checkpoints are tied to the file that was actually scanned."""
+
+import os
+
+from api.incremental import empty_state, file_identity, make_checkpoint, resume_point
+
+LINE = b'{"model_name": "a", "latency_ms": 1}\n'
+
+
+def test_resume_after_append(tmp_path):
+    log = tmp_path / "runs.jsonl"
+    log.write_bytes(LINE * 3)
+    state = {**empty_state(), "total_lines": 3}
+    checkpoint = make_checkpoint(file_identity(str(log)), state, len(LINE) * 3)
+    with open(log, "ab") as f:
+        f.write(LINE)
+    assert resume_point(str(log), checkpoint) == (len(LINE) * 3, state)
+
+
+def test_rotation_during_scan_forces_rescan(tmp_path):
+    log = tmp_path / "runs.jsonl"
+    log.write_bytes(LINE * 3)
+    identity = file_identity(str(log))
+
+    # rotated while the scan of the old file was running
+    rotated = tmp_path / "runs.jsonl.new"
+    rotated.write_bytes(LINE * 5)
+    os.replace(rotated, log)
+
+    checkpoint = make_checkpoint(identity, {**empty_state(), "total_lines": 3}, len(LINE) * 3)
+    assert resume_point(str(log), checkpoint) == (0, empty_state())
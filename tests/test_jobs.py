@@ -0,0 +1,39 @@
+"""Benchmark jobs as another worker sees them through Redis."""
+
+import asyncio
+
+import pytest
+
+from api.jobs import JobService
+from llm.client import StubBot
+
+fakeredis = pytest.importorskip("fakeredis")
+
+PROMPTS = [{"id": f"p{i}", "prompt": "Hi Open AI", "tags": []} for i in range(6)]
+
+
+async def _run_job(tmp_path):
+    redis = fakeredis.aioredis.FakeRedis()
+    owner = JobService(1, 10, 2, str(tmp_path / "results.jsonl"))
+    owner.start({"stub": ("Stub", StubBot())}, redis)
+    job = await owner.submit(["stub"], PROMPTS, timeout=5)
+    while not job.finished:
+        await asyncio.sleep(0.01)
+    await owner.close()
+    return job, JobService(1, 10, 2, str(tmp_path / "results.jsonl")), redis
+
+
+def test_mirror_matches_owner(tmp_path):
+    async def main():
+        job, other, redis = await _run_job(tmp_path)
+        other.start({}, redis)
+        try:
+            assert job.status == "completed"
+            assert await other.load_snapshot(job.id) == job.snapshot()
+            tail = await other.load_snapshot(job.id, results_from=4, events_from=None)
+            assert tail["results"] == job.results[4:] and "events" not in tail
+            assert len(await redis.lrange(f"bench:job:{job.id}:results", 0, -1)) == len(PROMPTS)
+        finally:
+            await other.close()
+
+    asyncio.run(main())
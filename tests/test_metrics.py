@@ -0,0 +1,40 @@
+"""Cross-worker /metrics: snapshots of workers that are gone stop counting."""
+
+import os
+import subprocess
+import sys
+import time
+
+from api import metrics
+from api.metrics import Exporter, Registry
+
+
+def _write(directory, pid: int, age: float = 0.0) -> str:
+    path = os.path.join(directory, f"{pid}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{}")
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_dead_and_stale_snapshots_are_deleted(tmp_path):
+    exporter = Exporter(Registry(), str(tmp_path), flush_interval=5)
+    parent = os.getppid()  # alive, so only the file's age can retire it
+    dead = _write(tmp_path, _dead_pid())
+    stale = _write(tmp_path, parent, age=metrics.STALE_MIN_SEC + 60)
+    assert exporter._peers() == {}
+    assert not os.path.exists(dead) and not os.path.exists(stale)
+
+
+def test_live_snapshot_is_kept(tmp_path):
+    exporter = Exporter(Registry(), str(tmp_path), flush_interval=5)
+    live = _write(tmp_path, os.getppid())
+    assert exporter._peers() == {os.getppid(): {}}
+    assert os.path.exists(live)
@@ -0,0 +1,63 @@
+"""
+log_processor's two JSON readers must agree line for line.
+
+`--parser ondemand` is a hand-written validating reader; `--parser dom` is
+nlohmann::json.  Every fixture under fixtures/parser/ mixes lines both must
+accept with lines both must reject (escapes, unicode, deep nesting,
+overflowing numbers, truncated lines), and each run compares the two outputs
+byte for byte.  One thread, so latency sums add up in the same order.
+"""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = sorted((Path(__file__).parent / "fixtures" / "parser").glob("*.jsonl"))
+
+RUNS = {
+    "partial": ["--partial"],
+    "report": [],
+    "stream": ["--partial", "--max-memory", "1M"],
+    "agent": ["--partial", "--agent", "m"],
+    "since": ["--partial", "--since", "2026-02-12T06:00:00Z"],
+    "validation": ["--partial", "--validation", "passed"],
+}
+
+
+@pytest.fixture(scope="session")
+def log_processor(tmp_path_factory) -> str:
+    if os.getenv("LOG_PROCESSOR_TEST_BINARY"):
+        return os.environ["LOG_PROCESSOR_TEST_BINARY"]
+    if not shutil.which("g++"):
+        pytest.skip("g++ not available to build cpp/log_processor.cpp")
+    binary = tmp_path_factory.mktemp("bin") / "log_processor"
+    subprocess.run(
+        ["g++", "-O2", "-pthread", "-o", str(binary), str(ROOT / "cpp" / "log_processor.cpp")],
+        check=True, cwd=ROOT,
+    )
+    return str(binary)
+
+
+def _run(binary: str, parser: str, args: list[str], path: Path) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [binary, "--threads", "1", "--parser", parser, *args, str(path)],
+        capture_output=True, check=False,
+    )
+
+
+@pytest.mark.parametrize("run", RUNS)
+@pytest.mark.parametrize("fixture", FIXTURES, ids=lambda p: p.stem)
+def test_readers_agree(log_processor, fixture, run):
+    dom = _run(log_processor, "dom", RUNS[run], fixture)
+    ondemand = _run(log_processor, "ondemand", RUNS[run], fixture)
+    assert (dom.returncode, dom.stdout) == (ondemand.returncode, ondemand.stdout)
+
+
+@pytest.mark.parametrize("offset", ["-1", "-5000", "abc"])
+def test_bad_offset_is_rejected(log_processor, offset):
+    result = _run(log_processor, "dom", ["--partial", "--offset", offset], FIXTURES[0])
+    assert result.returncode == 1 and not result.stdout
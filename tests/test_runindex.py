@@ -0,0 +1,49 @@
+"""RunIndex reads stay consistent while the log is rotated and re-indexed."""
+
+import json
+import os
+
+from api.runindex import RunIndex
+
+
+def _write(path, model: str, n: int) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"time_stamp": f"2026-02-12T06:00:{i:02d}Z", "model_name": model}) + "\n")
+
+
+def test_snapshot_survives_rebuild(tmp_path):
+    log = tmp_path / "runs.jsonl"
+    _write(log, "old", 50)
+    index = RunIndex(str(log))
+    index.refresh()
+    before = index.snapshot()
+
+    # rotate to a shorter log; a second instance stands in for another worker
+    _write(tmp_path / "new.jsonl", "new", 3)
+    os.replace(tmp_path / "new.jsonl", log)
+    other = RunIndex(str(log))
+    other.refresh()
+    assert other.count() == 3
+
+    matches, _ = before.scan(start=49, descending=True, limit=50, scan_cap=1000)
+    assert len(matches) == 50
+    assert {row["model_name"] for row in before.read([rec for _, rec in matches])} == {"old"}
+    assert before.offset_of(before.bisect_time(0)) == 0
+
+    index.refresh()
+    matches, _ = index.scan(start=0, descending=False, limit=50, scan_cap=1000)
+    assert [row["model_name"] for row in index.read([rec for _, rec in matches])] == ["new"] * 3
+
+
+def test_append_is_incremental(tmp_path):
+    log = tmp_path / "runs.jsonl"
+    _write(log, "a", 5)
+    index = RunIndex(str(log))
+    index.refresh()
+    with open(log, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"time_stamp": "2026-02-12T07:00:00Z", "model_name": "b"}) + "\n")
+    index.refresh()
+    assert index.count() == 6
+    assert index.model_id("b") == 1
+    assert index.bisect_time(1770879600000) == 5
@@ -0,0 +1,51 @@
+"""ProcessorPool supervision, with a stand-in worker that never answers."""
+
+import asyncio
+import stat
+
+import pytest
+
+from api.workers import ProcessorError, ProcessorPool
+
+
+@pytest.fixture
+def stuck_binary(tmp_path):
+    """A "--serve" worker that never reads stdin and never replies."""
+    path = tmp_path / "stuck"
+    path.write_text("#!/bin/sh\nexec sleep 600\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def test_unread_request_hits_the_deadline(stuck_binary):
+    async def main():
+        pool = ProcessorPool(stuck_binary, 1, timeout=0.5)
+        await pool.start()
+        try:
+            # far larger than a pipe buffer, so drain() blocks; the timeout is
+            # an OSError on 3.11+, which scan() reports as ProcessorError
+            scan = asyncio.create_task(pool.scan("x", 0, {"agent": "a" * (4 << 20)}))
+            done, _ = await asyncio.wait({scan}, timeout=5)
+            assert done, "scan() outlived its deadline"
+            with pytest.raises((ProcessorError, asyncio.TimeoutError)):
+                scan.result()
+            assert pool.restarts == 1
+        finally:
+            await pool.close()
+
+    asyncio.run(main())
+
+
+def test_close_stops_busy_workers(stuck_binary):
+    async def main():
+        pool = ProcessorPool(stuck_binary, 2, timeout=60)
+        await pool.start()
+        procs = set(pool._procs)
+        busy = asyncio.create_task(pool.scan("x"))
+        await asyncio.sleep(0.2)
+        await pool.close()
+        assert all(proc.returncode is not None for proc in procs)
+        busy.cancel()
+        await asyncio.gather(busy, return_exceptions=True)
+
+    asyncio.run(main())